@@ -2,8 +2,8 @@
 
 """
 Output cohort entropy information for aligned stimuli. The aligned
-stimuli should be contained in a directory, each file named
-<word>.TextGrid, where <word> is the orthographic form of the
+stimuli should be contained in a directory or match a glob, each file
+named <word>.TextGrid, where <word> is the orthographic form of the
 item. The entropy file is the file ending in _prefix.csv generated by
 cohort_info. If rate is specified, the output is a long format
 containing the entropy at intervals spaced 1.0 / rate seconds
@@ -26,49 +26,67 @@ a single row per phoneme, including start and end times.
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import os
 import csv
 import argparse
+from itertools import izip, repeat
 
-from lingtools.phon.textgrid import TextGrid
+import numpy as np
+
+from lingtools.phon.corpus import load_phoneme_tiers
 from lingtools.phon.arpabet import arpabet_elpone
 from extract_elp_prons import replace_phons
 
-PHONEME_TIER_NAMES = set(("phonemes", "phones"))
 
+def _convert_mark(mark, arpabet):
+    """Return a phoneme mark in the transcription used for prefixes."""
+    return replace_phons(mark) if not arpabet else arpabet_elpone([mark])[0]
+
+
+def _interval_entropies(tier, prefix_ent, arpabet):
+    """Return the marks of a tier and the entropies of the prefix ending at each."""
+    marks = []
+    ent_unweights = []
+    ent_freqs = []
+    prefix = ""
+    for interval in tier:
+        mark = _convert_mark(interval.mark, arpabet)
+        prefix += mark
+        marks.append(mark)
+        # Get the entropy
+        ent_unweight, ent_freq = prefix_ent.get(prefix, (0, 0))
+        ent_unweights.append(ent_unweight)
+        ent_freqs.append(ent_freq)
+    return marks, ent_unweights, ent_freqs
+
+
+def sample_indices(max_times, rate):
+    """Return the times sampled at rate and the index of the interval at each.
 
-def phoneme_tier(textgrid):
-    """Return the first tier corresponding to phonemes in a TextGrid."""
-    try:
-        return next(tier for tier in textgrid
-                    if tier.name.lower() in PHONEME_TIER_NAMES)
-    except StopIteration:
-        return None
+    Samples are taken every 1.0 / rate seconds from zero through the end
+    of the last interval. A sample on the boundary of two intervals is
+    in the earlier one, and a sample in a gap is in the next interval.
 
+    >>> times, indices = sample_indices(np.array([0.1, 0.15, 0.4]), 10)
+    >>> times.tolist()
+    [0.0, 0.1, 0.2, 0.30000000000000004, 0.4]
+    >>> indices.tolist()
+    [0, 0, 2, 2, 2]
 
-def textgrid_files(dirpath):
-    """Return a list of files in a directory with the extension "TextGrid"."""
-    return [os.path.join(dirpath, filename) for filename in os.listdir(dirpath)
-            if filename.lower().endswith(".textgrid")]
+    """
+    if not len(max_times):
+        return np.zeros(0), np.zeros(0, dtype=np.intp)
+    end = max_times[-1]
+    times = np.arange(int(end * rate) + 2) * (1.0 / rate)
+    times = times[times <= end]
+    return times, np.searchsorted(max_times, times, side='left')
 
 
-def align_cohort(input_dir, ent_path, rate, output_path, arpabet):
+def align_cohort(input_path, ent_path, rate, output_path, arpabet, processes=1):
     """Output info for each aligned item at the given rate."""
     # Words to their phoneme tiers
-    word_phon_tiers = {}
-
-    # Load the textgrids
-    textgrid_paths = textgrid_files(input_dir)
-    for textgrid_path in textgrid_paths:
-        textgrid = TextGrid(textgrid_path)
-        textgrid.read(textgrid_path)
-        phon_tier = phoneme_tier(textgrid)
-        if not phon_tier:
-            print "Could not read phoneme tier, skipping {}".format(
-                textgrid_path)
-            continue
-        word = os.path.splitext(os.path.basename(textgrid_path))[0]
-        word_phon_tiers[word] = phon_tier
+    word_phon_tiers, errors = load_phoneme_tiers(input_path, processes)
+    for error in errors:
+        print error
 
     # Prefixes to their entropy information
     prefix_ent = {}
@@ -88,59 +106,32 @@ def align_cohort(input_dir, ent_path, rate, output_path, arpabet):
         writer.writerow(['word', 'position', 'phoneme', 'start', 'end',
                          'ent.unweight', 'ent.freq'])
         for word, tier in word_phon_tiers.iteritems():
-            prefix = ""
-            for idx, interval in enumerate(tier):
-                mark = (replace_phons(interval.mark) if not arpabet else
-                        arpabet_elpone([interval.mark])[0])
-                prefix += mark
-                # Get the entropy
-                try:
-                    ent_unweight, ent_freq = prefix_ent[prefix]
-                except KeyError:
-                    ent_unweight, ent_freq = 0, 0
-                writer.writerow([word, idx + 1, mark,
-                                 interval.minTime, interval.maxTime,
-                                 ent_unweight, ent_freq])
+            marks, ent_unweights, ent_freqs = _interval_entropies(tier, prefix_ent, arpabet)
+            writer.writerows([word, idx + 1, mark, interval.minTime, interval.maxTime,
+                              ent_unweight, ent_freq]
+                             for idx, (interval, mark, ent_unweight, ent_freq)
+                             in enumerate(zip(tier, marks, ent_unweights, ent_freqs)))
     else:
         # Long output
-        time_step = 1.0 / rate
         writer.writerow(['word', 'time', 'position', 'phoneme', 'ent.unweight',
                          'ent.freq'])
+        # Every word is sampled at the same times from zero, so each
+        # time is formatted once and reused
+        time_strs = []
         for word, tier in word_phon_tiers.iteritems():
-            mark = (replace_phons(tier[0].mark) if not arpabet else
-                    arpabet_elpone([tier[0].mark])[0])
-            prefix = mark
-            # Elapsed time
-            time = 0
-            # Elapsed time steps
-            step = 0L
-            # Index in the tier
-            idx = 0
-            # This loop could be optimized easily to speed output on
-            # high sample rates
-            while True:
-                interval = tier[idx]
-                maxtime = interval.maxTime
-                if time > maxtime:
-                    idx += 1
-                    try:
-                        interval = tier[idx]
-                    except IndexError:
-                        break
-                    mark = (replace_phons(interval.mark)if not arpabet else
-                            arpabet_elpone([interval.mark])[0])
-                    prefix += mark
-
-                # Get the entropy
-                try:
-                    ent_unweight, ent_freq = prefix_ent[prefix]
-                except KeyError:
-                    ent_unweight, ent_freq = 0, 0
-                writer.writerow([word, time, idx + 1, mark,
-                                 ent_unweight, ent_freq])
-                # Step forward
-                step += 1
-                time = time_step * step
+            marks, ent_unweights, ent_freqs = _interval_entropies(tier, prefix_ent, arpabet)
+            # Map every sample to its interval at once and gather the
+            # columns by interval index
+            times, indices = sample_indices(
+                np.array([interval.maxTime for interval in tier]), rate)
+            if len(times) > len(time_strs):
+                time_strs.extend(repr(time) for time in times[len(time_strs):].tolist())
+            indices = indices.tolist()
+            writer.writerows(izip(repeat(word), time_strs[:len(times)],
+                                  [idx + 1 for idx in indices],
+                                  [marks[idx] for idx in indices],
+                                  [ent_unweights[idx] for idx in indices],
+                                  [ent_freqs[idx] for idx in indices]))
 
     output_file.close()
 
@@ -148,7 +139,8 @@ def align_cohort(input_dir, ent_path, rate, output_path, arpabet):
 def main():
     """Parse arguments and call the cohort computer."""
     parser = argparse.ArgumentParser(description=__doc__)
-    parser.add_argument('input_dir', help='directory containing TextGrid files')
+    parser.add_argument('input_path',
+                        help='directory containing TextGrid files or a glob matching them')
     parser.add_argument('prefix_entropy',
                         help='CSV of prefix entropy information')
     parser.add_argument('output', help='output CSV file')
@@ -156,9 +148,11 @@ def main():
                         type=int, help='resolution of output, in Hz')
     parser.add_argument('-a', '--arpabet', action='store_true',
                         help='convert alignments from ARPABET')
+    parser.add_argument('--processes', type=int, default=1,
+                        help='number of processes to read TextGrid files with')
     args = parser.parse_args()
-    align_cohort(args.input_dir, args.prefix_entropy, args.rate, args.output,
-                 args.arpabet)
+    align_cohort(args.input_path, args.prefix_entropy, args.rate, args.output,
+                 args.arpabet, args.processes)
 
 
 if __name__ == "__main__":
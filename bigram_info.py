@@ -23,8 +23,12 @@ from lingtools.corpus.subtlexreader import SubtlexUKBigramDict
 from lingtools.prob.probability import ConditionalFreqDist
 
 
-def bigram_info(subtlex_path, out_path, first_word, second_word):
-    """Output information about bigrams."""
+def bigram_info(subtlex_path, out_path, first_word, second_word, use_sparse=False):
+    """Output information about bigrams.
+
+    If use_sparse is True, frequencies are stored in a sparse matrix,
+    which is built in one step and uses much less memory.
+    """
     # Check args
     if first_word and second_word:
         print >> sys.stderr, "Specify first or second word, not both."
@@ -36,13 +40,20 @@ def bigram_info(subtlex_path, out_path, first_word, second_word):
 
     # Compute frequencies
     print "Computing frequencies..."
-    freqs = ConditionalFreqDist()
-    for (word1, word2), bigram in bigrams.iteritems():
-        # We can skip contexts that don't matter if a first word has
-        # been specified.
-        if first_word and word1 != first_word:
-            continue
-        freqs[word1].inc(word2, bigram.freq)
+    # We can skip contexts that don't matter if a first word has
+    # been specified.
+    entries = [bigram for (word1, _), bigram in bigrams.iteritems()
+               if not first_word or word1 == first_word]
+    if use_sparse:
+        # Imported here so that only sparse storage requires SciPy
+        from lingtools.prob.sparse import SparseConditionalFreqDist
+        freqs = SparseConditionalFreqDist.from_arrays(
+            [bigram.word1 for bigram in entries], [bigram.word2 for bigram in entries],
+            [bigram.freq for bigram in entries])
+    else:
+        freqs = ConditionalFreqDist()
+        for bigram in entries:
+            freqs[bigram.word1].inc(bigram.word2, bigram.freq)
 
     # If a first word was specified, make sure it appears in the data.
     if first_word and first_word not in freqs:
@@ -101,8 +112,10 @@ def main():
     parser.add_argument('-w2', nargs='?', default=None,
                         metavar='second_word',
                         help='second word of bigram to restrict output to')
+    parser.add_argument('--sparse', action='store_true',
+                        help='store frequencies in a sparse matrix to save memory')
     args = parser.parse_args()
-    bigram_info(args.subtlex_path, args.out_path, args.w1, args.w2)
+    bigram_info(args.subtlex_path, args.out_path, args.w1, args.w2, args.sparse)
 
 
 if __name__ == "__main__":
@@ -18,14 +18,16 @@ Output information on prefix cohorts
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import os
 import csv
 import argparse
 from collections import defaultdict
 from itertools import takewhile
 
 from lingtools.corpus import subtlexreader
-from lingtools.lex.cohort import prefixes, uniqueness_point, make_prefix_dict
-from lingtools.prob.probability import entropy, normalize_counts, surprisal
+from lingtools.lex.cohort import prefixes, uniqueness_point
+from lingtools.lex.cohort_stats import CohortStats, NormStats
+from lingtools.lex.trie import PrefixTrie, SuffixTrie
 
 # All vowels in the converted representation, used to identify onsets.
 # These should be checked against your stimuli list; these were
@@ -115,8 +117,158 @@ def _mean(seq):
         return sum(seq) / float(len(seq))
 
 
-def cohort_info(word_path, freq_path, output_base):
-    """Write cohort information."""
+def _write_backward(word_prons, pron_freqs, symbols, output_base):
+    """Write suffix cohort information using a SuffixTrie over the pronunciations."""
+    prons = sorted(pron_freqs)
+    trie = SuffixTrie(prons, [pron_freqs[pron] for pron in prons], symbols)
+    stats = CohortStats(trie)
+    uniform_entropies = stats.uniform_entropies.tolist()
+    freq_entropies = stats.freq_entropies.tolist()
+    uniform_surprisals = stats.uniform_surprisals.tolist()
+    freq_surprisals = stats.freq_surprisals.tolist()
+    sizes = trie.sizes
+
+    suffix_path = output_base + "_suffix.csv"
+    with open(suffix_path, 'wb') as suffix_file:
+        writer = csv.writer(suffix_file)
+        writer.writerow(['suffix', 'ent.unweight', 'ent.freq', 'sur.unweight',
+                         'sur.freq'])
+        writer.writerows(stats.prefix_rows())
+
+    # Positions are counted from the end of the word, so the first
+    # position is the last segment.
+    word_path = output_base + "_word_backward.csv"
+    with open(word_path, 'wb') as word_file:
+        writer = csv.writer(word_file)
+        writer.writerow([
+            'word', 'pron', 'length', 'unique',
+            'ent.mean.uniform', 'ent.mean.freq',
+            'ent.min.uniform', 'ent.min.freq',
+            'ent.max.uniform', 'ent.max.freq',
+            'ent.last.uniform', 'ent.last.freq',
+            'sur.mean.uniform', 'sur.mean.freq',
+            'sur.min.uniform', 'sur.min.freq',
+            'sur.max.uniform', 'sur.max.freq',
+            ])
+        for word in sorted(word_prons):
+            pron = word_prons[word]
+            nodes = trie.path(pron)
+            ent_uniform = [uniform_entropies[node] for node in nodes]
+            ent_freq = [freq_entropies[node] for node in nodes]
+            sur_uniform = [uniform_surprisals[node] for node in nodes]
+            sur_freq = [freq_surprisals[node] for node in nodes]
+            writer.writerow([
+                word.lower(), pron, len(pron),
+                # Offset the uniqueness point by one as it's zero-indexed
+                uniqueness_point([sizes[node] for node in nodes]) + 1,
+                _mean(ent_uniform), _mean(ent_freq),
+                min(ent_uniform), min(ent_freq),
+                max(ent_uniform), max(ent_freq),
+                ent_uniform[0], ent_freq[0],
+                _mean(sur_uniform), _mean(sur_freq),
+                min(sur_uniform), min(sur_freq),
+                max(sur_uniform), max(sur_freq),
+                ])
+
+
+def _pron_freqs(word_prons, word_freqs):
+    """Return the smoothed frequency of each pronunciation and the number of unseen words."""
+    # Add up frequencies for each pronunciation
+    pron_freqs = defaultdict(int)
+    nofreq_count = 0
+    # Laplace smoothing over word counts
+    for word, pron in word_prons.iteritems():
+        if word in word_freqs and word_freqs[word]:
+            freq = word_freqs[word] + 1
+        else:
+            freq = 1
+            # Note smoothed frequencies
+            nofreq_count += 1
+        pron_freqs[pron] += freq
+    return pron_freqs, nofreq_count
+
+
+def _read_norm(norm_file):
+    """Return a dictionary of words to frequencies from a word,frequency CSV.
+
+    A first row whose frequency is not a number is skipped as a header,
+    and empty rows are skipped.
+
+    >>> sorted(_read_norm(['word,freq', 'cat,12', '', 'dog,3.5']).items())
+    [('cat', 12.0), ('dog', 3.5)]
+    >>> _read_norm(['cat,12', 'dog,many'])
+    Traceback (most recent call last):
+    ...
+    ValueError: could not convert string to float: many
+
+    """
+    word_freqs = {}
+    for idx, row in enumerate(csv.reader(norm_file)):
+        if not row:
+            continue
+        try:
+            freq = float(row[1])
+        except ValueError:
+            if idx == 0:
+                continue
+            raise
+        word_freqs[row[0]] = freq
+    return word_freqs
+
+
+def _read_norm_path(norm_path):
+    """Return a dictionary of words to frequencies from a word,frequency CSV file."""
+    with open(norm_path, 'rU') as norm_file:
+        return _read_norm(norm_file)
+
+
+def _write_norms(word_prons, norms, stats, output_base, processes):
+    """Write frequency-weighted information for several frequency norms.
+
+    norms is a list of (name, word_freqs) pairs, and the statistics of
+    all of them are computed at once over the trie of stats.
+    """
+    trie = stats.trie
+    names = [name for name, _ in norms]
+    prons = sorted(set(word_prons.itervalues()))
+    norm_pron_freqs = [_pron_freqs(word_prons, word_freqs)[0] for _, word_freqs in norms]
+    freqs = [[pron_freqs[pron] for pron_freqs in norm_pron_freqs] for pron in prons]
+    norm_stats = NormStats(trie, prons, freqs, processes)
+    entropies = norm_stats.freq_entropies.tolist()
+    surprisals = norm_stats.freq_surprisals.tolist()
+
+    prefix_path = output_base + "_norms_prefix.csv"
+    with open(prefix_path, 'wb') as prefix_file:
+        writer = csv.writer(prefix_file)
+        writer.writerow(['prefix'] + ['ent.freq.' + name for name in names] +
+                        ['sur.freq.' + name for name in names])
+        for prefix, node in stats.prefix_nodes():
+            writer.writerow([prefix] + entropies[node] + surprisals[node])
+
+    word_path = output_base + "_norms_word.csv"
+    with open(word_path, 'wb') as word_file:
+        writer = csv.writer(word_file)
+        writer.writerow(['word', 'pron'] + ['ent.mean.freq.' + name for name in names] +
+                        ['sur.mean.freq.' + name for name in names])
+        for word in sorted(word_prons):
+            pron = word_prons[word]
+            nodes = trie.path(pron)
+            writer.writerow(
+                [word.lower(), pron] +
+                [_mean([entropies[node][col] for node in nodes]) for col in range(len(names))] +
+                [_mean([surprisals[node][col] for node in nodes]) for col in range(len(names))])
+
+
+def cohort_info(word_path, freq_path, output_base, backward=False, norm_paths=(),
+                processes=1):
+    """Write cohort information.
+
+    If backward is True, suffix cohort information is also written,
+    using the same pronunciations and segment symbols. If norm_paths
+    is not empty, frequency-weighted information is also written for
+    SUBTLEX freq_count_low and freq_count and for each word,frequency
+    CSV in norm_paths, using processes worker processes.
+    """
     print "Reading frequencies..."
     subtlex = subtlexreader.SubtlexDict(freq_path)
     # The choice between using freq_count (covers more items, but most
@@ -134,79 +286,24 @@ def cohort_info(word_path, freq_path, output_base):
         word_reader = csv.reader(word_file)
         word_prons = {row[0]: row[1] for row in word_reader}
 
-    # Add up frequencies for each pronunciation
-    pron_freqs = defaultdict(int)
-    nofreq_count = 0
-    # Laplace smoothing over word counts
-    for word, pron in word_prons.iteritems():
-        if word in word_freqs and word_freqs[word]:
-            freq = word_freqs[word] + 1
-        else:
-            freq = 1
-            # Note smoothed frequencies
-            nofreq_count += 1
-        pron_freqs[pron] += freq
-
+    pron_freqs, nofreq_count = _pron_freqs(word_prons, word_freqs)
     print "{} words did not have frequency information".format(nofreq_count)
 
     print "Creating prefix tree..."
-    prefix_prons = make_prefix_dict(set(word_prons.values()))
+    prons = sorted(pron_freqs)
+    trie = PrefixTrie(prons, [pron_freqs[pron] for pron in prons])
 
-    # Compute the number of words and counts within each prefix
-    prefix_counts = {}
-    prefix_freqs = {}
-    for prefix, prons in prefix_prons.iteritems():
-        prefix_counts[prefix] = len(prons)
-        prefix_freqs[prefix] = [pron_freqs[pron] for pron in prons]
-
-    # Put in a special null prefix for computing surprisal on initial
-    # phonemes.
-    prefix_counts[""] = len(word_prons)
-    prefix_freqs[""] = [pron_freqs[pron] for pron in word_prons.itervalues()]
-
-    # Compute entropy and surprisal for each prefix
+    # Compute entropy and surprisal for every prefix in one pass over
+    # the tree. The surprisal of each initial phoneme is relative to
+    # the whole lexicon.
     print "Computing entropy..."
-    prefix_uniform_entropy = {}
-    prefix_freq_entropy = {}
-    prefix_uniform_surprisal = {}
-    prefix_freq_surprisal = {}
-    for prefix in prefix_prons:
-        # Make a uniform distribution using a count of 1 for each item
-        prefix_uniform_entropy[prefix] = \
-            entropy(normalize_counts([1 for _ in range(prefix_counts[prefix])]))
-        prefix_freq_entropy[prefix] = \
-            entropy(normalize_counts(prefix_freqs[prefix]))
-        # Prefix surprisal
-        prefix_uniform_surprisal[prefix] = \
-            surprisal(len(prefix_freqs[prefix]), len(prefix_freqs[prefix[:-1]]))
-        prefix_freq_surprisal[prefix] = \
-            surprisal(sum(prefix_freqs[prefix]), sum(prefix_freqs[prefix[:-1]]))
-
-    # Compute entropy and surprisal at each position for each pronunciation
-    pron_uniform_entropy = {}
-    pron_freq_entropy = {}
-    pron_uniform_surprisal = {}
-    pron_freq_surprisal = {}
-    pron_uniqueness = {}
-    for pron in pron_freqs:
-        pron_uniform_entropy[pron] = [prefix_uniform_entropy[prefix]
-                                      for prefix in prefixes(pron)]
-        pron_freq_entropy[pron] = [prefix_freq_entropy[prefix]
-                                   for prefix in prefixes(pron)]
-        # Because surprisal isn't defined for the first phoneme, put
-        # None in its place
-        pron_uniform_surprisal[pron] = ([None] +
-                                        [prefix_uniform_surprisal[prefix]
-                                         for prefix in prefixes(pron)[1:]])
-        pron_freq_surprisal[pron] = ([None] +
-                                     [prefix_freq_surprisal[prefix]
-                                      for prefix in prefixes(pron)[1:]])
-        pron_uniqueness[pron] = uniqueness_point([prefix_counts[prefix]
-                                                  for prefix in prefixes(pron)])
-
-    # Compute initial and onsetnuc entropy
-    pron_initials = {pron: _get_initial(pron) for pron in pron_freqs}
-    pron_onsetnucs = {pron: _get_onsetnuc(pron) for pron in pron_freqs}
+    stats = CohortStats(trie)
+    uniform_entropies = stats.uniform_entropies.tolist()
+    freq_entropies = stats.freq_entropies.tolist()
+    uniform_surprisals = stats.uniform_surprisals.tolist()
+    freq_surprisals = stats.freq_surprisals.tolist()
+    sizes = trie.sizes
+    pron_paths = {pron: trie.path(pron) for pron in prons}
 
     # Write out information about each prefix
     print "Writing output..."
@@ -215,11 +312,7 @@ def cohort_info(word_path, freq_path, output_base):
         writer = csv.writer(prefix_file)
         writer.writerow(['prefix', 'ent.unweight', 'ent.freq', 'sur.unweight',
                          'sur.freq'])
-        for prefix in sorted(prefix_freq_entropy):
-            writer.writerow([prefix, prefix_uniform_entropy[prefix],
-                             prefix_freq_entropy[prefix],
-                             prefix_uniform_surprisal[prefix],
-                             prefix_freq_surprisal[prefix]])
+        writer.writerows(stats.prefix_rows())
 
     # Write out information about each word
     word_path = output_base + "_word.csv"
@@ -242,36 +335,34 @@ def cohort_info(word_path, freq_path, output_base):
         for word in sorted(word_prons):
             freq = word_freqs[word] if word in word_freqs else 0
             pron = word_prons[word]
+            nodes = pron_paths[pron]
             first = pron[0]
-            initial = pron_initials[pron]
-            onsetnuc = pron_onsetnucs[pron]
+            initial = _get_initial(pron)
+            onsetnuc = _get_onsetnuc(pron)
+            # The nodes of the first, initial, onsetnuc, and final prefixes
+            first_node = nodes[0]
+            initial_node = nodes[len(initial) - 1]
+            onsetnuc_node = nodes[len(onsetnuc) - 1]
+            final_node = nodes[-1]
             # Entropy
-            ent_uniform = [prefix_uniform_entropy[prefix] for prefix in prefixes(pron)]
-            ent_freq = [prefix_freq_entropy[prefix] for prefix in prefixes(pron)]
-            first_ent_uniform = prefix_uniform_entropy[first]
-            first_ent_freq = prefix_freq_entropy[first]
-            initial_ent_uniform = prefix_uniform_entropy[initial]
-            initial_ent_freq = prefix_freq_entropy[initial]
-            onsetnuc_ent_uniform = prefix_uniform_entropy[onsetnuc]
-            onsetnuc_ent_freq = prefix_freq_entropy[onsetnuc]
-            final_ent_uniform = prefix_uniform_entropy[pron]
-            final_ent_freq = prefix_freq_entropy[pron]
+            ent_uniform = [uniform_entropies[node] for node in nodes]
+            ent_freq = [freq_entropies[node] for node in nodes]
             # Surprisal
-            sur_uniform = [prefix_uniform_surprisal[prefix] for prefix in prefixes(pron)]
-            sur_freq = [prefix_freq_surprisal[prefix] for prefix in prefixes(pron)]
+            sur_uniform = [uniform_surprisals[node] for node in nodes]
+            sur_freq = [freq_surprisals[node] for node in nodes]
 
             writer.writerow([
                 word.lower(), freq, pron, len(pron),
                 # Offset the uniqueness point by one as it's zero-indexed
-                pron_uniqueness[pron] + 1,
+                uniqueness_point([sizes[node] for node in nodes]) + 1,
                 first, initial, onsetnuc,
                 _mean(ent_uniform), _mean(ent_freq),
                 min(ent_uniform), min(ent_freq),
                 max(ent_uniform), max(ent_freq),
-                first_ent_uniform, first_ent_freq,
-                initial_ent_uniform, initial_ent_freq,
-                onsetnuc_ent_uniform, onsetnuc_ent_freq,
-                final_ent_uniform, final_ent_freq,
+                uniform_entropies[first_node], freq_entropies[first_node],
+                uniform_entropies[initial_node], freq_entropies[initial_node],
+                uniform_entropies[onsetnuc_node], freq_entropies[onsetnuc_node],
+                uniform_entropies[final_node], freq_entropies[final_node],
                 _mean(sur_uniform), _mean(sur_freq),
                 min(sur_uniform), min(sur_freq),
                 max(sur_uniform), max(sur_freq),
@@ -285,16 +376,29 @@ def cohort_info(word_path, freq_path, output_base):
                          'ent.freq', 'sur.unweight', 'sur.freq'])
         for word in sorted(word_prons):
             pron = word_prons[word]
-            for idx, prefix in enumerate(prefixes(pron)):
+            for idx, (prefix, node) in enumerate(zip(prefixes(pron), pron_paths[pron])):
                 # Offset the pos by one as it's zero-indexed
                 writer.writerow([
                     word, pron, prefix, idx + 1,
-                    prefix_uniform_entropy[prefix],
-                    prefix_freq_entropy[prefix],
-                    prefix_uniform_surprisal[prefix],
-                    prefix_freq_surprisal[prefix],
+                    uniform_entropies[node],
+                    freq_entropies[node],
+                    uniform_surprisals[node],
+                    freq_surprisals[node],
                 ])
 
+    if backward:
+        print "Writing backward output..."
+        _write_backward(word_prons, pron_freqs, trie.symbols, output_base)
+
+    if norm_paths:
+        print "Writing output for each frequency norm..."
+        norms = [("subtlex.low", word_freqs),
+                 ("subtlex", {word: subtlex[word].freq_count for word in subtlex})]
+        norms.extend((os.path.splitext(os.path.basename(norm_path))[0],
+                      _read_norm_path(norm_path))
+                     for norm_path in norm_paths)
+        _write_norms(word_prons, norms, stats, output_base, processes)
+
     print "Entropy and surprisal information written for {} words".format(len(word_prons))
 
 
@@ -304,11 +408,20 @@ def main():
     parser.add_argument('words', help='pronunciation CSV')
     parser.add_argument('freqs', help='SUBTLEX frequency CSV')
     parser.add_argument('output_base', help=' CSV file')
+    parser.add_argument('--backward', action='store_true',
+                        help='also write suffix cohort information')
+    parser.add_argument('--norms', nargs='*', default=(), metavar='NORM_CSV',
+                        help='also write frequency-weighted information for SUBTLEX '
+                        'freq_count_low, freq_count, and each word,frequency CSV given, '
+                        'which may have a header row')
+    parser.add_argument('--processes', type=int, default=1,
+                        help='number of processes to compute frequency norms with')
     args = parser.parse_args()
     word_path = args.words
     freq_path = args.freqs
     output_base = args.output_base
-    cohort_info(word_path, freq_path, output_base)
+    cohort_info(word_path, freq_path, output_base, args.backward, args.norms,
+                args.processes)
 
 
 if __name__ == "__main__":
@@ -16,30 +16,24 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import os
 import csv
 import argparse
 
-from lingtools.phon.textgrid import TextGrid
-from align_cohort import phoneme_tier, textgrid_files
+from lingtools.phon.corpus import iter_phoneme_tiers, textgrid_files
 from extract_elp_prons import replace_phons
 
 
-def align_prons(input_dir, output_path):
+def align_prons(input_path, output_path, processes=1):
     """Output info for each aligned item at the given rate."""
     # Words to their prons
     word_prons = {}
 
     # Read the textgrids
-    for textgrid_path in textgrid_files(input_dir):
-        textgrid = TextGrid(textgrid_path)
-        textgrid.read(textgrid_path)
-        phon_tier = phoneme_tier(textgrid)
-        if not phon_tier:
-            print "Could not read phoneme tier, skipping {}".format(
-                textgrid_path)
+    for word, _, phon_tier, error in iter_phoneme_tiers(textgrid_files(input_path),
+                                                        processes):
+        if error:
+            print error
             continue
-        word = os.path.splitext(os.path.basename(textgrid_path))[0]
         word_prons[word] = "".join(replace_phons(interval.mark) for interval in phon_tier)
 
     # Write output
@@ -52,10 +46,13 @@ def align_prons(input_dir, output_path):
 def main():
     """Parse arguments and call the extractor."""
     parser = argparse.ArgumentParser(description=__doc__)
-    parser.add_argument('input_dir', help='directory containing TextGrid files')
+    parser.add_argument('input_path',
+                        help='directory containing TextGrid files or a glob matching them')
     parser.add_argument('output', help='output CSV file')
+    parser.add_argument('--processes', type=int, default=1,
+                        help='number of processes to read TextGrid files with')
     args = parser.parse_args()
-    align_prons(args.input_dir, args.output)
+    align_prons(args.input_path, args.output, args.processes)
 
 
 if __name__ == "__main__":
@@ -17,8 +17,11 @@
 
 import sys
 import argparse
-import random
-from operator import itemgetter
+
+from lingtools.prob.sampler import AliasSampler
+
+# The number of keys sampled at once
+SAMPLE_BATCH_SIZE = 100000
 
 
 def parse_countword_line(line):
@@ -48,28 +51,16 @@ def counts_to_freqs(countdict):
     return {word: (count / total) for word, count in countdict.iteritems()}
 
 
-def sample_n_keys(freq_dict, numkeys):
+def sample_n_keys(freq_dict, numkeys, seed=None, batch_size=SAMPLE_BATCH_SIZE):
     """Sample numkeys keys from freq_dict, whose values are frequencies.
 
-    Uses Shannon-Miller-Selfridge sampling. It may be possible to speed
-    up sampling by using bisection instead of summing, but this is fast
-    enough."""
-
-    # Sort into word and freq lists. Sorting speeds up sampling by
-    # putting frequent items first.
-    words, freqs = zip(*sorted(freq_dict.items(), key=itemgetter(1),
-                               reverse=True))
-    # Sampling loop, run numkeys times
-    for _ in range(numkeys):
-        # Draw a random number and sum frequencies until we hit it
-        rand = random.random()
-        freq_sum = 0.0
-        for idx, freq in enumerate(freqs):
-            freq_sum += freq
-            if freq_sum > rand:
-                yield words[idx]
-                # After yielding, return to the sampling loop
-                break
+    Uses Walker's alias method, so each draw takes constant time.
+    Keys are drawn in batches of batch_size and yielded one at a time.
+    """
+    sampler = AliasSampler.from_counts(freq_dict, seed)
+    for start in xrange(0, numkeys, batch_size):
+        for key in sampler.sample(min(batch_size, numkeys - start)):
+            yield key
 
 
 def main():
@@ -83,11 +74,9 @@ def main():
     wordlist_path = args.wordlist
     n_samples = args.nsamples
     seed = args.seed
-    if seed is not None:
-        random.seed(seed)
 
     word_freqs = counts_to_freqs(load_word_counts(wordlist_path))
-    for key in sample_n_keys(word_freqs, n_samples):
+    for key in sample_n_keys(word_freqs, n_samples, seed):
         print key
 
 
@@ -48,6 +48,10 @@ def suffixes(word):
 def make_prefix_dict(words):
     """Return a dictionary of prefix characters to the words they begin.
 
+    Every cohort is stored as a separate list; for large lexicons,
+    lingtools.lex.trie.PrefixTrie answers the same queries without
+    copying cohorts.
+
     >>> words = ("cat", "cats", "in", "into")
     >>> sorted(make_prefix_dict(words).items())  # doctest: +NORMALIZE_WHITESPACE
     [('c', ['cat', 'cats']), ('ca', ['cat', 'cats']),
@@ -0,0 +1,432 @@
+"""
+Entropy, surprisal and uniqueness statistics for lexical cohorts.
+
+The statistics of every prefix in a PrefixTrie are computed at once.
+Each node already holds its cohort size n and total frequency T, and
+the sum S of f * log(f) over the frequencies f of its cohort is
+aggregated from the bottom of the trie up. Then:
+
+    uniform entropy = log(n)
+    frequency entropy = log(T) - S / T
+    uniform surprisal = log(n of parent) - log(n)
+    frequency surprisal = log(T of parent) - log(T)
+
+where the parent of a prefix is the prefix one segment shorter. These
+match the results of entropy and surprisal in
+lingtools.prob.probability applied to each cohort.
+
+When a word is added, removed or reweighted, only its prefixes and
+their children are updated. Frequency-weighted statistics under
+several frequency norms can be computed over the same trie at once.
+
+Statistics over a SuffixTrie are the backward statistics of the
+lexicon, where the parent of a suffix is the suffix one segment
+shorter.
+
+"""
+
+# Copyright 2014 Constantine Lignos
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from itertools import imap
+from multiprocessing import Pool, cpu_count
+
+import numpy as np
+
+from lingtools.lex.trie import PrefixTrie, SuffixTrie
+
+# The trie structure used by worker processes, set when each worker
+# starts
+_worker_structure = None  # pylint: disable=C0103
+
+
+def _plogp(values):
+    """Return values * log2(values), treating 0 * log2(0) as 0."""
+    values = np.asarray(values, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(values > 0, values * np.log2(values), 0.0)
+
+
+def _levels(depths):
+    """Return an array of the nodes at each depth below the root, deepest first."""
+    depths = np.asarray(depths, dtype=np.int64)
+    by_depth = np.argsort(depths, kind='mergesort')
+    starts = np.searchsorted(depths[by_depth], np.arange(depths.max() + 2))
+    return [by_depth[starts[depth]:starts[depth + 1]]
+            for depth in range(depths.max(), 0, -1)]
+
+
+def _aggregate(values, parents, levels):
+    """Add the values of each node to its ancestors in place.
+
+    Values may have one row per node and any number of columns.
+    """
+    for nodes in levels:
+        np.add.at(values, parents[nodes], values[nodes])
+    return values
+
+
+def _freq_stats(freqs, plogp, sizes, parents, nodes):
+    """Return the frequency entropy and surprisal of nodes.
+
+    freqs holds cohort frequencies and plogp the sums of f * log(f)
+    over cohorts, with one row per node and one column per frequency
+    norm or a single column. sizes and parents are indexed by node.
+    """
+    node_freqs = freqs[nodes]
+    node_parents = parents[nodes]
+    has_parent = node_parents >= 0
+    safe_parents = np.where(has_parent, node_parents, 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        entropy = np.log2(node_freqs) - plogp[nodes] / node_freqs
+        surprisal = np.log2(freqs[safe_parents]) - np.log2(node_freqs)
+    # A cohort of one has no uncertainty; adding zero avoids -0.0
+    unique = sizes[nodes] == 1
+    if entropy.ndim > 1:
+        unique = unique[:, np.newaxis]
+    entropy = np.where(unique, 0.0, np.maximum(entropy, 0.0)) + 0.0
+    surprisal[~has_parent] = np.nan
+    return entropy, surprisal
+
+
+def _init_worker(structure):
+    """Set the trie structure used by this worker process."""
+    global _worker_structure  # pylint: disable=W0603,C0103
+    _worker_structure = structure
+
+
+def _norm_stats(word_freqs):
+    """Return cohort frequencies, entropies and surprisals for norm columns."""
+    parents, levels, sizes = _worker_structure
+    freqs = _aggregate(word_freqs.copy(), parents, levels)
+    plogp = _aggregate(_plogp(word_freqs), parents, levels)
+    entropy, surprisal = _freq_stats(freqs, plogp, sizes, parents, slice(None))
+    return freqs, entropy, surprisal
+
+
+class CohortStats(object):
+
+    """Cohort statistics for every prefix of a PrefixTrie.
+
+    Statistics are stored in arrays indexed by trie node and are in
+    bits. The surprisal of the root, which has no parent, is nan. When
+    the trie is a SuffixTrie, each prefix below is instead a suffix.
+
+    >>> stats = CohortStats.from_lexicon({"cat": 3, "cats": 1, "in": 4})
+    >>> stats.uniform_entropy("ca"), round(stats.freq_entropy("ca"), 4)
+    (1.0, 0.8113)
+    >>> round(stats.uniform_surprisal("c"), 4), stats.freq_surprisal("c")
+    (0.585, 1.0)
+    >>> stats.freq_entropy("in"), stats.uniqueness_point("cats")
+    (0.0, 3)
+    >>> stats.remove("cats")
+    >>> stats.uniform_entropy("ca"), stats.freq_entropy("ca")
+    (0.0, 0.0)
+    >>> backward = CohortStats.from_lexicon({"cat": 3, "cats": 1, "in": 4}, True)
+    >>> backward.uniform_entropy("t"), backward.uniqueness_point("in")
+    (0.0, 0)
+
+    """
+
+    def __init__(self, trie):
+        self._trie = trie
+        self.update()
+
+    @classmethod
+    def from_lexicon(cls, word_freqs, backward=False, symbols=None):
+        """Return statistics for a dictionary of words to frequencies.
+
+        If backward is True, the statistics are computed over suffixes
+        instead of prefixes. If symbols is given, the trie uses it to
+        intern segments.
+        """
+        words = sorted(word_freqs)
+        trie_class = SuffixTrie if backward else PrefixTrie
+        return cls(trie_class(words, [word_freqs[word] for word in words], symbols))
+
+    @property
+    def trie(self):
+        """Return the trie the statistics are computed over."""
+        return self._trie
+
+    def update(self):
+        """Recompute the statistics of every node from the trie.
+
+        This is only needed if the trie is changed directly rather than
+        through insert, remove and reweight.
+        """
+        trie = self._trie
+        parents = np.array(trie.parents, dtype=np.int64)
+        self._sizes = np.array(trie.sizes, dtype=np.float64)
+        self._freqs = np.array(trie.freqs, dtype=np.float64)
+
+        # Sum f * log(f) from the deepest nodes up, one level at a time
+        self._plogp = _aggregate(_plogp(trie.word_freqs), parents, _levels(trie.depths))
+        self._parents = parents
+        self._uniform_entropy = np.empty(len(parents))
+        self._freq_entropy = np.empty(len(parents))
+        self._uniform_surprisal = np.empty(len(parents))
+        self._freq_surprisal = np.empty(len(parents))
+        self._compute(np.arange(len(parents)))
+
+    def _compute(self, nodes):
+        """Compute the entropy and surprisal of the given nodes."""
+        sizes = self._sizes[nodes]
+        parents = self._parents[nodes]
+        has_parent = parents >= 0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            uniform_entropy = np.log2(sizes)
+            uniform_surprisal = (np.log2(self._sizes[np.where(has_parent, parents, 0)]) -
+                                 uniform_entropy)
+        uniform_surprisal[~has_parent] = np.nan
+        self._uniform_entropy[nodes] = uniform_entropy
+        self._uniform_surprisal[nodes] = uniform_surprisal
+        self._freq_entropy[nodes], self._freq_surprisal[nodes] = _freq_stats(
+            self._freqs, self._plogp, self._sizes, self._parents, nodes)
+
+    def _grow(self):
+        """Extend the arrays with any nodes added to the trie."""
+        start = len(self._parents)
+        end = self._trie.n_nodes
+        if start == end:
+            return
+        new = end - start
+        self._parents = np.concatenate([self._parents, self._trie.parents[start:end]])
+        self._sizes = np.concatenate([self._sizes, np.zeros(new)])
+        self._freqs = np.concatenate([self._freqs, np.zeros(new)])
+        self._plogp = np.concatenate([self._plogp, np.zeros(new)])
+        self._uniform_entropy = np.concatenate([self._uniform_entropy, np.zeros(new)])
+        self._freq_entropy = np.concatenate([self._freq_entropy, np.zeros(new)])
+        self._uniform_surprisal = np.concatenate([self._uniform_surprisal, np.zeros(new)])
+        self._freq_surprisal = np.concatenate([self._freq_surprisal, np.zeros(new)])
+
+    def _update_path(self, node, old_freq):
+        """Update the statistics changed by a word at node that had old_freq."""
+        self._grow()
+        trie = self._trie
+        path = []
+        while node >= 0:
+            path.append(node)
+            node = trie.parents[node]
+        self._sizes[path] = [trie.sizes[step] for step in path]
+        self._freqs[path] = [trie.freqs[step] for step in path]
+        self._plogp[path] += _plogp(trie.word_freqs[path[0]]) - _plogp(old_freq)
+        # The surprisal of each child of the path depends on its parent
+        children = [child for step in path for child in trie.children(step)]
+        self._compute(np.array(path + children, dtype=np.int64))
+
+    def insert(self, word, freq=1):
+        """Add a word with a frequency to the trie and update the statistics.
+
+        Only the prefixes of the word and their children are updated.
+        """
+        old_freq = self._trie.freq(word)
+        self._update_path(self._trie.insert(word, freq), old_freq)
+
+    def remove(self, word):
+        """Remove a word from the trie and update the statistics.
+
+        KeyError is raised if the word is not present.
+        """
+        old_freq = self._trie.freq(word)
+        self._update_path(self._trie.remove(word), old_freq)
+
+    def reweight(self, word, freq):
+        """Set the frequency of a word in the trie and update the statistics.
+
+        KeyError is raised if the word is not present.
+        """
+        old_freq = self._trie.freq(word)
+        self._update_path(self._trie.reweight(word, freq), old_freq)
+
+    @property
+    def uniform_entropies(self):
+        """Return the entropy of each node if all words were equally frequent."""
+        return self._uniform_entropy
+
+    @property
+    def freq_entropies(self):
+        """Return the entropy of each node using word frequencies."""
+        return self._freq_entropy
+
+    @property
+    def uniform_surprisals(self):
+        """Return the surprisal of each node if all words were equally frequent."""
+        return self._uniform_surprisal
+
+    @property
+    def freq_surprisals(self):
+        """Return the surprisal of each node using word frequencies."""
+        return self._freq_surprisal
+
+    def _node(self, prefix):
+        """Return the node of a prefix, raising KeyError if it is absent."""
+        node = self._trie.find(prefix)
+        if node < 0:
+            raise KeyError(prefix)
+        return node
+
+    def uniform_entropy(self, prefix):
+        """Return the uniform entropy of a prefix."""
+        return float(self._uniform_entropy[self._node(prefix)])
+
+    def freq_entropy(self, prefix):
+        """Return the frequency-weighted entropy of a prefix."""
+        return float(self._freq_entropy[self._node(prefix)])
+
+    def uniform_surprisal(self, prefix):
+        """Return the uniform surprisal of a prefix."""
+        return float(self._uniform_surprisal[self._node(prefix)])
+
+    def freq_surprisal(self, prefix):
+        """Return the frequency-weighted surprisal of a prefix."""
+        return float(self._freq_surprisal[self._node(prefix)])
+
+    def uniqueness_point(self, word):
+        """Return the zero-indexed uniqueness point of a word."""
+        return self._trie.uniqueness_point(word)
+
+    def prefix_nodes(self):
+        """Return a sorted list of (prefix, node) pairs for every non-empty prefix."""
+        trie = self._trie
+        return sorted((trie.prefix(node), node) for node in xrange(1, trie.n_nodes)
+                      if trie.sizes[node])
+
+    def prefix_rows(self):
+        """Return an iterator over the statistics of every non-empty prefix.
+
+        Each row contains the prefix, its uniform and frequency
+        entropy, and its uniform and frequency surprisal, and rows are
+        sorted by prefix.
+        """
+        columns = [self._uniform_entropy, self._freq_entropy,
+                   self._uniform_surprisal, self._freq_surprisal]
+        for prefix, node in self.prefix_nodes():
+            yield [prefix] + [float(column[node]) for column in columns]
+
+    def word_rows(self, word):
+        """Return the statistics of each non-empty prefix of a word.
+
+        Four lists are returned, with one value per prefix: uniform
+        entropy, frequency entropy, uniform surprisal and frequency
+        surprisal.
+        """
+        nodes = self._trie.path(word)
+        return (self._uniform_entropy[nodes].tolist(), self._freq_entropy[nodes].tolist(),
+                self._uniform_surprisal[nodes].tolist(), self._freq_surprisal[nodes].tolist())
+
+
+class NormStats(object):
+
+    """Frequency-weighted cohort statistics under several frequency norms.
+
+    The trie gives the structure of the cohorts, and freqs gives the
+    frequency of each word under each norm, with one row per word and
+    one column per norm. Frequencies in the trie itself are not used.
+    All norms are computed at once as columns of arrays with one row
+    per trie node. If processes is not 1, the norms are split across
+    that many worker processes, or one per CPU if it is None.
+
+    >>> trie = PrefixTrie(["cat", "cats", "in"])
+    >>> stats = NormStats(trie, ["cat", "cats", "in"], [[3, 1], [1, 1], [4, 2]])
+    >>> stats.n_norms
+    2
+    >>> [round(entropy, 4) for entropy in stats.freq_entropy("ca")]
+    [0.8113, 1.0]
+    >>> stats.freq_surprisal("c").tolist()
+    [1.0, 1.0]
+
+    """
+
+    def __init__(self, trie, words, freqs, processes=1):
+        self._trie = trie
+        freqs = np.asarray(freqs, dtype=np.float64)
+        if freqs.ndim == 1:
+            freqs = freqs[:, np.newaxis]
+        words = list(words)
+        if len(words) != len(freqs):
+            raise ValueError("Words and frequencies are not the same length")
+        nodes = np.array([trie.find(word) for word in words], dtype=np.int64)
+        if len(nodes) and ((nodes < 0).any() or
+                           any(trie.words[node] is None for node in nodes.tolist())):
+            raise ValueError("Not all words are in the trie")
+        word_freqs = np.zeros((trie.n_nodes, freqs.shape[1]))
+        np.add.at(word_freqs, nodes, freqs)
+
+        structure = (np.array(trie.parents, dtype=np.int64), _levels(trie.depths),
+                     np.array(trie.sizes, dtype=np.float64))
+        n_norms = freqs.shape[1]
+        if processes == 1 or n_norms == 1:
+            _init_worker(structure)
+            pool = None
+            jobs = [word_freqs]
+            results = imap(_norm_stats, jobs)
+        else:
+            pool = Pool(processes, _init_worker, (structure,))
+            n_jobs = min(n_norms, processes or cpu_count())
+            jobs = [word_freqs[:, cols] for cols in np.array_split(np.arange(n_norms), n_jobs)]
+            results = pool.imap(_norm_stats, jobs)
+        try:
+            results = list(results)
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+        self._freqs, self._freq_entropy, self._freq_surprisal = [
+            np.hstack(parts) for parts in zip(*results)]
+
+    @property
+    def trie(self):
+        """Return the trie the statistics are computed over."""
+        return self._trie
+
+    @property
+    def n_norms(self):
+        """Return the number of frequency norms."""
+        return self._freqs.shape[1]
+
+    @property
+    def freqs(self):
+        """Return the cohort frequency of each node under each norm."""
+        return self._freqs
+
+    @property
+    def freq_entropies(self):
+        """Return the entropy of each node under each norm."""
+        return self._freq_entropy
+
+    @property
+    def freq_surprisals(self):
+        """Return the surprisal of each node under each norm."""
+        return self._freq_surprisal
+
+    def _node(self, prefix):
+        """Return the node of a prefix, raising KeyError if it is absent."""
+        node = self._trie.find(prefix)
+        if node < 0:
+            raise KeyError(prefix)
+        return node
+
+    def freq_entropy(self, prefix):
+        """Return an array of the entropy of a prefix under each norm."""
+        return self._freq_entropy[self._node(prefix)]
+
+    def freq_surprisal(self, prefix):
+        """Return an array of the surprisal of a prefix under each norm."""
+        return self._freq_surprisal[self._node(prefix)]
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
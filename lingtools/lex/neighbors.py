@@ -0,0 +1,209 @@
+"""
+Phonological neighbors of words in a lexicon.
+
+Two words are neighbors if one can be made from the other by
+substituting, adding or deleting a single segment. Rather than
+comparing every pair of words, each word is indexed under every string
+made by deleting one of its segments:
+
+    Words of the same length that differ by one substitution at
+    position i are both indexed under the same string with position i
+    deleted.
+
+    A word that is one segment longer than another is indexed under
+    the shorter word itself.
+
+so all neighbors are found by looking up a word's deletions and the
+word itself.
+
+"""
+
+# Copyright 2014 Constantine Lignos
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from collections import defaultdict
+
+
+def _key(pron):
+    """Return a hashable form of a pronunciation."""
+    return tuple(pron) if isinstance(pron, list) else pron
+
+
+def deletions(pron):
+    """Return each string made by deleting one segment, with its position.
+
+    >>> deletions("cat")
+    [(0, 'at'), (1, 'ct'), (2, 'ca')]
+
+    """
+    return [(idx, pron[:idx] + pron[idx + 1:]) for idx in range(len(pron))]
+
+
+class NeighborIndex(object):
+
+    """An index of the edit-distance-one neighbors of pronunciations.
+
+    Pronunciations are strings of one-character segments or sequences
+    of segments, such as the lists of ARPAbet phonemes in CMUDict;
+    lists are stored as tuples. Each pronunciation is stored once, and
+    the frequencies of repeated pronunciations are added.
+
+    >>> index = NeighborIndex(["kat", "bat", "at", "kast", "tak"], [5, 1, 2, 1, 3])
+    >>> sorted(index.neighbors("kat"))
+    ['at', 'bat', 'kast']
+    >>> index.count("kat"), index.density("kat"), index.density("tak")
+    (3, 4, 0)
+    >>> sorted(index.neighbors("bit"))
+    ['bat']
+
+    """
+
+    def __init__(self, prons, freqs=None):
+        """Create an index of pronunciations with their frequencies.
+
+        If freqs is None, every pronunciation has a frequency of one.
+        """
+        self._ids = {}
+        self._prons = []
+        self._freqs = []
+        prons = [_key(pron) for pron in prons]
+        if freqs is None:
+            freqs = [1] * len(prons)
+        else:
+            freqs = list(freqs)
+            if len(prons) != len(freqs):
+                raise ValueError("Pronunciations and frequencies are not the same length")
+
+        for pron, freq in zip(prons, freqs):
+            idx = self._ids.get(pron)
+            if idx is None:
+                self._ids[pron] = len(self._prons)
+                self._prons.append(pron)
+                self._freqs.append(freq)
+            else:
+                self._freqs[idx] += freq
+
+        # Map each deletion to the ids and positions it was made from
+        self._deletions = defaultdict(list)
+        for idx, pron in enumerate(self._prons):
+            for pos, deletion in deletions(pron):
+                self._deletions[deletion].append((idx, pos))
+        self._neighbors = None
+
+    @property
+    def prons(self):
+        """Return the list of pronunciations in the index."""
+        return self._prons
+
+    def freq(self, pron):
+        """Return the frequency of a pronunciation, or zero if it is absent."""
+        idx = self._ids.get(_key(pron))
+        return self._freqs[idx] if idx is not None else 0
+
+    def _neighbor_ids(self, pron):
+        """Return the set of ids of the neighbors of a pronunciation."""
+        ids = self._ids
+        index = self._deletions
+        found = set()
+        for pos, deletion in deletions(pron):
+            # Deletions that are words
+            idx = ids.get(deletion)
+            if idx is not None:
+                found.add(idx)
+            # Substitutions at the same position
+            found.update(other for other, other_pos in index.get(deletion, ())
+                         if other_pos == pos)
+        # Additions
+        found.update(other for other, _ in index.get(pron, ()))
+        found.discard(ids.get(pron))
+        return found
+
+    def neighbors(self, pron):
+        """Return the set of neighbors of a pronunciation.
+
+        The pronunciation does not need to be in the index, and it is
+        never its own neighbor.
+        """
+        prons = self._prons
+        return set(prons[idx] for idx in self._neighbor_ids(_key(pron)))
+
+    def count(self, pron):
+        """Return the number of neighbors of a pronunciation."""
+        return len(self._neighbor_ids(_key(pron)))
+
+    def density(self, pron):
+        """Return the total frequency of the neighbors of a pronunciation."""
+        freqs = self._freqs
+        return sum(freqs[idx] for idx in self._neighbor_ids(_key(pron)))
+
+    def _all_neighbor_ids(self):
+        """Return a list of the set of neighbor ids of every pronunciation."""
+        if self._neighbors is not None:
+            return self._neighbors
+
+        # Every neighbor pair shares a deletion bucket, so each bucket
+        # is visited once instead of looking up each word.
+        neighbors = [set() for _ in self._prons]
+        ids = self._ids
+        for deletion, entries in self._deletions.iteritems():
+            # The deletion itself is a word, so it neighbors every entry
+            idx = ids.get(deletion)
+            if idx is not None:
+                for other, _ in entries:
+                    neighbors[idx].add(other)
+                    neighbors[other].add(idx)
+            if len(entries) < 2:
+                continue
+            by_pos = defaultdict(list)
+            for other, pos in entries:
+                by_pos[pos].append(other)
+            for group in by_pos.itervalues():
+                if len(group) < 2:
+                    continue
+                for other in group:
+                    neighbors[other].update(group)
+                    neighbors[other].discard(other)
+        self._neighbors = neighbors
+        return neighbors
+
+    def all_neighbors(self):
+        """Return a dictionary of every pronunciation to its set of neighbors."""
+        prons = self._prons
+        return dict((pron, set(prons[idx] for idx in neighbor_ids))
+                    for pron, neighbor_ids in zip(prons, self._all_neighbor_ids()))
+
+    def counts(self):
+        """Return a dictionary of every pronunciation to its number of neighbors."""
+        return dict((pron, len(neighbor_ids))
+                    for pron, neighbor_ids in zip(self._prons, self._all_neighbor_ids()))
+
+    def densities(self):
+        """Return a dictionary of every pronunciation to the frequency of its neighbors."""
+        freqs = self._freqs
+        return dict((pron, sum(freqs[idx] for idx in neighbor_ids))
+                    for pron, neighbor_ids in zip(self._prons, self._all_neighbor_ids()))
+
+    def __contains__(self, pron):
+        return _key(pron) in self._ids
+
+    def __len__(self):
+        return len(self._prons)
+
+    def __iter__(self):
+        return iter(self._prons)
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
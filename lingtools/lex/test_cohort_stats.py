@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+"""
+Test the cohort_stats module.
+"""
+
+# Copyright 2014 Constantine Lignos
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import math
+import random
+import unittest
+
+import numpy as np
+
+from lingtools.lex.cohort import make_prefix_dict, prefixes, uniqueness_point
+from lingtools.lex.cohort_stats import CohortStats, NormStats
+from lingtools.lex.test_trie import random_lexicon
+from lingtools.prob.probability import entropy, normalize_counts, surprisal
+
+
+class TestCohortStats(unittest.TestCase):
+    """Test cohort statistics against per-cohort computation."""
+
+    def setUp(self):  # pylint: disable=C0103
+        self.lexicon = random_lexicon(500)
+        self.stats = CohortStats.from_lexicon(self.lexicon)
+        self.prefix_dict = make_prefix_dict(self.lexicon)
+        self.prefix_dict[""] = list(self.lexicon)
+
+    def _totals(self, prefix):
+        """Return the size and total frequency of a prefix's cohort."""
+        words = self.prefix_dict[prefix]
+        return len(words), sum(self.lexicon[word] for word in words)
+
+    def test_entropy(self):
+        """Entropies match the entropy of each cohort."""
+        for prefix, words in self.prefix_dict.iteritems():
+            freqs = [self.lexicon[word] for word in words]
+            self.assertAlmostEqual(self.stats.freq_entropy(prefix),
+                                   entropy(normalize_counts(freqs)))
+            self.assertAlmostEqual(self.stats.uniform_entropy(prefix),
+                                   entropy(normalize_counts([1] * len(words))))
+            self.assertGreaterEqual(self.stats.freq_entropy(prefix), 0.0)
+
+    def test_surprisal(self):
+        """Surprisals match the surprisal of each prefix given the one before."""
+        for prefix in self.prefix_dict:
+            if not prefix:
+                self.assertTrue(math.isnan(self.stats.freq_surprisal(prefix)))
+                continue
+            size, total = self._totals(prefix)
+            parent_size, parent_total = self._totals(prefix[:-1])
+            self.assertAlmostEqual(self.stats.uniform_surprisal(prefix),
+                                   surprisal(size, parent_size))
+            self.assertAlmostEqual(self.stats.freq_surprisal(prefix),
+                                   surprisal(total, parent_total))
+
+    def test_rows(self):
+        """Prefix and word rows agree with the per-prefix statistics."""
+        rows = list(self.stats.prefix_rows())
+        self.assertEqual([row[0] for row in rows],
+                         sorted(prefix for prefix in self.prefix_dict if prefix))
+        for row in rows:
+            self.assertEqual(row[1:], [self.stats.uniform_entropy(row[0]),
+                                       self.stats.freq_entropy(row[0]),
+                                       self.stats.uniform_surprisal(row[0]),
+                                       self.stats.freq_surprisal(row[0])])
+        for word in self.lexicon:
+            word_rows = self.stats.word_rows(word)
+            self.assertEqual(word_rows[1], [self.stats.freq_entropy(prefix)
+                                            for prefix in prefixes(word)])
+            self.assertEqual(self.stats.uniqueness_point(word),
+                             uniqueness_point([len(self.prefix_dict[prefix])
+                                               for prefix in prefixes(word)]))
+
+    def test_backward(self):
+        """Backward statistics are forward statistics over reversed words."""
+        backward = CohortStats.from_lexicon(self.lexicon, backward=True)
+        reversed_stats = CohortStats.from_lexicon(
+            dict((word[::-1], freq) for word, freq in self.lexicon.iteritems()))
+        for word in self.lexicon:
+            np.testing.assert_allclose(backward.word_rows(word),
+                                       reversed_stats.word_rows(word[::-1]))
+            self.assertEqual(backward.uniqueness_point(word),
+                             reversed_stats.uniqueness_point(word[::-1]))
+
+    def test_incremental(self):
+        """Updating words gives the same statistics as rebuilding."""
+        rand = random.Random(1)
+        lexicon = dict(self.lexicon)
+        for new_word in random_lexicon(50, seed=2):
+            action = rand.choice(["insert", "remove", "reweight"])
+            word = rand.choice(sorted(lexicon))
+            if action == "insert":
+                freq = rand.randint(1, 10)
+                self.stats.insert(new_word, freq)
+                lexicon[new_word] = lexicon.get(new_word, 0) + freq
+            elif action == "remove":
+                self.stats.remove(word)
+                del lexicon[word]
+            else:
+                freq = rand.randint(1, 100)
+                self.stats.reweight(word, freq)
+                lexicon[word] = freq
+
+        rebuilt = CohortStats.from_lexicon(lexicon)
+        rows = list(self.stats.prefix_rows())
+        rebuilt_rows = list(rebuilt.prefix_rows())
+        self.assertEqual([row[0] for row in rows], [row[0] for row in rebuilt_rows])
+        np.testing.assert_allclose([row[1:] for row in rows],
+                                   [row[1:] for row in rebuilt_rows], atol=1e-9)
+        for word in lexicon:
+            self.assertEqual(self.stats.uniqueness_point(word), rebuilt.uniqueness_point(word))
+        self.assertRaises(KeyError, self.stats.remove, "xyz")
+
+    def test_missing(self):
+        """Prefixes no word begins with raise KeyError."""
+        self.assertRaises(KeyError, self.stats.freq_entropy, "xyz")
+
+
+class TestNormStats(unittest.TestCase):
+    """Test statistics under several norms against one norm at a time."""
+
+    def setUp(self):  # pylint: disable=C0103
+        rand = random.Random(0)
+        self.words = sorted(random_lexicon(300))
+        self.freqs = [[rand.randint(1, 50) for _ in range(3)] for _ in self.words]
+        self.stats = CohortStats.from_lexicon(dict.fromkeys(self.words, 1))
+
+    def _check(self, norm_stats):
+        """Check that each norm matches CohortStats with its frequencies."""
+        self.assertEqual(norm_stats.n_norms, 3)
+        for col in range(3):
+            single = CohortStats.from_lexicon(
+                dict((word, freqs[col]) for word, freqs in zip(self.words, self.freqs)))
+            np.testing.assert_allclose(norm_stats.freq_entropies[:, col], single.freq_entropies)
+            np.testing.assert_allclose(norm_stats.freq_surprisals[:, col],
+                                       single.freq_surprisals)
+            np.testing.assert_allclose(norm_stats.freqs[:, col], single.trie.freqs)
+
+    def test_norms(self):
+        """Norms computed together match norms computed separately."""
+        self._check(NormStats(self.stats.trie, self.words, self.freqs))
+
+    def test_processes(self):
+        """Norms computed in separate processes match."""
+        self._check(NormStats(self.stats.trie, self.words, self.freqs, processes=2))
+
+    def test_errors(self):
+        """Words must be in the trie and match the frequencies."""
+        self.assertRaises(ValueError, NormStats, self.stats.trie, ["xyz"], [[1, 2, 3]])
+        self.assertRaises(ValueError, NormStats, self.stats.trie, self.words, [[1]])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+"""
+Test the neighbors module.
+"""
+
+# Copyright 2014 Constantine Lignos
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+from lingtools.lex.neighbors import NeighborIndex
+from lingtools.lex.test_trie import random_lexicon
+
+
+def edit_distance(first, second):
+    """Return the Levenshtein distance between two sequences."""
+    row = range(len(second) + 1)
+    for idx1, seg1 in enumerate(first):
+        prev_row = row
+        row = [idx1 + 1]
+        for idx2, seg2 in enumerate(second):
+            row.append(min(prev_row[idx2 + 1] + 1, row[idx2] + 1,
+                           prev_row[idx2] + (seg1 != seg2)))
+    return row[-1]
+
+
+class TestNeighborIndex(unittest.TestCase):
+    """Test neighbor indexes against pairwise edit distances."""
+
+    def setUp(self):  # pylint: disable=C0103
+        self.lexicon = random_lexicon(300)
+        self.index = NeighborIndex(self.lexicon.keys(), self.lexicon.values())
+        self.expected = dict((word, set(other for other in self.lexicon
+                                        if edit_distance(word, other) == 1))
+                             for word in self.lexicon)
+
+    def test_neighbors(self):
+        """Neighbors of each word are the words at edit distance one."""
+        for word, expected in self.expected.iteritems():
+            self.assertEqual(self.index.neighbors(word), expected)
+            self.assertEqual(self.index.count(word), len(expected))
+            self.assertEqual(self.index.density(word),
+                             sum(self.lexicon[other] for other in expected))
+
+    def test_all_neighbors(self):
+        """Neighbors of all words computed at once match pairwise comparison."""
+        self.assertEqual(self.index.all_neighbors(), self.expected)
+        self.assertEqual(self.index.counts(), dict((word, len(expected)) for word, expected
+                                                   in self.expected.iteritems()))
+        densities = self.index.densities()
+        for word, expected in self.expected.iteritems():
+            self.assertEqual(densities[word], sum(self.lexicon[other] for other in expected))
+
+    def test_unknown(self):
+        """Words not in the index have neighbors in it."""
+        for word in ["pata", "ktk", "eeeeeee"]:
+            self.assertFalse(word in self.index)
+            self.assertEqual(self.index.neighbors(word),
+                             set(other for other in self.lexicon
+                                 if edit_distance(word, other) == 1))
+
+    def test_sequences(self):
+        """Pronunciations can be lists of phonemes, and repeats are combined."""
+        index = NeighborIndex([["K", "AE1", "T"], ["B", "AE1", "T"], ["K", "AE1", "T"],
+                               ["K", "AE1", "T", "S"]])
+        self.assertEqual(len(index), 3)
+        self.assertEqual(index.freq(["K", "AE1", "T"]), 2)
+        self.assertEqual(index.neighbors(["K", "AE1", "T"]),
+                         set([("B", "AE1", "T"), ("K", "AE1", "T", "S")]))
+        self.assertEqual(index.counts()[("K", "AE1", "T", "S")], 1)
+        self.assertRaises(ValueError, NeighborIndex, ["a"], [1, 2])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+"""
+Test the trie module.
+"""
+
+# Copyright 2014 Constantine Lignos
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import random
+import unittest
+from collections import defaultdict
+
+from lingtools.lex.cohort import make_prefix_dict, prefixes, suffixes, uniqueness_point
+from lingtools.lex.trie import PrefixTrie, SuffixTrie
+from lingtools.util.symbols import SymbolTable
+
+
+def random_lexicon(size, seed=0):
+    """Return a dictionary of random pronunciations to frequencies."""
+    rand = random.Random(seed)
+    lexicon = {}
+    while len(lexicon) < size:
+        pron = "".join(rand.choice("ptkaeiou") for _ in range(rand.randint(1, 6)))
+        lexicon[pron] = rand.randint(1, 100)
+    return lexicon
+
+
+class TestPrefixTrie(unittest.TestCase):
+    """Test prefix tries against prefix dictionaries."""
+
+    def setUp(self):  # pylint: disable=C0103
+        self.lexicon = random_lexicon(500)
+        self.trie = PrefixTrie(self.lexicon.keys(), self.lexicon.values())
+
+    def test_cohorts(self):
+        """Cohort sizes, frequencies and members match a prefix dictionary."""
+        prefix_dict = make_prefix_dict(self.lexicon)
+        for prefix, words in prefix_dict.iteritems():
+            self.assertEqual(self.trie.cohort_size(prefix), len(words))
+            self.assertEqual(self.trie.cohort_freq(prefix),
+                             sum(self.lexicon[word] for word in words))
+            self.assertEqual(sorted(self.trie.cohort(prefix)), sorted(words))
+            self.assertEqual(self.trie.prefix(self.trie.find(prefix)), prefix)
+        self.assertEqual(self.trie.cohort_size(""), len(self.lexicon))
+        self.assertEqual(list(self.trie.cohort("xyz")), [])
+        self.assertEqual(sorted(self.trie), sorted(self.lexicon))
+
+    def test_uniqueness_point(self):
+        """Uniqueness points match those computed from a prefix dictionary."""
+        prefix_dict = make_prefix_dict(self.lexicon)
+        for word in self.lexicon:
+            counts = [len(prefix_dict[prefix]) for prefix in prefixes(word)]
+            self.assertEqual(self.trie.cohort_sizes(word), counts)
+            self.assertEqual(self.trie.uniqueness_point(word), uniqueness_point(counts))
+
+    def test_insert(self):
+        """Inserting a word again only adds to its frequency."""
+        trie = PrefixTrie(["ab", "ac"], [1, 2])
+        trie.insert("ab", 4)
+        self.assertEqual(len(trie), 2)
+        self.assertEqual(trie.freq("ab"), 5)
+        self.assertEqual(trie.cohort_size("a"), 2)
+        self.assertEqual(trie.cohort_freq("a"), 7)
+        self.assertRaises(ValueError, trie.insert, "")
+        self.assertRaises(ValueError, PrefixTrie, ["ab"], [1, 2])
+
+    def test_remove(self):
+        """Removed words leave their prefixes only if other words share them."""
+        trie = PrefixTrie(["ab", "abc", "ad"], [1, 2, 3])
+        trie.remove("abc")
+        self.assertEqual(len(trie), 2)
+        self.assertFalse("abc" in trie)
+        self.assertEqual(trie.cohort_size("abc"), 0)
+        self.assertEqual(trie.path("abc"), trie.path("ab"))
+        self.assertEqual((trie.cohort_size("a"), trie.cohort_freq("a")), (2, 4))
+        self.assertEqual(sorted(trie.cohort("a")), ["ab", "ad"])
+        self.assertRaises(KeyError, trie.remove, "abc")
+        self.assertRaises(KeyError, trie.remove, "a")
+        # The node is reused if the word is inserted again
+        n_nodes = trie.n_nodes
+        trie.insert("abc", 5)
+        self.assertEqual(trie.n_nodes, n_nodes)
+        self.assertEqual(trie.cohort_freq("ab"), 6)
+
+    def test_reweight(self):
+        """Reweighting a word changes the frequencies of its prefixes."""
+        trie = PrefixTrie(["ab", "ac"], [1, 2])
+        trie.reweight("ab", 10)
+        self.assertEqual(trie.freq("ab"), 10)
+        self.assertEqual(trie.cohort_freq("a"), 12)
+        self.assertEqual(trie.cohort_size("a"), 2)
+        self.assertRaises(KeyError, trie.reweight, "ad", 1)
+
+    def test_sequences(self):
+        """Words can be tuples of segments and share a symbol table."""
+        symbols = SymbolTable()
+        first = PrefixTrie([("K", "AE1", "T"), ("K", "AA1", "T")], symbols=symbols)
+        second = PrefixTrie([("T", "AE1", "K")], symbols=symbols)
+        self.assertTrue(first.symbols is second.symbols)
+        self.assertEqual(first.cohort_size(("K",)), 2)
+        self.assertEqual(first.prefix(first.find(("K", "AE1"))), ("K", "AE1"))
+        self.assertEqual(second.uniqueness_point(("T", "AE1", "K")), 0)
+        self.assertEqual(len(symbols), 4)
+
+
+class TestSuffixTrie(unittest.TestCase):
+    """Test suffix tries against suffix dictionaries."""
+
+    def setUp(self):  # pylint: disable=C0103
+        self.lexicon = random_lexicon(500)
+        self.forward = PrefixTrie(self.lexicon.keys(), self.lexicon.values())
+        self.trie = SuffixTrie(self.lexicon.keys(), self.lexicon.values(),
+                               self.forward.symbols)
+        self.suffix_dict = defaultdict(list)
+        for word in self.lexicon:
+            for suffix in suffixes(word):
+                self.suffix_dict[suffix].append(word)
+
+    def test_cohorts(self):
+        """Cohort sizes, frequencies and members match a suffix dictionary."""
+        for suffix, words in self.suffix_dict.iteritems():
+            self.assertEqual(self.trie.cohort_size(suffix), len(words))
+            self.assertEqual(self.trie.cohort_freq(suffix),
+                             sum(self.lexicon[word] for word in words))
+            self.assertEqual(sorted(self.trie.cohort(suffix)), sorted(words))
+            self.assertEqual(self.trie.prefix(self.trie.find(suffix)), suffix)
+        self.assertEqual(sorted(self.trie), sorted(self.lexicon))
+        self.assertTrue(all(word in self.trie for word in self.lexicon))
+
+    def test_uniqueness_point(self):
+        """Backward uniqueness points count from the end of the word."""
+        for word in self.lexicon:
+            counts = [len(self.suffix_dict[suffix]) for suffix in suffixes(word)]
+            self.assertEqual(self.trie.cohort_sizes(word), counts)
+            self.assertEqual(self.trie.uniqueness_point(word), uniqueness_point(counts))
+
+    def test_shared_symbols(self):
+        """Both directions intern segments in one table."""
+        self.assertTrue(self.trie.symbols is self.forward.symbols)
+        self.assertEqual(len(self.trie.symbols), len(set("".join(self.lexicon))))
+
+
+if __name__ == '__main__':
+    unittest.main()
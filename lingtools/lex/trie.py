@@ -0,0 +1,368 @@
+"""
+A prefix trie over a lexicon for cohort analysis.
+
+Each node of the trie is a prefix, and its cohort is the set of words
+that begin with it. Instead of storing the cohort of every prefix,
+each node stores the size and total frequency of its cohort, so these
+can be looked up by walking down the trie, and the members of a
+cohort are found by traversing below its node.
+
+A SuffixTrie is a trie over words read from the end, for suffix
+cohorts, and can share its symbols with a PrefixTrie over the same
+lexicon.
+
+"""
+
+# Copyright 2014 Constantine Lignos
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from lingtools.util.symbols import SymbolTable
+
+# The node for the empty prefix, whose cohort is the whole lexicon
+ROOT = 0
+
+
+class PrefixTrie(object):
+
+    """A trie of words with the size and frequency of each prefix's cohort.
+
+    Words are sequences of segments, such as strings of one-character
+    phonemes or tuples of ARPAbet phonemes, and segments are interned
+    in a SymbolTable that may be shared with other tries. Each word is
+    stored once, so a word that is inserted again only has its
+    frequency increased.
+
+    >>> trie = PrefixTrie(["cat", "cats", "in", "into"], [3, 1, 5, 2])
+    >>> trie.cohort_size("ca"), trie.cohort_freq("ca")
+    (2, 4)
+    >>> sorted(trie.cohort("in"))
+    ['in', 'into']
+    >>> trie.cohort_sizes("cats")
+    [2, 2, 2, 1]
+    >>> trie.uniqueness_point("cats"), trie.uniqueness_point("cat")
+    (3, 2)
+    >>> trie.cohort_size(""), trie.cohort_size("dog")
+    (4, 0)
+    >>> "cat" in trie, "ca" in trie, len(trie)
+    (True, False, 4)
+    >>> node = trie.remove("cats")
+    >>> node = trie.reweight("cat", 1)
+    >>> trie.cohort_size("ca"), trie.cohort_freq("ca"), trie.cohort_size("cats")
+    (1, 1, 0)
+
+    """
+
+    def __init__(self, words=(), freqs=None, symbols=None):
+        """Create a trie containing words with their frequencies.
+
+        If freqs is None, every word has a frequency of one. If
+        symbols is given, it is used to intern segments.
+        """
+        self._symbols = symbols if symbols is not None else SymbolTable()
+        # Per-node attributes, indexed by node
+        self._parents = [-1]
+        self._labels = [-1]
+        self._depths = [0]
+        self._children = [{}]
+        self._sizes = [0]
+        self._freqs = [0]
+        # The word ending at each node and its own frequency
+        self._words = [None]
+        self._word_freqs = [0]
+        # Whether words are strings, which determines how prefixes are
+        # rebuilt from segments
+        self._strings = None
+        self._n_words = 0
+
+        if freqs is None:
+            for word in words:
+                self.insert(word)
+        else:
+            words = list(words)
+            freqs = list(freqs)
+            if len(words) != len(freqs):
+                raise ValueError("Words and frequencies are not the same length")
+            for word, freq in zip(words, freqs):
+                self.insert(word, freq)
+
+    @property
+    def symbols(self):
+        """Return the SymbolTable used to intern segments."""
+        return self._symbols
+
+    # The per-node lists below are indexed by node and should not be
+    # modified; they are exposed for computing statistics over all
+    # nodes at once.
+
+    @property
+    def n_nodes(self):
+        """Return the number of nodes, including the root."""
+        return len(self._parents)
+
+    @property
+    def parents(self):
+        """Return the parent of each node, which is -1 for the root."""
+        return self._parents
+
+    @property
+    def depths(self):
+        """Return the length of the prefix of each node."""
+        return self._depths
+
+    @property
+    def sizes(self):
+        """Return the cohort size of each node."""
+        return self._sizes
+
+    @property
+    def freqs(self):
+        """Return the cohort frequency of each node."""
+        return self._freqs
+
+    @property
+    def words(self):
+        """Return the word ending at each node, or None if there is none."""
+        return self._words
+
+    @property
+    def word_freqs(self):
+        """Return the frequency of the word ending at each node."""
+        return self._word_freqs
+
+    def _new_node(self, parent, label):
+        """Return a new child node of parent for a segment id."""
+        node = len(self._parents)
+        self._parents.append(parent)
+        self._labels.append(label)
+        self._depths.append(self._depths[parent] + 1)
+        self._children.append({})
+        self._sizes.append(0)
+        self._freqs.append(0)
+        self._words.append(None)
+        self._word_freqs.append(0)
+        self._children[parent][label] = node
+        return node
+
+    def _segments(self, word):
+        """Return the segments of a word in the order they are stored."""
+        return word
+
+    def insert(self, word, freq=1):
+        """Add a word with a frequency, returning the node it ends at.
+
+        If the word is already present, its frequency is increased.
+        """
+        if not len(word):
+            raise ValueError("Cannot insert an empty word")
+        if self._strings is None:
+            self._strings = isinstance(word, basestring)
+        intern = self._symbols.intern
+        node = ROOT
+        for segment in self._segments(word):
+            label = intern(segment)
+            child = self._children[node].get(label)
+            node = child if child is not None else self._new_node(node, label)
+
+        is_new = self._words[node] is None
+        if is_new:
+            self._words[node] = word
+            self._n_words += 1
+        self._word_freqs[node] += freq
+        self._add_to_path(node, int(is_new), freq)
+        return node
+
+    def _word_node(self, word):
+        """Return the node a word ends at, raising KeyError if it is absent."""
+        node = self.find(word)
+        if node < 0 or self._words[node] is None:
+            raise KeyError(word)
+        return node
+
+    def _add_to_path(self, node, size, freq):
+        """Add to the size and frequency of a node and all of its ancestors."""
+        sizes = self._sizes
+        freqs = self._freqs
+        parents = self._parents
+        while node >= 0:
+            sizes[node] += size
+            freqs[node] += freq
+            node = parents[node]
+
+    def remove(self, word):
+        """Remove a word, returning the node it ended at.
+
+        Nodes that no word begins with any more are kept, so they can
+        be reused, but are treated as absent. KeyError is raised if the
+        word is not present.
+        """
+        node = self._word_node(word)
+        self._add_to_path(node, -1, -self._word_freqs[node])
+        self._words[node] = None
+        self._word_freqs[node] = 0
+        self._n_words -= 1
+        return node
+
+    def reweight(self, word, freq):
+        """Set the frequency of a word, returning the node it ends at.
+
+        KeyError is raised if the word is not present.
+        """
+        node = self._word_node(word)
+        self._add_to_path(node, 0, freq - self._word_freqs[node])
+        self._word_freqs[node] = freq
+        return node
+
+    def children(self, node):
+        """Return the child nodes of a node."""
+        return self._children[node].values()
+
+    def find(self, prefix):
+        """Return the node for a prefix, or -1 if no word begins with it."""
+        get = self._symbols.get
+        node = ROOT
+        children = self._children
+        for segment in self._segments(prefix):
+            node = children[node].get(get(segment, -1), -1)
+            if node < 0:
+                return -1
+        return node if self._sizes[node] else -1
+
+    def path(self, word):
+        """Return the nodes for each non-empty prefix of a word, shortest first.
+
+        The path stops at the first prefix that no word begins with.
+        """
+        get = self._symbols.get
+        node = ROOT
+        children = self._children
+        nodes = []
+        for segment in self._segments(word):
+            node = children[node].get(get(segment, -1), -1)
+            if node < 0 or not self._sizes[node]:
+                break
+            nodes.append(node)
+        return nodes
+
+    def cohort_size(self, prefix):
+        """Return the number of words that begin with a prefix."""
+        node = self.find(prefix)
+        return self._sizes[node] if node >= 0 else 0
+
+    def cohort_freq(self, prefix):
+        """Return the total frequency of the words that begin with a prefix."""
+        node = self.find(prefix)
+        return self._freqs[node] if node >= 0 else 0
+
+    def cohort_sizes(self, word):
+        """Return the cohort size of each non-empty prefix of a word, shortest first."""
+        sizes = self._sizes
+        return [sizes[node] for node in self.path(word)]
+
+    def cohort_freqs(self, word):
+        """Return the cohort frequency of each non-empty prefix of a word, shortest first."""
+        freqs = self._freqs
+        return [freqs[node] for node in self.path(word)]
+
+    def uniqueness_point(self, word):
+        """Return the index of the first segment at which a word is unique.
+
+        As in lingtools.lex.cohort.uniqueness_point, the index of the
+        last segment is returned if the word never becomes unique and
+        -1 is returned if no word begins with its first segment.
+        """
+        sizes = self._sizes
+        nodes = self.path(word)
+        for idx, node in enumerate(nodes):
+            if sizes[node] == 1:
+                return idx
+        return len(nodes) - 1
+
+    def _iter_below(self, node):
+        """Return an iterator over the word nodes at or below a node."""
+        stack = [node]
+        children = self._children
+        words = self._words
+        while stack:
+            node = stack.pop()
+            if words[node] is not None:
+                yield node
+            stack.extend(children[node].itervalues())
+
+    def cohort(self, prefix):
+        """Return an iterator over the words that begin with a prefix.
+
+        Words are generated as the trie is traversed, so no list of
+        the cohort is built.
+        """
+        node = self.find(prefix)
+        if node < 0:
+            return iter(())
+        words = self._words
+        return (words[member] for member in self._iter_below(node))
+
+    def freq(self, word):
+        """Return the frequency of a word, or zero if it is not present."""
+        node = self.find(word)
+        return self._word_freqs[node] if node >= 0 else 0
+
+    def prefix(self, node):
+        """Return the prefix that a node represents."""
+        symbol = self._symbols.symbol
+        segments = []
+        while node != ROOT:
+            segments.append(symbol(self._labels[node]))
+            node = self._parents[node]
+        segments = self._segments(segments[::-1])
+        return "".join(segments) if self._strings or self._strings is None else tuple(segments)
+
+    def __contains__(self, word):
+        node = self.find(word)
+        return node >= 0 and self._words[node] is not None
+
+    def __len__(self):
+        return self._n_words
+
+    def __iter__(self):
+        words = self._words
+        return (words[node] for node in self._iter_below(ROOT))
+
+
+class SuffixTrie(PrefixTrie):
+
+    """A trie of words read from their last segment to their first.
+
+    Each node is a suffix, and its cohort is the set of words that end
+    with it. Suffixes are given and returned in their usual order, so
+    all queries are the same as for PrefixTrie with prefixes replaced
+    by suffixes, and paths and uniqueness points count from the end of
+    the word.
+
+    >>> forward = PrefixTrie(["cat", "bat", "cap"])
+    >>> backward = SuffixTrie(["cat", "bat", "cap"], symbols=forward.symbols)
+    >>> backward.cohort_sizes("cat")
+    [2, 2, 1]
+    >>> sorted(backward.cohort("at")), backward.uniqueness_point("cat")
+    (['bat', 'cat'], 2)
+    >>> backward.prefix(backward.find("at")), len(forward.symbols)
+    ('at', 5)
+
+    """
+
+    def _segments(self, word):
+        return word[::-1]
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,198 @@
+"""
+A columnar interval tier stored in NumPy arrays.
+
+"""
+
+# Copyright 2014 Constantine Lignos
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+
+from lingtools.phon.textgrid import Interval, IntervalTier
+from lingtools.util.symbols import SymbolTable
+
+
+class ArrayIntervalTier(object):
+
+    """An interval tier with its times in arrays and its marks interned.
+
+    Interval start and end times are kept in float64 arrays and marks
+    are kept as an array of codes into a SymbolTable, so lookups and
+    totals over many intervals are done with array operations. The
+    read-only interface of IntervalTier is supported, and iteration and
+    indexing create Interval objects as they are needed.
+
+    >>> tier = ArrayIntervalTier.from_arrays(
+    ...     [0.0, 0.5, 1.0], [0.5, 1.0, 1.25], ['K', 'AE1', 'K'], 'phones')
+    >>> tier.index_containing([0.25, 0.5, 1.1, 2.0]).tolist()
+    [0, 1, 2, -1]
+    >>> tier.indexContaining(0.75), tier[-1]
+    (1, Interval(1.0, 1.25, K))
+    >>> sorted(tier.label_durations().items())
+    [('AE1', 0.5), ('K', 0.75)]
+    >>> list(tier.time_slice(0.6, 1.1))
+    [Interval(0.5, 1.0, AE1), Interval(1.0, 1.25, K)]
+
+    """
+
+    def __init__(self, min_times, max_times, codes, symbols, name=None, minTime=0.,
+                 maxTime=None):
+        """Create a tier from arrays of interval times and mark codes.
+
+        Intervals must be sorted and must not overlap. Use from_arrays
+        or from_tier to build a tier from marks.
+        """
+        # pylint: disable=C0103
+        self.name = name
+        self.minTime = minTime
+        self.maxTime = maxTime
+        self._min_times = np.asarray(min_times, dtype=np.float64)
+        self._max_times = np.asarray(max_times, dtype=np.float64)
+        self._codes = np.asarray(codes, dtype=np.int32)
+        self._symbols = symbols
+        if not len(self._min_times) == len(self._max_times) == len(self._codes):
+            raise ValueError("Interval times and marks are not the same length")
+        if (self._max_times < self._min_times).any():
+            raise ValueError("Interval ends before it starts")
+        if (self._min_times[1:] < self._max_times[:-1]).any():
+            raise ValueError("Intervals are not sorted or overlap")
+
+    @classmethod
+    def from_arrays(cls, min_times, max_times, marks, name=None, minTime=0.,
+                    maxTime=None):
+        """Return a tier from sequences of interval times and marks."""
+        # pylint: disable=C0103
+        symbols = SymbolTable()
+        codes = np.fromiter((symbols.intern(mark) for mark in marks), dtype=np.int32)
+        return cls(min_times, max_times, codes, symbols, name, minTime, maxTime)
+
+    @classmethod
+    def from_tier(cls, tier):
+        """Return a tier with the same intervals as an IntervalTier."""
+        intervals = tier.intervals
+        return cls.from_arrays([interval.minTime for interval in intervals],
+                               [interval.maxTime for interval in intervals],
+                               [interval.mark for interval in intervals],
+                               tier.name, tier.minTime, tier.maxTime)
+
+    def to_tier(self):
+        """Return an IntervalTier with the same intervals."""
+        return IntervalTier.from_sorted(list(self), self.name, self.minTime, self.maxTime)
+
+    @property
+    def min_times(self):
+        """Return the array of interval start times."""
+        return self._min_times
+
+    @property
+    def max_times(self):
+        """Return the array of interval end times."""
+        return self._max_times
+
+    @property
+    def codes(self):
+        """Return the array of mark codes, which are ids in symbols."""
+        return self._codes
+
+    @property
+    def symbols(self):
+        """Return the SymbolTable of marks."""
+        return self._symbols
+
+    @property
+    def intervals(self):
+        """Return a list of the intervals as Interval objects."""
+        return list(self)
+
+    def marks(self):
+        """Return a list of the mark of each interval."""
+        symbols = self._symbols.symbols
+        return [symbols[code] for code in self._codes.tolist()]
+
+    def durations(self):
+        """Return an array of the duration of each interval."""
+        return self._max_times - self._min_times
+
+    def label_durations(self):
+        """Return a dictionary of each mark to the total duration of its intervals."""
+        totals = np.bincount(self._codes, weights=self.durations(),
+                             minlength=len(self._symbols))
+        return dict(zip(self._symbols.symbols, totals.tolist()))
+
+    def index_containing(self, times):
+        """Return an array of the index of the interval containing each time.
+
+        As in IntervalTier.indexContaining, a time on the boundary of
+        two intervals is in the later one, and the index is -1 for
+        times outside every interval.
+        """
+        times = np.asarray(times, dtype=np.float64)
+        indices = np.searchsorted(self._max_times, times, side='right')
+        found = indices < len(self._max_times)
+        safe = np.where(found, indices, 0)
+        found &= self._min_times[safe] <= times
+        return np.where(found, indices, -1)
+
+    def indexContaining(self, time):  # pylint: disable=C0103
+        """Return the index of the interval containing a time, or None."""
+        idx = int(self.index_containing(time))
+        return idx if idx >= 0 else None
+
+    def intervalContaining(self, time):  # pylint: disable=C0103
+        """Return the interval containing a time, or None."""
+        idx = self.indexContaining(time)
+        return self[idx] if idx is not None else None
+
+    def time_slice(self, start, end):
+        """Return a tier of the intervals that overlap the time from start to end.
+
+        The arrays of the returned tier are views of this tier's arrays.
+        """
+        first = np.searchsorted(self._max_times, start, side='right')
+        last = np.searchsorted(self._min_times, end, side='left')
+        last = max(first, last)
+        return ArrayIntervalTier(self._min_times[first:last], self._max_times[first:last],
+                                 self._codes[first:last], self._symbols, self.name,
+                                 self.minTime, self.maxTime)
+
+    def bounds(self):
+        """Return the start and end times of the tier."""
+        return self.minTime, (self.maxTime if self.maxTime is not None
+                              else float(self._max_times[-1]))
+
+    def __len__(self):
+        return len(self._codes)
+
+    def __getitem__(self, idx):
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError(idx)
+        return Interval(float(self._min_times[idx]), float(self._max_times[idx]),
+                        self._symbols.symbol(int(self._codes[idx])))
+
+    def __iter__(self):
+        symbols = self._symbols.symbols
+        for min_time, max_time, code in zip(self._min_times.tolist(),
+                                            self._max_times.tolist(),
+                                            self._codes.tolist()):
+            yield Interval(min_time, max_time, symbols[code])
+
+    def __str__(self):
+        return '<ArrayIntervalTier {0}, {1} intervals>'.format(self.name, len(self))
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
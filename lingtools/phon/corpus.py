@@ -0,0 +1,140 @@
+"""
+Loading of the phoneme tiers of a corpus of aligned TextGrids.
+
+Each item of the corpus is a file named <word>.TextGrid, where <word>
+is the orthographic form of the item. Files can be parsed in parallel
+with a pool of worker processes, and a file that cannot be read is
+reported without stopping the others from loading.
+
+"""
+
+# Copyright 2014 Constantine Lignos
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+from glob import glob
+from itertools import imap, izip
+from multiprocessing import Pool, cpu_count
+
+from lingtools.phon.textgrid import TextGrid
+
+PHONEME_TIER_NAMES = set(("phonemes", "phones"))
+
+
+def phoneme_tier(textgrid):
+    """Return the first tier corresponding to phonemes in a TextGrid."""
+    try:
+        return next(tier for tier in textgrid
+                    if tier.name.lower() in PHONEME_TIER_NAMES)
+    except StopIteration:
+        return None
+
+
+def textgrid_files(path):
+    """Return a sorted list of the TextGrid files in a directory or matching a glob.
+
+    In a directory, files with the extension "TextGrid" in any case are
+    returned. IOError is raised if path is not a directory and matches
+    no files.
+    """
+    if os.path.isdir(path):
+        return sorted(os.path.join(path, filename) for filename in os.listdir(path)
+                      if filename.lower().endswith(".textgrid"))
+    paths = glob(path)
+    if not paths:
+        raise IOError("No directory or files match {}".format(path))
+    return sorted(paths)
+
+
+def file_word(path):
+    """Return the word a TextGrid file is named for.
+
+    >>> file_word('stimuli/cat.TextGrid')
+    'cat'
+
+    """
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def _load_tier(path):
+    """Return the phoneme tier of a TextGrid file and an error message.
+
+    Exactly one of the tier and the error message is None.
+    """
+    textgrid = TextGrid(path)
+    try:
+        textgrid.read(path)
+    except (IOError, ValueError) as err:
+        return None, "Could not read TextGrid, skipping {}: {}".format(path, err)
+    tier = phoneme_tier(textgrid)
+    if not tier:
+        return None, "Could not read phoneme tier, skipping {}".format(path)
+    return tier, None
+
+
+def _chunk_size(n_paths, processes):
+    """Return the number of files to send to a worker at once."""
+    # Like Pool.map, give each worker about four chunks
+    return n_paths // (4 * (processes or cpu_count())) + 1
+
+
+def iter_phoneme_tiers(paths, processes=1, chunk_size=None):
+    """Yield the word, path, phoneme tier and error for each TextGrid file.
+
+    Files are parsed by processes worker processes, one per CPU if
+    processes is None, and results are yielded in the order of paths
+    as they become ready. Workers are sent chunk_size files at a time;
+    by default each worker gets about four chunks. If a file cannot be
+    read or has no phoneme tier, its tier is None and its error is a
+    message describing the problem; otherwise the error is None.
+    """
+    paths = list(paths)
+    if processes == 1:
+        pool = None
+        results = imap(_load_tier, paths)
+    else:
+        if chunk_size is None:
+            chunk_size = _chunk_size(len(paths), processes)
+        pool = Pool(processes)
+        results = pool.imap(_load_tier, paths, chunk_size)
+    try:
+        for path, (tier, error) in izip(paths, results):
+            yield file_word(path), path, tier, error
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+
+
+def load_phoneme_tiers(path, processes=1, chunk_size=None):
+    """Return a dictionary of words to phoneme tiers and a list of errors.
+
+    The TextGrids loaded are those in the directory or matching the
+    glob path, and the errors are messages for the files that could not
+    be loaded. Parallel loading is as in iter_phoneme_tiers.
+    """
+    word_tiers = {}
+    errors = []
+    for word, _, tier, error in iter_phoneme_tiers(textgrid_files(path), processes,
+                                                   chunk_size):
+        if error:
+            errors.append(error)
+        else:
+            word_tiers[word] = tier
+    return word_tiers, errors
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
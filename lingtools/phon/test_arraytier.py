@@ -0,0 +1,81 @@
+"""
+Test of columnar interval tiers.
+
+"""
+
+# Copyright 2014 Constantine Lignos
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+from lingtools.phon.arraytier import ArrayIntervalTier
+from lingtools.phon.textgrid import Interval, IntervalTier
+
+
+class TestArrayIntervalTier(unittest.TestCase):
+    """Test columnar tiers against IntervalTier."""
+
+    def setUp(self):  # pylint: disable=C0103
+        self.intervals = [Interval(0.0, 0.1, 'sil'), Interval(0.1, 0.25, 'K'),
+                          Interval(0.25, 0.4, 'AE1'), Interval(0.5, 0.6, 'T'),
+                          Interval(0.6, 0.8, 'sil')]
+        self.tier = IntervalTier.from_sorted(self.intervals, 'phones', 0.0, 1.0)
+        self.array_tier = ArrayIntervalTier.from_tier(self.tier)
+
+    def test_intervals(self):
+        """Iteration, indexing and conversion give the original intervals."""
+        self.assertEqual(len(self.array_tier), 5)
+        self.assertEqual(repr(list(self.array_tier)), repr(self.intervals))
+        self.assertEqual(repr(self.array_tier[-1]), repr(self.intervals[-1]))
+        self.assertRaises(IndexError, self.array_tier.__getitem__, 5)
+        self.assertEqual(self.array_tier.marks(), ['sil', 'K', 'AE1', 'T', 'sil'])
+        self.assertEqual(repr(self.array_tier.to_tier()), repr(self.tier))
+        self.assertEqual(self.array_tier.bounds(), (0.0, 1.0))
+
+    def test_index_containing(self):
+        """Vectorized lookups match IntervalTier.indexContaining."""
+        times = [-0.1, 0.0, 0.05, 0.1, 0.3, 0.4, 0.45, 0.5, 0.79, 0.8, 1.0]
+        expected = [self.tier.indexContaining(time) for time in times]
+        self.assertEqual(self.array_tier.index_containing(times).tolist(),
+                         [-1 if idx is None else idx for idx in expected])
+        self.assertEqual([self.array_tier.indexContaining(time) for time in times], expected)
+        self.assertEqual(self.array_tier.intervalContaining(0.0).mark, 'sil')
+        self.assertEqual(self.array_tier.intervalContaining(0.45), None)
+
+    def test_label_durations(self):
+        """Durations are totaled for each mark."""
+        durations = self.array_tier.label_durations()
+        self.assertEqual(sorted(durations), ['AE1', 'K', 'T', 'sil'])
+        self.assertAlmostEqual(durations['sil'], 0.3)
+        self.assertAlmostEqual(durations['K'], 0.15)
+
+    def test_time_slice(self):
+        """Slices contain the intervals overlapping a time range."""
+        self.assertEqual([interval.mark for interval in self.array_tier.time_slice(0.2, 0.5)],
+                         ['K', 'AE1'])
+        self.assertEqual([interval.mark for interval in self.array_tier.time_slice(0.1, 0.55)],
+                         ['K', 'AE1', 'T'])
+        self.assertEqual(len(self.array_tier.time_slice(0.4, 0.5)), 0)
+        self.assertEqual(len(self.array_tier.time_slice(2.0, 3.0)), 0)
+
+    def test_errors(self):
+        """Unsorted, overlapping or mismatched arrays raise ValueError."""
+        self.assertRaises(ValueError, ArrayIntervalTier.from_arrays, [0.0, 0.5], [1.0, 1.5],
+                          ['a', 'b'])
+        self.assertRaises(ValueError, ArrayIntervalTier.from_arrays, [1.0], [0.5], ['a'])
+        self.assertRaises(ValueError, ArrayIntervalTier.from_arrays, [0.0], [0.5], ['a', 'b'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+"""
+Test of loading corpora of TextGrids.
+
+"""
+
+# Copyright 2014 Constantine Lignos
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import codecs
+import os
+import shutil
+import tempfile
+import unittest
+
+from lingtools.phon.corpus import iter_phoneme_tiers, load_phoneme_tiers, textgrid_files
+from lingtools.phon.test_textgrid import SHORT_TEXTGRID
+
+
+class TestCorpus(unittest.TestCase):
+    """Test loading a directory of TextGrids."""
+
+    def setUp(self):  # pylint: disable=C0103
+        self.tmpdir = tempfile.mkdtemp()
+        contents = {'cat.TextGrid': SHORT_TEXTGRID,
+                    'dog.textgrid': SHORT_TEXTGRID.replace(u'1.25\n1.5', u'1.25\n1.75'),
+                    'truncated.TextGrid': SHORT_TEXTGRID[:-30],
+                    'nophones.TextGrid': SHORT_TEXTGRID.replace(u'"phones"', u'"words"'),
+                    'notes.txt': u'Not a TextGrid'}
+        for filename, text in contents.iteritems():
+            with codecs.open(os.path.join(self.tmpdir, filename), 'w', 'UTF-8') as out_file:
+                out_file.write(text)
+
+    def tearDown(self):  # pylint: disable=C0103
+        shutil.rmtree(self.tmpdir)
+
+    def test_files(self):
+        """TextGrid files are found in a directory or by a glob."""
+        self.assertEqual([os.path.basename(path) for path in textgrid_files(self.tmpdir)],
+                         ['cat.TextGrid', 'dog.textgrid', 'nophones.TextGrid',
+                          'truncated.TextGrid'])
+        self.assertEqual(textgrid_files(os.path.join(self.tmpdir, '*t.TextGrid')),
+                         [os.path.join(self.tmpdir, 'cat.TextGrid')])
+        # A missing directory or a glob that matches nothing is an error
+        self.assertRaises(IOError, textgrid_files, os.path.join(self.tmpdir, 'missing'))
+        self.assertRaises(IOError, textgrid_files, os.path.join(self.tmpdir, '*.wav'))
+        self.assertRaises(IOError, load_phoneme_tiers, os.path.join(self.tmpdir, 'missing'))
+
+    def test_load(self):
+        """Phoneme tiers are loaded and unreadable files are reported."""
+        word_tiers, errors = load_phoneme_tiers(self.tmpdir)
+        self.assertEqual(sorted(word_tiers), ['cat', 'dog'])
+        self.assertEqual(word_tiers['cat'].name, 'phones')
+        self.assertEqual(word_tiers['dog'][-1].maxTime, 1.75)
+        self.assertEqual(len(errors), 2)
+        self.assertTrue('nophones.TextGrid' in errors[0])
+        self.assertTrue('truncated.TextGrid' in errors[1])
+
+    def test_processes(self):
+        """Loading in parallel gives the same results in the same order."""
+        def contents(results):
+            """Return the results with the intervals of each tier."""
+            return [(word, path, error, tier and [(interval.minTime, interval.maxTime,
+                                                   interval.mark) for interval in tier])
+                    for word, path, tier, error in results]
+
+        paths = textgrid_files(self.tmpdir)
+        serial = list(iter_phoneme_tiers(paths))
+        for chunk_size in (None, 1, 3):
+            self.assertEqual(contents(iter_phoneme_tiers(paths, 2, chunk_size)),
+                             contents(serial))
+        self.assertEqual([word for word, _, _, _ in serial],
+                         ['cat', 'dog', 'nophones', 'truncated'])
+
+
+if __name__ == '__main__':
+    unittest.main()
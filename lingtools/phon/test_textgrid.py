@@ -0,0 +1,217 @@
+"""
+Test of TextGrid reading.
+
+"""
+
+# Copyright 2014 Constantine Lignos
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import codecs
+import os
+import shutil
+import tempfile
+import unittest
+
+from lingtools.phon.textgrid import Interval, IntervalTier, Point, PointTier, TextGrid
+
+LONG_TEXTGRID = u'''File type = "ooTextFile"
+Object class = "TextGrid"
+
+xmin = 0
+xmax = 1.5
+tiers? <exists>
+size = 2
+item []:
+    item [1]:
+        class = "IntervalTier"
+        name = "phones"
+        xmin = 0
+        xmax = 1.5
+        intervals: size = 4
+        intervals [1]:
+            xmin = 0
+            xmax = 0.123456789
+            text = ""
+        intervals [2]:
+            xmin = 0.123456789
+            xmax = 0.5
+            text = "K"
+        intervals [3]:
+            xmin = 0.5
+            xmax = 1.25
+            text = "two
+lines and a ""quote"""
+        intervals [4]:
+            xmin = 1.25
+            xmax = 1.5
+            text = "\u00e6 = 1"
+    item [2]:
+        class = "TextTier"
+        name = "events"
+        xmin = 0
+        xmax = 1.5
+        points: size = 2
+        points [1]:
+            time = 0.25
+            mark = "click"
+        points [2]:
+            time = 1.0
+            mark = "two words"
+'''
+
+SHORT_TEXTGRID = u'''File type = "ooTextFile"
+Object class = "TextGrid"
+
+0
+1.5
+<exists>
+2
+"IntervalTier"
+"phones"
+0
+1.5
+4
+0
+0.123456789
+""
+0.123456789
+0.5
+"K"
+0.5
+1.25
+"two
+lines and a ""quote"""
+1.25
+1.5
+"\u00e6 = 1"
+"TextTier"
+"events"
+0
+1.5
+2
+0.25
+"click"
+1.0
+"two words"
+'''
+
+
+class TestTextGridRead(unittest.TestCase):
+    """Test reading TextGrid files."""
+
+    def setUp(self):  # pylint: disable=C0103
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):  # pylint: disable=C0103
+        shutil.rmtree(self.tmpdir)
+
+    def _read(self, text, encoding='UTF-8'):
+        """Return a TextGrid read from a file with the given contents."""
+        path = os.path.join(self.tmpdir, 'test.TextGrid')
+        with codecs.open(path, 'w', encoding) as out_file:
+            out_file.write(text)
+        textgrid = TextGrid()
+        textgrid.read(path)
+        return textgrid
+
+    def _check(self, textgrid):
+        """Check the contents of the test TextGrid."""
+        self.assertEqual((textgrid.minTime, textgrid.maxTime), (0.0, 1.5))
+        self.assertEqual(textgrid.getNames(), ['phones', 'events'])
+        phones, events = textgrid
+        self.assertTrue(isinstance(phones, IntervalTier))
+        self.assertTrue(isinstance(events, PointTier))
+        self.assertEqual([(interval.minTime, interval.maxTime, interval.mark)
+                          for interval in phones],
+                         [(0.0, 0.12346, u''), (0.12346, 0.5, u'K'),
+                          (0.5, 1.25, u'two\nlines and a ""quote""'),
+                          (1.25, 1.5, u'\u00e6 = 1')])
+        self.assertEqual([(point.time, point.mark) for point in events],
+                         [(0.25, u'click'), (1.0, u'two words')])
+
+    def test_long(self):
+        """The long text format is read."""
+        self._check(self._read(LONG_TEXTGRID))
+
+    def test_short(self):
+        """The short text format is read."""
+        self._check(self._read(SHORT_TEXTGRID))
+
+    def test_encodings(self):
+        """Files with a byte order mark or in UTF-16 are read."""
+        self._check(self._read(u'\ufeff' + LONG_TEXTGRID))
+        self._check(self._read(LONG_TEXTGRID, 'UTF-16'))
+
+    def test_round_trip(self):
+        """A written TextGrid is read back the same."""
+        textgrid = self._read(LONG_TEXTGRID)
+        path = os.path.join(self.tmpdir, 'written.TextGrid')
+        textgrid.write(path)
+        self._check(TextGrid.fromFile(path))
+
+    def test_odd_values(self):
+        """Long format values with trailing characters are read."""
+        self._check(self._read(LONG_TEXTGRID.replace(u'time = 0.25', u'time = 0.25,')))
+
+    def test_truncated(self):
+        """Truncated files raise ValueError."""
+        self.assertRaises(ValueError, self._read, SHORT_TEXTGRID[:-30])
+
+    def test_null_intervals(self):
+        """Intervals with no duration are skipped."""
+        textgrid = self._read(SHORT_TEXTGRID.replace(u'0.123456789\n0.5', u'0.5\n0.5'))
+        self.assertEqual(len(textgrid[0]), 3)
+
+
+class TestFromSorted(unittest.TestCase):
+    """Test bulk construction of tiers."""
+
+    def test_intervals(self):
+        """Sorted intervals give the same tier as adding them."""
+        intervals = [Interval(0.0, 0.5, 'a'), Interval(0.5, 0.5, 'b'),
+                     Interval(0.75, 1.0, 'c')]
+        added = IntervalTier('foo')
+        for interval in reversed(intervals):
+            added.addInterval(interval)
+        tier = IntervalTier.from_sorted(intervals, 'foo')
+        self.assertEqual(repr(tier), repr(added))
+        self.assertEqual(tier.indexContaining(0.8), 2)
+
+    def test_interval_errors(self):
+        """Unsorted, overlapping, repeated and out of bounds intervals raise ValueError."""
+        first = Interval(0.0, 1.0, 'a')
+        for intervals in ([Interval(1.0, 2.0, 'b'), first],
+                          [first, Interval(0.5, 2.0, 'b')],
+                          [first, Interval(0.0, 1.0, 'b')],
+                          [Interval(1.0, 1.0, 'a'), Interval(1.0, 1.0, 'b')]):
+            self.assertRaises(ValueError, IntervalTier.from_sorted, intervals)
+        self.assertRaises(ValueError, IntervalTier.from_sorted, [first], minTime=0.5)
+        self.assertRaises(ValueError, IntervalTier.from_sorted, [first], maxTime=0.5)
+
+    def test_points(self):
+        """Sorted points give the same tier as adding them."""
+        points = [Point(0.0, 'a'), Point(0.5, 'b')]
+        added = PointTier('foo')
+        for point in reversed(points):
+            added.addPoint(point)
+        self.assertEqual(repr(PointTier.from_sorted(points, 'foo')), repr(added))
+        self.assertRaises(ValueError, PointTier.from_sorted, points[::-1])
+        self.assertRaises(ValueError, PointTier.from_sorted, [points[0], points[0]])
+        self.assertRaises(ValueError, PointTier.from_sorted, points, maxTime=0.25)
+        self.assertRaises(ValueError, PointTier.from_sorted, [Point(-1.0, 'a')])
+        self.assertEqual(len(PointTier.from_sorted([])), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -29,6 +29,7 @@
 
 
 import re
+import operator
 import codecs
 import os.path
 
@@ -44,6 +45,73 @@ def readFile(f):
     return codecs.open(f, 'r', encoding='UTF-8')
 
 
+# Praat text files are sequences of strings in double quotes (with ""
+# standing for a quote), numbers, and <flags>; everything else, such as
+# the "xmin =" labels of the long format, is a comment. Bracketed indices
+# like "item [1]:" are matched separately so their digits are skipped.
+# Comments are skipped in one step up to the next character that could
+# start a token, and a stray sign or period is consumed on its own.
+_TOKEN = re.compile(r'[^"\[<0-9.+\-]*(?:\[[^\]]*\]|("[^"]*(?:""[^"]*)*"|<[a-z]+>|'
+                    r'[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)|[.+\-])')
+# In the long format every value but the flag of the "tiers? <exists>"
+# line follows "= ", so the scanner can jump from one "=" to the next,
+# reading the flag with the header. Strings are matched exactly, but any
+# other run of non-space characters is taken as a value.
+_LONG_HEADER = re.compile(r'File type = "ooTextFile"\s+Object class = "TextGrid"\s+'
+                          r'xmin = \S+\s+xmax = \S+\s+tiers\? (<[a-z]+>)')
+_LONG_TOKEN = re.compile(r'= ("[^"]*(?:""[^"]*)*"|\S+)')
+
+
+def readText(f):
+    """
+    Returns the whole contents of the file at path f as unicode, which may
+    be encoded in UTF-8 (with or without a byte order mark) or UTF-16.
+    """
+    with open(f, 'rb') as source:
+        data = source.read()
+    if data.startswith(codecs.BOM_UTF16_LE) or data.startswith(codecs.BOM_UTF16_BE):
+        return data.decode('UTF-16')
+    if data.startswith(codecs.BOM_UTF8):
+        data = data[len(codecs.BOM_UTF8):]
+    return data.decode('utf8')
+
+
+def tokenize(text):
+    """
+    Returns the list of tokens in the text of a Praat text file, in either
+    the long or the short format. Strings keep their enclosing quotes,
+    and may span lines.
+
+    >>> tokenize(u'xmin = 0 \\n  item [1]:\\n text = "a ""b""\\nc" <exists>')
+    [u'0', u'"a ""b""\\nc"', u'<exists>']
+    """
+    return [token for token in _TOKEN.findall(text) if token]
+
+
+def _longTokens(text):
+    """
+    Returns the tokens of the text of a Praat text file in the long
+    format, or None if it is not in the long format. Unquoted values are
+    not checked, so the tokens may be wrong where tokenize would not be.
+    """
+    header = _LONG_HEADER.match(text)
+    if not header:
+        return None
+    tokens = _LONG_TOKEN.findall(text)
+    tokens.insert(4, header.group(1))
+    return tokens
+
+
+def _roundTimes(tokens):
+    """
+    Returns a dictionary of each of the time tokens to its value rounded
+    to 5 places. Adjacent intervals share their boundaries, so each
+    distinct token is only converted once.
+    """
+    unique = list(set(tokens))
+    return dict(zip(unique, map(round, map(float, unique), [5] * len(unique))))
+
+
 class Point(object):
     """ 
     Represents a point in time with an associated textual mark, as stored 
@@ -315,7 +383,7 @@ class PointTier(object):
     def bounds(self):
         return (self.minTime, self.maxTime or self.points[-1].time)
     
-    # alternative constructor
+    # alternative constructors
 
     @classmethod
     def fromFile(cls, f, name=None):
@@ -323,6 +391,36 @@ class PointTier(object):
         pt.read(f)
         return pt
 
+    @classmethod
+    def from_sorted(cls, points, name=None, minTime=0., maxTime=None):
+        """
+        Constructs a PointTier from Points already sorted by time, checking
+        them in one pass instead of inserting them one at a time. The same
+        ValueErrors as addPoint are raised for points that are out of the
+        bounds of the tier or not in strictly increasing order.
+
+        >>> PointTier.from_sorted([Point(1.0, 'a'), Point(2.0, 'b')], 'foo')
+        PointTier(foo, [Point(1.0, a), Point(2.0, b)])
+        >>> PointTier.from_sorted([Point(2.0, 'b'), Point(1.0, 'a')])
+        Traceback (most recent call last):
+            ...
+        ValueError: Point(1.0, a)
+        """
+        pt = cls(name=name, minTime=minTime, maxTime=maxTime)
+        points = list(points)
+        if points:
+            if points[0].time < minTime:
+                raise ValueError(minTime) # too early
+            if maxTime and points[-1].time > maxTime:
+                raise ValueError(maxTime) # too late
+            prev = points[0].time
+            for point in points[1:]:
+                if point.time <= prev:
+                    raise ValueError(point) # out of order or repeated
+                prev = point.time
+        pt.points = points
+        return pt
+
 
 class IntervalTier(object):
     """ 
@@ -494,7 +592,7 @@ class IntervalTier(object):
     def bounds(self):
         return self.minTime, self.maxTime or self.intervals[-1].maxTime
 
-    # alternative constructor
+    # alternative constructors
 
     @classmethod
     def fromFile(cls, f, name=None):
@@ -503,6 +601,41 @@ class IntervalTier(object):
         it.read(f)
         return it
 
+    @classmethod
+    def from_sorted(cls, intervals, name=None, minTime=0., maxTime=None):
+        """
+        Constructs an IntervalTier from Intervals already sorted by time,
+        checking them in one pass instead of inserting them one at a time.
+        The same ValueErrors as addInterval are raised for intervals that
+        are out of the bounds of the tier, overlapping, or out of order.
+
+        >>> IntervalTier.from_sorted([Interval(0.0, 1.0, 'a'),
+        ...                           Interval(1.0, 2.0, 'b')], 'foo')
+        IntervalTier(foo, [Interval(0.0, 1.0, a), Interval(1.0, 2.0, b)])
+        >>> IntervalTier.from_sorted([Interval(0.0, 1.5, 'a'),
+        ...                           Interval(1.0, 2.0, 'b')])
+        Traceback (most recent call last):
+            ...
+        ValueError: (Interval(0.0, 1.5, a), Interval(1.0, 2.0, b))
+        """
+        it = cls(name=name, minTime=minTime, maxTime=maxTime)
+        intervals = list(intervals)
+        if intervals:
+            if intervals[0].minTime < minTime: # too early
+                raise ValueError(minTime)
+            if maxTime and max(i.maxTime for i in intervals) > maxTime:
+                raise ValueError(maxTime) # too late
+            prev = intervals[0]
+            for interval in intervals[1:]:
+                # each interval must start after the previous one and
+                # not before it ends
+                if not prev.minTime < interval.minTime or \
+                   prev.maxTime > interval.minTime:
+                    raise ValueError(prev, interval)
+                prev = interval
+        it.intervals = intervals
+        return it
+
 
 class TextGrid(object):
     """ 
@@ -632,47 +765,71 @@ class TextGrid(object):
 
     def read(self, f):
         """
-        Read the tiers contained in the Praat-formated TextGrid file 
-        indicated by string f
-        """
-        source = readFile(f)
-        source.readline() # header junk
-        source.readline() # header junk
-        source.readline() # header junk
-        self.minTime = round(float(source.readline().split()[2]), 5)
-        self.maxTime = round(float(source.readline().split()[2]), 5)
-        source.readline() # more header junk
-        m = int(source.readline().rstrip().split()[2]) # will be self.n
-        source.readline()
-        for i in xrange(m): # loop over grids
-            source.readline()
-            if source.readline().rstrip().split()[2] == '"IntervalTier"': 
-                inam = source.readline().rstrip().split(' = ')[1].strip('"')
-                imin = round(float(source.readline().rstrip().split()[2]), 5)
-                imax = round(float(source.readline().rstrip().split()[2]), 5)
-                itie = IntervalTier(inam)
-                for j in xrange(int(source.readline().rstrip().split()[3])):
-                    source.readline().rstrip().split() # header junk
-                    jmin = round(float(source.readline().rstrip().split()[2]), 5)
-                    jmax = round(float(source.readline().rstrip().split()[2]), 5)
-                    jmrk = self._getMark(source)
-                    if jmin < jmax: # non-null
-                        itie.addInterval(Interval(jmin, jmax, jmrk))
-                self.append(itie)
+        Read the tiers contained in the Praat-formated TextGrid file
+        indicated by string f, which may be in the long or the short text
+        format. The whole file is read and tokenized in one pass. Marks
+        may span lines and are kept as written, so a quote in a mark is
+        doubled.
+        """
+        text = readText(f)
+        tokens = _longTokens(text)
+        if tokens:
+            try:
+                self._readTokens(tokens)
+                return
+            except (IndexError, ValueError):
+                # Odd values were read wrong, so start over with the
+                # slower tokenizer
+                del self.tiers[:]
+        try:
+            self._readTokens(tokenize(text))
+        except IndexError:
+            raise ValueError('Truncated TextGrid file: {0}'.format(f))
+
+    def _readTokens(self, tokens):
+        """
+        Read the tiers from the tokens of a TextGrid file
+        """
+        # tokens 0 and 1 are the file type and object class
+        self.minTime = round(float(tokens[2]), 5)
+        self.maxTime = round(float(tokens[3]), 5)
+        if tokens[4] != '<exists>':
+            return
+        m = int(tokens[5])
+        i = 6
+        for _ in xrange(m): # loop over grids
+            tclass = tokens[i]
+            inam = tokens[i + 1][1:-1]
+            n = int(tokens[i + 4])
+            i += 5
+            if tclass == '"IntervalTier"':
+                end = i + 3 * n
+                jmins = tokens[i:end:3]
+                jmaxs = tokens[i + 1:end:3]
+                jmrks = [t[1:-1] for t in tokens[i + 2:end:3]]
+                if len(jmrks) != n:
+                    raise IndexError(end)
+                times = _roundTimes(jmins + jmaxs)
+                jmins = map(times.__getitem__, jmins)
+                jmaxs = map(times.__getitem__, jmaxs)
+                if any(map(operator.ge, jmins, jmaxs)):
+                    intervals = [Interval(jmin, jmax, jmrk) for jmin, jmax, jmrk in
+                                 zip(jmins, jmaxs, jmrks) if jmin < jmax] # non-null
+                else:
+                    intervals = map(Interval, jmins, jmaxs, jmrks)
+                # Praat writes intervals in order, so they are checked
+                # rather than inserted one at a time
+                itie = IntervalTier.from_sorted(intervals, inam)
             else: # pointTier
-                inam = source.readline().rstrip().split(' = ')[1].strip('"')
-                imin = round(float(source.readline().rstrip().split()[2]), 5)
-                imax = round(float(source.readline().rstrip().split()[2]), 5)
-                itie = PointTier(inam)
-                n = int(source.readline().rstrip().split()[3])
-                for j in xrange(n):
-                    source.readline().rstrip() # header junk
-                    jtim = round(float(source.readline().rstrip().split()[2]),
-                                                                           5)
-                    jmrk = source.readline().rstrip().split()[2][1:-1]
-                    itie.addPoint(Point(jtim, jmrk))
-                self.append(itie)
-        source.close()
+                end = i + 2 * n
+                jtims = [round(t, 5) for t in map(float, tokens[i:end:2])]
+                jmrks = [t[1:-1] for t in tokens[i + 1:end:2]]
+                if len(jmrks) != n:
+                    raise IndexError(end)
+                itie = PointTier.from_sorted(
+                    [Point(jtim, jmrk) for jtim, jmrk in zip(jtims, jmrks)], inam)
+            i = end
+            self.append(itie)
 
     def write(self, f, null=''):
         """
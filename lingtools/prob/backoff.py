@@ -0,0 +1,400 @@
+"""
+Backoff and interpolated smoothing for n-gram models.
+
+Each smoothing method is computed once from the counts of a model into
+a BackoffTable, which holds a probability for every n-gram at each
+order and a backoff weight for every context, as in the ARPA format.
+Looking up a probability then takes at most one search per order.
+
+Lower-order counts are derived from the highest-order counts. Katz
+backoff and interpolation use the counts of each n-gram as the suffix
+of a higher-order one, and Kneser-Ney uses continuation counts.
+
+Tables can also be read from and written to files in the ARPA format.
+
+"""
+
+# Copyright 2014 Constantine Lignos
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from array import array
+
+import numpy as np
+
+from lingtools.prob.compact import PackedTrie, aggregate_rows, sorted_rows, symbol_ranks
+from lingtools.util.symbols import SymbolTable
+
+# Counts above this are considered reliable and not discounted in
+# Katz backoff.
+KATZ_CUTOFF = 5
+# The log10 probability written for impossible events in ARPA files
+ARPA_LOG_ZERO = -99.0
+# The number of N-grams formatted at once when writing ARPA files
+_ARPA_CHUNK_SIZE = 65536
+
+
+class BackoffTable(object):
+
+    """Log probabilities and backoff weights for every order of a model.
+
+    Level k of the trie holds each (k + 1)-gram with an explicit
+    probability. logprobs[k] holds their log10 probabilities and
+    backoffs[k] holds their log10 backoff weights as contexts of the
+    next level.
+    """
+
+    def __init__(self, symbols, trie, logprobs, backoffs):
+        self._symbols = symbols
+        self._trie = trie
+        self._logprobs = logprobs
+        self._backoffs = backoffs
+
+    @property
+    def order(self):
+        """Return the highest order of n-grams in the table."""
+        return self._trie.depth
+
+    @property
+    def symbols(self):
+        """Return the SymbolTable used to intern items."""
+        return self._symbols
+
+    @property
+    def trie(self):
+        """Return the trie of n-grams in the table."""
+        return self._trie
+
+    @property
+    def logprobs(self):
+        """Return the arrays of log10 probabilities for each level."""
+        return self._logprobs
+
+    @property
+    def backoffs(self):
+        """Return the arrays of log10 backoff weights for each level."""
+        return self._backoffs
+
+    def _check_context(self, context):
+        """Raise ValueError if a context is not the right length."""
+        length = len(context) if context is not None else 0
+        if length != self.order - 1:
+            raise ValueError("Context {!r} does not have {} items".format(
+                context, self.order - 1))
+
+    def logprob(self, event, context):
+        """Return the log10 probability of an event in a context."""
+        self._check_context(context)
+        get = self._symbols.get
+        ids = [get(item, -1) for item in (context or ())]
+        ids.append(get(event, -1))
+        backoff = 0.0
+        # Try the longest n-gram first, backing off until one is found
+        for start in range(len(ids)):
+            ngram = ids[start:]
+            node = self._trie.find(ngram)
+            if node >= 0:
+                return backoff + float(self._logprobs[len(ngram) - 1][node])
+            if len(ngram) > 1:
+                node = self._trie.find(ngram[:-1])
+                if node >= 0:
+                    backoff += float(self._backoffs[len(ngram) - 2][node])
+        return -np.inf
+
+    def prob(self, event, context):
+        """Return the probability of an event in a context."""
+        return 10 ** self.logprob(event, context)
+
+    def logprob_many(self, events, contexts):
+        """Return an array of log10 probabilities for aligned events and contexts."""
+        get = self._symbols.get
+        order = self.order
+        ids = []
+        for event, context in zip(events, contexts):
+            self._check_context(context)
+            ids.append([get(item, -1) for item in (context or ())] + [get(event, -1)])
+        ids = np.array(ids, dtype=np.int64).reshape(len(ids), order)
+
+        result = np.repeat(-np.inf, len(ids))
+        backoff = np.zeros(len(ids))
+        pending = np.arange(len(ids))
+        for start in range(order):
+            if not len(pending):
+                break
+            width = order - start
+            nodes = self._trie.find_many(ids[pending, start:])
+            hit = nodes >= 0
+            result[pending[hit]] = (backoff[pending[hit]] +
+                                    self._logprobs[width - 1][nodes[hit]])
+            pending = pending[~hit]
+            if width > 1 and len(pending):
+                nodes = self._trie.find_many(ids[pending, start:-1])
+                found = nodes >= 0
+                backoff[pending[found]] += self._backoffs[width - 2][nodes[found]]
+        return result
+
+    def write_arpa(self, path, sort=True):
+        """Write the table to a file in ARPA format.
+
+        If sort is True, the N-grams of each order are sorted by their
+        items; otherwise they are in trie order. N-grams are formatted
+        in chunks, so memory use does not grow with the size of the
+        table beyond the arrays it already holds.
+        """
+        symbols = self._symbols.symbols
+        words = [symbol.encode('utf-8') if isinstance(symbol, unicode) else str(symbol)
+                 for symbol in symbols]
+        ranks = symbol_ranks(symbols) if sort else None
+        with open(path, 'wb') as arpa_file:
+            arpa_file.write("\\data\\\n")
+            for level, ids in enumerate(self._trie.ids):
+                arpa_file.write("ngram {}={}\n".format(level + 1, len(ids)))
+            for level in range(self.order):
+                arpa_file.write("\n\\{}-grams:\n".format(level + 1))
+                rows = self._trie.rows(level + 1)
+                order = sorted_rows(rows, ranks) if sort else np.arange(len(rows))
+                logprobs = np.maximum(self._logprobs[level], ARPA_LOG_ZERO)
+                backoffs = (np.maximum(self._backoffs[level], ARPA_LOG_ZERO)
+                            if level < self.order - 1 else None)
+                for start in xrange(0, len(order), _ARPA_CHUNK_SIZE):
+                    chunk = order[start:start + _ARPA_CHUNK_SIZE]
+                    ngrams = [" ".join([words[idx] for idx in row])
+                              for row in rows[chunk].tolist()]
+                    if backoffs is None:
+                        lines = ["{:.7g}\t{}\n".format(logprob, ngram) for logprob, ngram in
+                                 zip(logprobs[chunk].tolist(), ngrams)]
+                    else:
+                        lines = ["{:.7g}\t{}\t{:.7g}\n".format(logprob, ngram, weight)
+                                 for logprob, ngram, weight in
+                                 zip(logprobs[chunk].tolist(), ngrams, backoffs[chunk].tolist())]
+                    arpa_file.writelines(lines)
+            arpa_file.write("\n\\end\\\n")
+
+
+def _levels(rows, counts, continuation):
+    """Return the rows and counts of each order, lowest first.
+
+    Every lower-order n-gram that is the suffix or prefix of a higher
+    one is included, so that backoff can always find the prefix of an
+    n-gram. Prefixes are given a count of zero. If continuation is
+    True, lower orders are counted by the number of distinct
+    n-grams they are the suffix of.
+    """
+    order = rows.shape[1]
+    levels = [None] * order
+    levels[-1] = (rows, counts)
+    for level in range(order - 1, 0, -1):
+        rows, counts = levels[level]
+        weights = (counts > 0).astype(np.int64) if continuation else counts
+        levels[level - 1] = aggregate_rows(
+            np.concatenate([rows[:, 1:], rows[:, :-1]]),
+            np.concatenate([weights, np.zeros(len(rows), dtype=np.int64)]))
+    return levels
+
+
+def _good_turing_discounts(counts, cutoff=KATZ_CUTOFF):
+    """Return the Katz discount ratio for each count."""
+    counts = counts.astype(np.int64)
+    discounts = np.ones(len(counts))
+    n_r = np.bincount(counts, minlength=cutoff + 2)
+    if not n_r[1]:
+        return discounts
+    common = (cutoff + 1) * n_r[cutoff + 1] / float(n_r[1])
+    if common >= 1.0:
+        return discounts
+    for count in range(1, cutoff + 1):
+        if not n_r[count] or not n_r[count + 1]:
+            continue
+        discount = (((count + 1) * n_r[count + 1] / float(count * n_r[count]) - common) /
+                    (1.0 - common))
+        if 0.0 < discount < 1.0:
+            discounts[counts == count] = discount
+    return discounts
+
+
+def _katz_level(counts, parents, totals, lower_probs):
+    """Return probabilities and context weights for Katz backoff."""
+    seen = counts > 0
+    safe_totals = np.where(totals > 0, totals, 1.0)
+    probs = np.where(seen, _good_turing_discounts(counts) * counts / safe_totals[parents],
+                     0.0)
+    n_contexts = len(totals)
+    left = 1.0 - np.bincount(parents, weights=probs, minlength=n_contexts)
+    lower_left = 1.0 - np.bincount(parents, weights=np.where(seen, lower_probs, 0.0),
+                                   minlength=n_contexts)
+    # When all of the lower-order mass has been seen, there is nothing
+    # to back off to, so the seen counts are not discounted.
+    valid = lower_left > 1e-12
+    weights = np.where(valid, np.maximum(left, 0.0) / np.where(valid, lower_left, 1.0), 0.0)
+    probs = np.where(valid[parents], probs, counts / safe_totals[parents])
+    probs = np.where(seen, probs, weights[parents] * lower_probs)
+    return probs, weights
+
+
+def _kneser_ney_level(counts, parents, totals, lower_probs):
+    """Return probabilities and context weights for interpolated Kneser-Ney."""
+    n_1 = np.count_nonzero(counts == 1)
+    n_2 = np.count_nonzero(counts == 2)
+    discount = n_1 / float(n_1 + 2 * n_2) if n_1 else 0.5
+    types = np.bincount(parents, weights=(counts > 0), minlength=len(totals))
+    seen = totals > 0
+    safe_totals = np.where(seen, totals, 1.0)
+    weights = np.where(seen, discount * types / safe_totals, 1.0)
+    probs = (np.maximum(counts - discount, 0.0) / safe_totals[parents] +
+             weights[parents] * lower_probs)
+    return probs, weights
+
+
+def _interpolated_level(counts, parents, totals, lower_probs):
+    """Return probabilities and context weights for Witten-Bell interpolation."""
+    types = np.bincount(parents, weights=(counts > 0), minlength=len(totals))
+    denoms = totals + types
+    seen = denoms > 0
+    safe_denoms = np.where(seen, denoms, 1.0)
+    weights = np.where(seen, types / safe_denoms, 1.0)
+    probs = np.where(seen[parents],
+                     (counts + types[parents] * lower_probs) / safe_denoms[parents],
+                     lower_probs)
+    return probs, weights
+
+
+def _build_table(symbols, rows, counts, smooth_level, continuation):
+    """Return a BackoffTable for n-gram rows and counts."""
+    levels = _levels(rows, counts, continuation)
+    trie = PackedTrie.from_levels([level_rows for level_rows, _ in levels])
+    probs = []
+    weights = []
+    for level, (level_rows, level_counts) in enumerate(levels):
+        level_counts = level_counts.astype(np.float64)
+        if not level:
+            total = level_counts.sum()
+            probs.append(level_counts / total if total > 0 else level_counts)
+            continue
+        parents = trie.parents(level)
+        totals = np.bincount(parents, weights=level_counts,
+                             minlength=len(levels[level - 1][0]))
+        lower_probs = probs[level - 1][trie.find_many(level_rows[:, 1:])]
+        level_probs, level_weights = smooth_level(level_counts, parents, totals,
+                                                  lower_probs)
+        probs.append(level_probs)
+        weights.append(level_weights)
+
+    with np.errstate(divide='ignore'):
+        return BackoffTable(symbols, trie, [np.log10(level) for level in probs],
+                            [np.log10(level) for level in weights])
+
+
+def katz_table(symbols, rows, counts):
+    """Return a BackoffTable using Katz backoff with Good-Turing discounts."""
+    return _build_table(symbols, rows, counts, _katz_level, False)
+
+
+def kneser_ney_table(symbols, rows, counts):
+    """Return a BackoffTable using interpolated Kneser-Ney smoothing."""
+    return _build_table(symbols, rows, counts, _kneser_ney_level, True)
+
+
+def interpolated_table(symbols, rows, counts):
+    """Return a BackoffTable using linear interpolation of all orders.
+
+    The interpolation weight of each context is set using the number
+    of distinct outcomes it has been observed with (Witten-Bell), so
+    no held-out data is needed.
+    """
+    return _build_table(symbols, rows, counts, _interpolated_level, False)
+
+
+def _arpa_sorted(ids, logprobs, backoffs, order):
+    """Return sorted rows, log probabilities and backoffs of one ARPA order."""
+    rows = np.frombuffer(ids, dtype=np.intc).reshape(-1, order).astype(np.int32)
+    logprobs = np.frombuffer(logprobs, dtype=np.float64)
+    backoffs = np.frombuffer(backoffs, dtype=np.float64)
+    index = np.lexsort(rows.T[::-1])
+    rows = rows[index]
+    if (rows[1:] == rows[:-1]).all(axis=1).any():
+        raise ValueError("Duplicate {}-grams in ARPA file".format(order))
+    logprobs = logprobs[index]
+    backoffs = backoffs[index]
+    logprobs = np.where(logprobs <= ARPA_LOG_ZERO, -np.inf, logprobs)
+    backoffs = np.where(backoffs <= ARPA_LOG_ZERO, -np.inf, backoffs)
+    return rows, logprobs, backoffs
+
+
+def read_arpa(path):
+    """Return a BackoffTable read from a file in ARPA format.
+
+    The file is read line by line into arrays, so no per-N-gram
+    objects are created. Log probabilities and backoff weights of
+    ARPA_LOG_ZERO or less are read as -inf. Items are byte strings.
+    ValueError is raised if the file is malformed.
+    """
+    symbols = SymbolTable()
+    intern = symbols.intern
+    sizes = []
+    levels = []
+    level = None
+    with open(path, 'rb') as arpa_file:
+        # Skip anything before the header
+        for line in arpa_file:
+            if line.strip() == "\\data\\":
+                break
+        else:
+            raise ValueError("No \\data\\ section in {}".format(path))
+
+        for line_num, line in enumerate(arpa_file):
+            line = line.strip()
+            if not line:
+                continue
+            elif line.startswith("ngram "):
+                order, _, size = line[6:].partition("=")
+                if int(order) != len(sizes) + 1:
+                    raise ValueError("Unexpected ARPA line: {!r}".format(line))
+                sizes.append(int(size))
+                levels.append((array('i'), array('d'), array('d')))
+            elif line == "\\end\\":
+                break
+            elif line.startswith("\\") and line.endswith("-grams:"):
+                order = int(line[1:-7])
+                if not 1 <= order <= len(sizes):
+                    raise ValueError("Unexpected ARPA line: {!r}".format(line))
+                level = order - 1
+                ids, logprobs, backoffs = levels[level]
+            elif level is None:
+                raise ValueError("Unexpected ARPA line: {!r}".format(line))
+            else:
+                fields = line.split()
+                if not order + 1 <= len(fields) <= order + 2:
+                    raise ValueError("Malformed {}-gram on line {} of {}: {!r}".format(
+                        order, line_num + 1, path, line))
+                logprobs.append(float(fields[0]))
+                ids.extend([intern(word) for word in fields[1:order + 1]])
+                backoffs.append(float(fields[order + 1]) if len(fields) > order + 1 else 0.0)
+        else:
+            raise ValueError("No \\end\\ marker in {}".format(path))
+
+    if not sizes:
+        raise ValueError("No N-gram counts in {}".format(path))
+    rows = []
+    table_logprobs = []
+    table_backoffs = []
+    for level, (size, arrays) in enumerate(zip(sizes, levels)):
+        if len(arrays[1]) != size:
+            raise ValueError("Expected {} {}-grams but found {}".format(
+                size, level + 1, len(arrays[1])))
+        level_rows, level_logprobs, level_backoffs = _arpa_sorted(*(arrays + (level + 1,)))
+        rows.append(level_rows)
+        table_logprobs.append(level_logprobs)
+        table_backoffs.append(level_backoffs)
+
+    trie = PackedTrie.from_levels(rows)
+    return BackoffTable(symbols, trie, table_logprobs, table_backoffs[:-1])
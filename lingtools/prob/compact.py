@@ -0,0 +1,795 @@
+"""
+Compact, array-backed storage for n-gram counts.
+
+Items are interned to integer ids and n-grams are stored in a trie
+packed into sorted NumPy arrays, which takes a small fraction of the
+memory of a dictionary of tuples.
+
+"""
+
+# Copyright 2014 Constantine Lignos
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import math
+import struct
+from array import array
+
+import numpy as np
+
+from lingtools.util.symbols import SymbolTable
+
+# The minimum number of n-grams buffered before they are merged into
+# the arrays. The buffer is allowed to grow as large as the arrays
+# themselves, which keeps the cost of merging amortized.
+MIN_BUFFER_SIZE = 1 << 20
+
+# Snapshot files start with this, followed by the length of a JSON
+# header describing the arrays that follow.
+SNAPSHOT_MAGIC = "LTNGRAM\0"
+SNAPSHOT_VERSION = 1
+# Arrays in snapshots are aligned to this many bytes
+_ALIGNMENT = 64
+
+
+def aggregate_rows(rows, counts):
+    """Sort rows of ids lexicographically, summing the counts of duplicates.
+
+    >>> rows = np.array([[1, 2], [0, 5], [1, 2]])
+    >>> uniq, totals = aggregate_rows(rows, np.array([1, 1, 3]))
+    >>> uniq.tolist(), totals.tolist()
+    ([[0, 5], [1, 2]], [1, 4])
+
+    """
+    if not len(rows):
+        return rows, counts
+    order = np.lexsort(rows.T[::-1])
+    rows = rows[order]
+    counts = counts[order]
+    new = np.ones(len(rows), dtype=bool)
+    new[1:] = (rows[1:] != rows[:-1]).any(axis=1)
+    starts = np.flatnonzero(new)
+    return rows[starts], np.add.reduceat(counts, starts)
+
+
+def write_arrays(path, metadata, arrays):
+    """Write named arrays and a dictionary of metadata to a snapshot file."""
+    # Lay out the arrays after the header, which is padded to alignment
+    specs = []
+    offset = 0
+    for name, values in arrays:
+        values = np.ascontiguousarray(values)
+        specs.append((name, values.dtype.str, values.shape, offset))
+        offset += -(-values.nbytes // _ALIGNMENT) * _ALIGNMENT
+    header = json.dumps({'version': SNAPSHOT_VERSION, 'metadata': metadata,
+                         'arrays': specs})
+    prefix_len = len(SNAPSHOT_MAGIC) + 8
+    data_start = -(-(prefix_len + len(header)) // _ALIGNMENT) * _ALIGNMENT
+    header = header.ljust(data_start - prefix_len)
+
+    with open(path, 'wb') as snapshot:
+        snapshot.write(SNAPSHOT_MAGIC)
+        snapshot.write(struct.pack('<Q', len(header)))
+        snapshot.write(header)
+        for (_, values), (_, _, _, offset) in zip(arrays, specs):
+            snapshot.seek(data_start + offset)
+            np.ascontiguousarray(values).tofile(snapshot)
+
+
+def read_arrays(path, mmap=False):
+    """Return the metadata and a dictionary of arrays in a snapshot file.
+
+    If mmap is True, the arrays are read-only memory maps of the file,
+    so they are loaded on demand and shared between processes.
+    """
+    with open(path, 'rb') as snapshot:
+        if snapshot.read(len(SNAPSHOT_MAGIC)) != SNAPSHOT_MAGIC:
+            raise ValueError("{} is not a snapshot file".format(path))
+        header_len, = struct.unpack('<Q', snapshot.read(8))
+        header = json.loads(snapshot.read(header_len))
+        if header['version'] != SNAPSHOT_VERSION:
+            raise ValueError("Unsupported snapshot version: {}".format(header['version']))
+        data_start = snapshot.tell()
+        arrays = {}
+        for name, dtype, shape, offset in header['arrays']:
+            dtype = np.dtype(dtype)
+            shape = tuple(shape)
+            count = int(np.prod(shape))
+            if mmap and count:
+                arrays[name] = np.memmap(path, dtype, 'r', data_start + offset, shape)
+            else:
+                snapshot.seek(data_start + offset)
+                arrays[name] = np.fromfile(snapshot, dtype, count).reshape(shape)
+    return header['metadata'], arrays
+
+
+def _encode_symbols(symbols):
+    """Return offsets and a byte array encoding a list of string symbols."""
+    is_unicode = False
+    encoded = []
+    for symbol in symbols:
+        if isinstance(symbol, unicode):
+            is_unicode = True
+            symbol = symbol.encode('utf-8')
+        elif not isinstance(symbol, str):
+            raise TypeError("Only string symbols can be saved, not {!r}".format(symbol))
+        encoded.append(symbol)
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(symbol) for symbol in encoded], out=offsets[1:])
+    data = np.frombuffer("".join(encoded), dtype=np.uint8)
+    # The ids in order of their encoded symbols, for binary search
+    order = np.array(sorted(range(len(encoded)), key=encoded.__getitem__),
+                     dtype=np.int32)
+    return offsets, data, order, is_unicode
+
+
+def _decode_symbols(offsets, data, is_unicode):
+    """Return the list of symbols encoded by _encode_symbols."""
+    blob = data.tostring()
+    offsets = offsets.tolist()
+    symbols = [blob[start:end] for start, end in zip(offsets, offsets[1:])]
+    if is_unicode:
+        symbols = [symbol.decode('utf-8') for symbol in symbols]
+    return symbols
+
+
+class MappedSymbolTable(object):
+
+    """A read-only SymbolTable over symbols encoded in arrays.
+
+    This is used for memory-mapped snapshots, so symbols are looked up
+    by binary search over the encoded bytes instead of being loaded
+    into a dictionary.
+    """
+
+    def __init__(self, offsets, data, order, is_unicode):
+        self._offsets = offsets
+        self._data = data
+        self._order = order
+        self._unicode = is_unicode
+
+    def _encoded(self, idx):
+        """Return the encoded bytes of the symbol with an id."""
+        return self._data[self._offsets[idx]:self._offsets[idx + 1]].tostring()
+
+    def get(self, symbol, default=None):
+        """Return the id for a symbol or default if it is unknown."""
+        if isinstance(symbol, unicode):
+            symbol = symbol.encode('utf-8')
+        elif not isinstance(symbol, str):
+            return default
+        order = self._order
+        lo = 0
+        hi = len(order)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._encoded(order[mid]) < symbol:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(order) and self._encoded(order[lo]) == symbol:
+            return int(order[lo])
+        return default
+
+    def id(self, symbol):
+        """Return the id for a symbol, raising KeyError if it is unknown."""
+        idx = self.get(symbol)
+        if idx is None:
+            raise KeyError(symbol)
+        return idx
+
+    def intern(self, symbol):
+        """Return the id for a symbol, raising KeyError if it is unknown."""
+        return self.id(symbol)
+
+    def symbol(self, idx):
+        """Return the symbol for an id."""
+        symbol = self._encoded(idx)
+        return symbol.decode('utf-8') if self._unicode else symbol
+
+    __getitem__ = symbol
+
+    @property
+    def symbols(self):
+        """Return a sequence of symbols indexed by id."""
+        return self
+
+    def __len__(self):
+        return len(self._order)
+
+    def __contains__(self, symbol):
+        return self.get(symbol) is not None
+
+    def __iter__(self):
+        return (self.symbol(idx) for idx in xrange(len(self)))
+
+
+def symbol_ranks(symbols):
+    """Return an array of the rank of each symbol id in sorted order.
+
+    >>> symbol_ranks(['c', 'a', 'b']).tolist()
+    [2, 0, 1]
+
+    """
+    n_symbols = len(symbols)
+    ranks = np.empty(n_symbols, dtype=np.int64)
+    ranks[sorted(xrange(n_symbols), key=symbols.__getitem__)] = np.arange(n_symbols)
+    return ranks
+
+
+def sorted_rows(rows, ranks):
+    """Return the order of rows of ids sorted by the ranks of their symbols.
+
+    >>> sorted_rows(np.array([[0, 1], [1, 0], [0, 0]]), np.array([1, 0])).tolist()
+    [1, 0, 2]
+
+    """
+    if not rows.shape[1]:
+        return np.arange(len(rows))
+    # lexsort uses the last key as the primary one
+    return np.lexsort(ranks[rows].T[::-1])
+
+
+def bisect_left_many(values, lo, hi, targets):
+    """Vectorized bisect_left of each target within values[lo:hi].
+
+    >>> values = np.array([1, 3, 5, 2, 4])
+    >>> bisect_left_many(values, np.array([0, 3]), np.array([3, 5]), np.array([4, 4])).tolist()
+    [2, 4]
+
+    """
+    lo = lo.copy()
+    hi = hi.copy()
+    active = lo < hi
+    while active.any():
+        mid = (lo + hi) // 2
+        right = active & (values[np.where(active, mid, 0)] < targets)
+        left = active & ~right
+        lo[right] = mid[right] + 1
+        hi[left] = mid[left]
+        active = lo < hi
+    return lo
+
+
+class PackedTrie(object):
+
+    """A trie of integer ids stored as sorted arrays.
+
+    There is one level per position in the stored sequences. Level k
+    holds the last id of each distinct prefix of length k + 1, sorted
+    by parent node and then by id. The children of node i at level k
+    are the nodes starts[k][i]:starts[k][i + 1] of level k + 1.
+
+    >>> trie = PackedTrie.from_rows(np.array([[0, 1], [0, 2], [3, 1]]))
+    >>> [level.tolist() for level in trie.ids]
+    [[0, 3], [1, 2, 1]]
+    >>> trie.starts[0].tolist()
+    [0, 2, 3]
+    >>> trie.find((3, 1))
+    2
+    >>> trie.find((3, 2))
+    -1
+    >>> trie.find_many(np.array([[0, 2], [1, 1], [3, 1]])).tolist()
+    [1, -1, 2]
+    >>> trie.rows().tolist()
+    [[0, 1], [0, 2], [3, 1]]
+
+    """
+
+    def __init__(self, ids, starts):
+        self.ids = ids
+        self.starts = starts
+
+    @classmethod
+    def empty(cls, depth):
+        """Return a trie of the given depth with no entries."""
+        return cls([np.zeros(0, dtype=np.int32) for _ in range(depth)],
+                   [np.zeros(1, dtype=np.int64) for _ in range(depth - 1)])
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Return a trie built from lexicographically sorted unique rows."""
+        n_rows, depth = rows.shape
+        ids = []
+        starts = []
+        # Whether each row starts a new prefix of the current length
+        first = np.zeros(n_rows, dtype=bool)
+        if n_rows:
+            first[0] = True
+        prev_nodes = None
+        for level in range(depth):
+            first[1:] |= rows[1:, level] != rows[:-1, level]
+            ids.append(rows[first, level].astype(np.int32))
+            nodes = np.cumsum(first) - 1
+            if prev_nodes is not None:
+                # Every node has at least one child, so the parents are
+                # sorted and each one appears.
+                parents = prev_nodes[first]
+                starts.append(np.searchsorted(
+                    parents, np.arange(len(ids[level - 1]) + 1)).astype(np.int64))
+            prev_nodes = nodes
+        return cls(ids, starts)
+
+    @classmethod
+    def from_levels(cls, levels):
+        """Return a trie built from rows of every length.
+
+        levels[k] holds lexicographically sorted unique rows of length
+        k + 1, and the prefix of each row must appear in levels[k - 1].
+        """
+        trie = cls([], [])
+        for level, rows in enumerate(levels):
+            if level:
+                parents = trie.find_many(rows[:, :level])
+                if len(parents) and parents.min() < 0:
+                    raise ValueError("Rows of length {} have prefixes that are "
+                                     "not in the level below".format(level + 1))
+                trie.starts.append(np.searchsorted(
+                    parents, np.arange(len(levels[level - 1]) + 1)).astype(np.int64))
+            trie.ids.append(rows[:, level].astype(np.int32))
+        return trie
+
+    @property
+    def depth(self):
+        """Return the number of levels in the trie."""
+        return len(self.ids)
+
+    def child_range(self, level, node):
+        """Return the range of children at level + 1 of a node at level.
+
+        A level of -1 refers to the root, whose children are all of
+        level 0.
+        """
+        if level < 0:
+            return 0, len(self.ids[0])
+        starts = self.starts[level]
+        return int(starts[node]), int(starts[node + 1])
+
+    def find(self, path):
+        """Return the index of the node reached by path, or -1 if absent."""
+        node = -1
+        for level, idx in enumerate(path):
+            lo, hi = self.child_range(level - 1, node)
+            ids = self.ids[level]
+            node = lo + int(ids[lo:hi].searchsorted(idx))
+            if node == hi or ids[node] != idx:
+                return -1
+        return node
+
+    def find_many(self, paths):
+        """Return the node index for each row of paths, -1 if absent."""
+        n_paths, depth = paths.shape
+        found = np.ones(n_paths, dtype=bool)
+        lo = np.zeros(n_paths, dtype=np.int64)
+        hi = np.empty(n_paths, dtype=np.int64)
+        hi.fill(len(self.ids[0]))
+        pos = lo
+        for level in range(depth):
+            ids = self.ids[level]
+            targets = paths[:, level]
+            pos = bisect_left_many(ids, lo, hi, targets)
+            hit = found & (pos < hi)
+            hit[hit] = ids[pos[hit]] == targets[hit]
+            found = hit
+            if not found.any():
+                return np.repeat(-1, n_paths)
+            if level + 1 < depth:
+                safe = np.where(found, pos, 0)
+                starts = self.starts[level]
+                lo = np.where(found, starts[safe], 0)
+                hi = np.where(found, starts[safe + 1], 0)
+        return np.where(found, pos, -1)
+
+    def parents(self, level):
+        """Return the index of the parent of each node at level."""
+        return np.repeat(np.arange(len(self.ids[level - 1])),
+                         np.diff(self.starts[level - 1]))
+
+    def rows(self, depth=None):
+        """Return the paths to all nodes at the given depth as rows."""
+        if depth is None:
+            depth = self.depth
+        n_rows = len(self.ids[depth - 1]) if depth else 0
+        rows = np.empty((n_rows, depth), dtype=np.int32)
+        if not depth:
+            return rows
+        rows[:, -1] = self.ids[depth - 1]
+        nodes = np.arange(n_rows)
+        for level in range(depth - 2, -1, -1):
+            nodes = self.parents(level + 1)[nodes]
+            rows[:, level] = self.ids[level][nodes]
+        return rows
+
+
+class CompactFreqDist(object):
+
+    """A read-only frequency distribution over one condition of a
+    CompactConditionalFreqDist.
+
+    The view reflects the counts at the time it was created.
+    """
+
+    __slots__ = ('_symbols', '_ids', '_counts', '_total')
+
+    def __init__(self, symbols, ids, counts, total):
+        self._symbols = symbols
+        self._ids = ids
+        self._counts = counts
+        self._total = total
+
+    def _index(self, item):
+        """Return the position of an item, or -1 if it is unobserved."""
+        idx = self._symbols.get(item)
+        if idx is None:
+            return -1
+        pos = int(self._ids.searchsorted(idx))
+        if pos < len(self._ids) and self._ids[pos] == idx:
+            return pos
+        return -1
+
+    def freq(self, item):
+        """Return the probability of an item."""
+        return self.smoothed_freq(item)
+
+    def smoothed_freq(self, item, add=0):
+        """Return the probability of an item after adding add to each count."""
+        if self._total <= 0:
+            raise ValueError("No events counted yet")
+        return (self.count(item) + add) / float(self._total + len(self._ids) * add)
+
+    def logfreq(self, item, add=0):
+        """Return the base 2 log probability of an item, as in smoothed_freq."""
+        prob = self.smoothed_freq(item, add)
+        return math.log(prob, 2) if prob > 0 else float('-inf')
+
+    def count(self, item):
+        """Return the count of an item."""
+        pos = self._index(item)
+        return int(self._counts[pos]) if pos >= 0 else 0
+
+    @property
+    def total_count(self):
+        """Return the total number of events observed."""
+        return self._total
+
+    @property
+    def total_outcomes(self):
+        """Return the number of possible outcomes."""
+        return len(self._ids)
+
+    def outcomes(self):
+        """Return the outcomes of the distribution."""
+        symbols = self._symbols.symbols
+        return [symbols[idx] for idx in self._ids.tolist()]
+
+    def __iter__(self):
+        return iter(self.outcomes())
+
+    def __contains__(self, item):
+        return self._index(item) >= 0
+
+
+class CompactConditionalFreqDist(object):
+
+    """A conditional frequency distribution over n-grams of a fixed order.
+
+    Conditions are tuples of order - 1 items, or None for unigrams.
+    Unlike ConditionalFreqDist, looking up an unseen condition raises
+    KeyError instead of creating it. Counts are added with inc or
+    inc_all and are buffered until the next query.
+
+    >>> cfd = CompactConditionalFreqDist(2)
+    >>> cfd.inc_all([(('a',), 'b'), (('a',), 'c'), (('b',), 'c'), (('a',), 'b')])
+    >>> ('a',) in cfd
+    True
+    >>> ('c',) in cfd
+    False
+    >>> dist = cfd[('a',)]
+    >>> dist.count('b'), dist.count('z'), dist.total_count, dist.total_outcomes
+    (2, 0, 3, 2)
+    >>> sorted((condition, dist.outcomes()) for condition, dist in cfd.items())
+    [(('a',), ['b', 'c']), (('b',), ['c'])]
+
+    """
+
+    def __init__(self, order):
+        self._order = order
+        self._symbols = SymbolTable()
+        self._read_only = False
+        self._buffer = array('i')
+        self._amounts = array('l')
+        self._set_rows(np.zeros((0, order), dtype=np.int32),
+                       np.zeros(0, dtype=np.int64))
+
+    @property
+    def order(self):
+        """Return the number of items in each n-gram."""
+        return self._order
+
+    @property
+    def symbols(self):
+        """Return the SymbolTable used to intern items."""
+        return self._symbols
+
+    def _set_rows(self, rows, counts):
+        """Replace the stored counts with sorted unique rows and counts."""
+        trie = (PackedTrie.from_rows(rows) if len(rows) else
+                PackedTrie.empty(self._order))
+        self._set_arrays(trie, counts)
+
+    def _set_arrays(self, trie, counts, totals=None):
+        """Replace the stored counts with a trie and its counts."""
+        self._trie = trie
+        self._counts = counts
+        # Offsets of the outcomes of each condition
+        if self._order > 1:
+            self._event_starts = self._trie.starts[-1]
+        else:
+            self._event_starts = np.array([0, len(counts)], dtype=np.int64)
+        if totals is None:
+            totals = (np.add.reduceat(counts, self._event_starts[:-1])
+                      if len(counts) else np.zeros(0, dtype=np.int64))
+        self._totals = totals
+
+    def _compact(self):
+        """Merge any buffered counts into the arrays."""
+        if not self._amounts:
+            return
+        new_rows = np.frombuffer(self._buffer, dtype=np.intc).reshape(-1, self._order)
+        new_counts = np.frombuffer(self._amounts, dtype=np.int_)
+        rows = np.concatenate([self._trie.rows(), new_rows.astype(np.int32)])
+        counts = np.concatenate([self._counts, new_counts.astype(np.int64)])
+        self._buffer = array('i')
+        self._amounts = array('l')
+        self._set_rows(*aggregate_rows(rows, counts))
+
+    def _check_writable(self):
+        """Raise ValueError if the counts are read-only."""
+        if self._read_only:
+            raise ValueError("Cannot change read-only counts")
+
+    def freeze(self):
+        """Merge any buffered counts and prevent further changes."""
+        self._compact()
+        self._read_only = True
+
+    @property
+    def frozen(self):
+        """Return whether the counts are read-only."""
+        return self._read_only
+
+    def _check_condition(self, condition):
+        """Raise ValueError if a condition is not the right length."""
+        length = len(condition) if condition is not None else 0
+        if length != self._order - 1:
+            raise ValueError("Condition {!r} does not have {} items".format(
+                condition, self._order - 1))
+
+    def inc(self, condition, outcome, amount=1):
+        """Increment the count of an outcome in a condition."""
+        self.inc_all(((condition, outcome),), amount)
+
+    def inc_all(self, pairs, amount=1):
+        """Increment the count of each (condition, outcome) pair."""
+        self._check_writable()
+        intern = self._symbols.intern
+        buf = self._buffer
+        amounts = self._amounts
+        limit = max(MIN_BUFFER_SIZE, len(self._counts))
+        for condition, outcome in pairs:
+            self._check_condition(condition)
+            if condition is not None:
+                buf.extend([intern(item) for item in condition])
+            buf.append(intern(outcome))
+            amounts.append(amount)
+            if len(amounts) >= limit:
+                self._compact()
+                buf = self._buffer
+                amounts = self._amounts
+                limit = max(MIN_BUFFER_SIZE, len(self._counts))
+
+    def merge(self, other):
+        """Add the counts of another conditional frequency distribution."""
+        self._check_writable()
+        if not isinstance(other, CompactConditionalFreqDist):
+            for condition, dist in other.iteritems():
+                for outcome in dist:
+                    self.inc(condition, outcome, dist.count(outcome))
+            return
+
+        if other.order != self._order:
+            raise ValueError("Cannot merge distributions of order {} and {}".format(
+                self._order, other.order))
+        other._compact()  # pylint: disable=W0212
+        if not len(other._counts):  # pylint: disable=W0212
+            return
+        # Translate the other ids into ours and merge all at once
+        intern = self._symbols.intern
+        mapping = np.array([intern(symbol) for symbol in other.symbols], dtype=np.int32)
+        self._compact()
+        rows = np.concatenate([self._trie.rows(),
+                               mapping[other._trie.rows()]])  # pylint: disable=W0212
+        counts = np.concatenate([self._counts, other._counts])  # pylint: disable=W0212
+        self._set_rows(*aggregate_rows(rows, counts))
+
+    def __iadd__(self, other):
+        self.merge(other)
+        return self
+
+    def ngram_arrays(self):
+        """Return the SymbolTable, the n-grams as rows of ids, and their counts."""
+        self._compact()
+        return self._symbols, self._trie.rows(), self._counts
+
+    @classmethod
+    def from_cfd(cls, cfd, order):
+        """Return a compact copy of a conditional frequency distribution."""
+        result = cls(order)
+        result.merge(cfd)
+        return result
+
+    def save(self, path):
+        """Save a binary snapshot of the counts to a file."""
+        self._compact()
+        offsets, data, order, is_unicode = _encode_symbols(self._symbols)
+        arrays = [('symbol_offsets', offsets), ('symbol_data', data),
+                  ('symbol_order', order), ('counts', self._counts),
+                  ('totals', self._totals)]
+        arrays.extend(('ids{}'.format(level), ids)
+                      for level, ids in enumerate(self._trie.ids))
+        arrays.extend(('starts{}'.format(level), starts)
+                      for level, starts in enumerate(self._trie.starts))
+        write_arrays(path, {'order': self._order, 'unicode': is_unicode}, arrays)
+
+    @classmethod
+    def load(cls, path, mmap=False):
+        """Return a conditional frequency distribution loaded from a snapshot.
+
+        If mmap is True, the snapshot is memory-mapped instead of read
+        into memory. The counts can then be queried but not changed,
+        and processes that map the same file share its pages.
+        """
+        metadata, arrays = read_arrays(path, mmap)
+        order = metadata['order']
+        result = cls(order)
+        if mmap:
+            result._symbols = MappedSymbolTable(  # pylint: disable=W0212
+                arrays['symbol_offsets'], arrays['symbol_data'],
+                arrays['symbol_order'], metadata['unicode'])
+            result._read_only = True  # pylint: disable=W0212
+        else:
+            result._symbols = SymbolTable(  # pylint: disable=W0212
+                _decode_symbols(arrays['symbol_offsets'], arrays['symbol_data'],
+                                metadata['unicode']))
+        trie = PackedTrie([arrays['ids{}'.format(level)] for level in range(order)],
+                          [arrays['starts{}'.format(level)] for level in range(order - 1)])
+        result._set_arrays(trie, arrays['counts'], arrays['totals'])  # pylint: disable=W0212
+        return result
+
+    def _find_condition(self, condition):
+        """Return the index of a condition, or -1 if it is unobserved."""
+        self._compact()
+        if condition is None:
+            return 0 if self._order == 1 and len(self._counts) else -1
+        if len(condition) != self._order - 1:
+            return -1
+        get = self._symbols.get
+        ids = [get(item) for item in condition]
+        if None in ids:
+            return -1
+        return self._trie.find(ids)
+
+    def _dist(self, index):
+        """Return a view of the condition with the given index."""
+        lo = int(self._event_starts[index])
+        hi = int(self._event_starts[index + 1])
+        return CompactFreqDist(self._symbols, self._trie.ids[-1][lo:hi],
+                               self._counts[lo:hi], int(self._totals[index]))
+
+    def counts_many(self, conditions, outcomes):
+        """Return counts for aligned sequences of conditions and outcomes.
+
+        Three arrays are returned: the count of each outcome in its
+        condition, the total count of the condition, and the number
+        of outcomes of the condition. Unobserved conditions have a
+        total and number of outcomes of zero.
+        """
+        self._compact()
+        get = self._symbols.get
+        outcome_ids = np.array([get(item, -1) for item in outcomes], dtype=np.int64)
+        n_items = len(outcome_ids)
+        if self._order == 1:
+            index = np.repeat(0 if len(self._counts) else -1, n_items)
+        else:
+            condition_ids = np.array([[get(item, -1) for item in condition]
+                                      for condition in conditions], dtype=np.int64)
+            index = self._trie.find_many(condition_ids.reshape(n_items, self._order - 1))
+
+        found = index >= 0
+        if not found.any():
+            zeros = np.zeros(n_items, dtype=np.int64)
+            return zeros, zeros, zeros
+        safe = np.where(found, index, 0)
+        lo = np.where(found, self._event_starts[safe], 0)
+        hi = np.where(found, self._event_starts[safe + 1], 0)
+        ids = self._trie.ids[-1]
+        pos = bisect_left_many(ids, lo, hi, outcome_ids)
+        hit = pos < hi
+        hit[hit] = ids[pos[hit]] == outcome_ids[hit]
+        counts = np.where(hit, self._counts[np.where(hit, pos, 0)], 0)
+        totals = np.where(found, self._totals[safe], 0)
+        return counts, totals, hi - lo
+
+    def __contains__(self, condition):
+        return self._find_condition(condition) >= 0
+
+    def __getitem__(self, condition):
+        index = self._find_condition(condition)
+        if index < 0:
+            raise KeyError(condition)
+        return self._dist(index)
+
+    def get(self, condition, default=None):
+        """Return the distribution for a condition, or default if unobserved."""
+        index = self._find_condition(condition)
+        return self._dist(index) if index >= 0 else default
+
+    def __len__(self):
+        self._compact()
+        return len(self._totals)
+
+    def iterkeys(self):
+        """Return an iterator over the conditions."""
+        self._compact()
+        if self._order == 1:
+            return iter([None] if len(self._counts) else [])
+        symbols = self._symbols.symbols
+        return (tuple(symbols[idx] for idx in row)
+                for row in self._trie.rows(self._order - 1).tolist())
+
+    def keys(self):
+        """Return a list of the conditions."""
+        return list(self.iterkeys())
+
+    def __iter__(self):
+        return self.iterkeys()
+
+    def iteritems(self):
+        """Return an iterator over (condition, distribution) pairs."""
+        for index, condition in enumerate(self.iterkeys()):
+            yield condition, self._dist(index)
+
+    def items(self):
+        """Return a list of (condition, distribution) pairs."""
+        return list(self.iteritems())
+
+    def itersorted(self):
+        """Return an iterator over (condition, distribution) pairs sorted by condition.
+
+        Conditions are ordered by their symbols rather than their ids,
+        which only requires an array of indices to be sorted.
+        """
+        self._compact()
+        if self._order == 1:
+            return self.iteritems()
+        symbols = self._symbols.symbols
+        rows = self._trie.rows(self._order - 1)
+        order = sorted_rows(rows, symbol_ranks(symbols))
+        return ((tuple(symbols[idx] for idx in rows[index]), self._dist(index))
+                for index in order.tolist())
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,195 @@
+"""
+Evaluation of n-gram models on held-out data.
+
+Tokens are streamed through a model in chunks, so memory use does not
+depend on the amount of data evaluated. Surprisal is measured in bits.
+
+"""
+
+# Copyright 2014 Constantine Lignos
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+from itertools import islice, imap
+from multiprocessing import Pool
+
+import numpy as np
+
+from lingtools.prob.ngram import Smoothing, is_backoff, iter_tokens
+
+# The default number of tokens scored at once
+DEFAULT_CHUNK_SIZE = 100000
+
+# The model used by worker processes, set when each worker starts
+_worker_model = None  # pylint: disable=C0103
+
+
+class Evaluation(object):
+
+    """Totals from evaluating a model on held-out tokens.
+
+    Tokens that the model gives a probability of zero, such as unknown
+    words, are counted as out of vocabulary (OOV) and are excluded
+    from the cross-entropy and perplexity.
+
+    >>> result = Evaluation()
+    >>> result.add(np.array([1.0, 3.0, np.inf]))
+    >>> result.tokens, result.oovs, result.cross_entropy, result.perplexity
+    (3, 1, 2.0, 4.0)
+
+    """
+
+    def __init__(self, tokens=0, oovs=0, surprisal=0.0, seconds=0.0):
+        self.tokens = tokens
+        self.oovs = oovs
+        self.surprisal = surprisal
+        self.seconds = seconds
+
+    def add(self, surprisals):
+        """Add an array of token surprisals to the totals."""
+        finite = np.isfinite(surprisals)
+        self.tokens += len(surprisals)
+        self.oovs += len(surprisals) - int(np.count_nonzero(finite))
+        self.surprisal += float(surprisals[finite].sum())
+
+    def merge(self, other):
+        """Add the totals of another evaluation, except for its time."""
+        self.tokens += other.tokens
+        self.oovs += other.oovs
+        self.surprisal += other.surprisal
+
+    @property
+    def scored(self):
+        """Return the number of tokens that are not OOV."""
+        return self.tokens - self.oovs
+
+    @property
+    def cross_entropy(self):
+        """Return the mean surprisal of tokens that are not OOV."""
+        if not self.scored:
+            raise ValueError("No tokens were scored")
+        return self.surprisal / self.scored
+
+    @property
+    def perplexity(self):
+        """Return the perplexity of tokens that are not OOV."""
+        return 2 ** self.cross_entropy
+
+    @property
+    def tokens_per_second(self):
+        """Return the number of tokens evaluated per second."""
+        return self.tokens / self.seconds if self.seconds else float('inf')
+
+    def __str__(self):
+        return ("{} tokens, {} OOVs, cross-entropy {:.4f} bits, perplexity {:.2f}, "
+                "{:.0f} tokens/second").format(
+                    self.tokens, self.oovs, self.cross_entropy, self.perplexity,
+                    self.tokens_per_second)
+
+
+def chunk_tokens(tokens, order, chunk_size):
+    """Return an iterator over overlapping chunks of an iterable of tokens.
+
+    Each chunk but the first starts with the order - 1 tokens before
+    it, so that every token after the first order - 1 is scored in
+    exactly one chunk.
+
+    >>> list(chunk_tokens(iter(range(7)), 2, 3))
+    [[0, 1, 2, 3], [3, 4, 5, 6]]
+
+    """
+    tokens = iter(tokens)
+    overlap = max(order - 1, 0)
+    chunk = list(islice(tokens, overlap + chunk_size))
+    while len(chunk) > overlap:
+        yield chunk
+        chunk = chunk[len(chunk) - overlap:] if overlap else []
+        chunk.extend(islice(tokens, chunk_size))
+
+
+def surprisals(model, tokens, smoothing=Smoothing.KNESER_NEY,
+               chunk_size=DEFAULT_CHUNK_SIZE):
+    """Return an iterator over arrays of token surprisals, one per chunk.
+
+    As in NgramModel.prob_many, each token is scored in the context of
+    the tokens preceding it, starting with the token at index
+    model.order - 1. Tokens with a probability of zero have a
+    surprisal of inf.
+    """
+    for chunk in chunk_tokens(tokens, model.order, chunk_size):
+        yield -model.logprob_many(chunk, smoothing=smoothing)
+
+
+def evaluate(model, tokens, smoothing=Smoothing.KNESER_NEY, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Return an Evaluation of a model on an iterable of tokens."""
+    start = time.time()
+    result = Evaluation()
+    for chunk_surprisals in surprisals(model, tokens, smoothing, chunk_size):
+        result.add(chunk_surprisals)
+    result.seconds = time.time() - start
+    return result
+
+
+def _init_worker(model):
+    """Set the model used by a worker process."""
+    global _worker_model  # pylint: disable=W0603,C0103
+    _worker_model = model
+
+
+def _evaluate_file(job):
+    """Return an Evaluation of the worker's model on a file."""
+    path, reader, smoothing, chunk_size = job
+    return evaluate(_worker_model, reader(path), smoothing, chunk_size)
+
+
+def evaluate_files(model, paths, smoothing=Smoothing.KNESER_NEY, processes=None,
+                   reader=iter_tokens, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Return an Evaluation of a model on files using multiple processes.
+
+    Each file is read by calling reader on its path, which must return
+    an iterable of tokens, and is evaluated in a separate process as
+    a separate stream. If processes is None, one process is used per
+    CPU. The time of the result is the elapsed time of the whole
+    evaluation. The reader must be a module-level function so that it
+    can be sent to worker processes.
+    """
+    start = time.time()
+    if is_backoff(smoothing):
+        # Compute the table once so that every worker shares it
+        model.backoff_table(smoothing)
+    jobs = [(path, reader, smoothing, chunk_size) for path in paths]
+    if processes == 1:
+        pool = None
+        _init_worker(model)
+        partials = imap(_evaluate_file, jobs)
+    else:
+        pool = Pool(processes, _init_worker, (model,))
+        partials = pool.imap_unordered(_evaluate_file, jobs)
+    result = Evaluation()
+    try:
+        for partial in partials:
+            result.merge(partial)
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+        else:
+            _init_worker(None)
+    result.seconds = time.time() - start
+    return result
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
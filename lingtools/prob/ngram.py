@@ -17,10 +17,15 @@ A simple N-gram model class.
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from itertools import product, izip, islice
-from operator import itemgetter
+import csv
+from itertools import product, izip, islice, imap
+from multiprocessing import Pool
+
+import numpy as np
 
 from lingtools.prob.probability import ConditionalFreqDist
+from lingtools.prob.compact import CompactConditionalFreqDist
+from lingtools.prob import backoff
 
 
 class Smoothing(object):
@@ -29,6 +34,24 @@ class Smoothing(object):
     NONE = None
     LAPLACE = "Laplace"
     ELE = "Expected Likelihood Estimate"
+    # The following methods back off to lower orders, so they can be
+    # used for unseen contexts.
+    KATZ = "Katz backoff"
+    KNESER_NEY = "Kneser-Ney"
+    # Interpolation weights are set using Witten-Bell estimates
+    INTERPOLATION = "Linear interpolation"
+    # Probabilities read from an ARPA file rather than computed
+    ARPA = "ARPA"
+
+
+class Storage(object):
+    """Define constants for count storage selection."""
+    # Dictionaries of tuples; fast to update but memory-hungry
+    DICT = "dict"
+    # Interned ids in sorted arrays; a fraction of the memory
+    COMPACT = "compact"
+    # A sparse matrix of contexts by events
+    SPARSE = "sparse"
 
 
 class NoSuchContextException(Exception):
@@ -36,13 +59,88 @@ class NoSuchContextException(Exception):
     pass
 
 
+# Functions that compute backoff tables for each smoothing method
+_BACKOFF_TABLES = {
+    Smoothing.KATZ: backoff.katz_table,
+    Smoothing.KNESER_NEY: backoff.kneser_ney_table,
+    Smoothing.INTERPOLATION: backoff.interpolated_table,
+}
+
+# The default number of events in each shard for parallel training
+DEFAULT_SHARD_SIZE = 1000000
+
+
+def read_tokens(path):
+    """Return a list of the whitespace-separated tokens in a file."""
+    with open(path, 'rU') as token_file:
+        return [token for line in token_file for token in line.split()]
+
+
+def iter_tokens(path):
+    """Return an iterator over the whitespace-separated tokens in a file."""
+    with open(path, 'rU') as token_file:
+        for line in token_file:
+            for token in line.split():
+                yield token
+
+
+def shard_tokens(tokens, order, shard_size):
+    """Split a sequence of tokens into shards for an n-gram model.
+
+    Each shard but the first starts with the order - 1 tokens before
+    it, so that every n-gram of the input appears in exactly one shard.
+
+    >>> shard_tokens(range(7), 2, 3)
+    [[0, 1, 2], [2, 3, 4, 5], [5, 6]]
+
+    """
+    overlap = max(order - 1, 0)
+    return [tokens[max(start - overlap, 0):start + shard_size]
+            for start in range(0, len(tokens), shard_size)]
+
+
+def _count_shard(job):
+    """Return the counts of a model trained on a single shard."""
+    order, storage, data, reader = job
+    if reader is not None:
+        data = reader(data)
+    model = NgramModel(order, storage=storage)
+    model.update(data)
+    return model._cfd  # pylint: disable=W0212
+
+
+def _smoothing_add(smoothing):
+    """Return the amount added to each count for additive smoothing."""
+    if smoothing == Smoothing.LAPLACE:
+        return 1
+    elif smoothing == Smoothing.ELE:
+        return 0.5
+    else:
+        raise ValueError("Uknown smoothing: {}".format(smoothing))
+
+
+def is_backoff(smoothing):
+    """Return whether a smoothing method uses a backoff table."""
+    return smoothing in _BACKOFF_TABLES or smoothing == Smoothing.ARPA
+
+
+def _encode(item):
+    """Return an item as a byte string for output."""
+    return item.encode('utf-8') if isinstance(item, unicode) else item
+
+
 class NgramModel(object):
     """A simple N-gram model."""
 
-    def __init__(self, n, training_data=None):
-        """Create an n order model using training_data."""
+    def __init__(self, n, training_data=None, storage=Storage.DICT):
+        """Create an n order model using training_data.
+
+        The storage argument selects how counts are stored and should
+        be one of the values defined in Storage.
+        """
         # Set n and train
         self._order = n
+        self._storage = storage
         self._cfd = None
         self.reset()
 
@@ -51,67 +149,273 @@ class NgramModel(object):
 
     def reset(self):
         """Clear all trained data structures."""
-        self._cfd = ConditionalFreqDist()
+        # Cached backoff tables, recomputed after any change in counts
+        self._tables = {}
+        # The table read from an ARPA file, which training does not change
+        self._arpa_table = None
+        if self._storage == Storage.DICT:
+            self._cfd = ConditionalFreqDist()
+        elif self._storage == Storage.COMPACT:
+            self._cfd = CompactConditionalFreqDist(self._order)
+        elif self._storage == Storage.SPARSE:
+            # Imported here so that only sparse storage requires SciPy
+            from lingtools.prob.sparse import SparseConditionalFreqDist
+            self._cfd = SparseConditionalFreqDist()
+        else:
+            raise ValueError("Unknown storage: {}".format(self._storage))
 
     @property
     def order(self):
         """Return the order (1 = unigram, 2 = bigram, etc.)  of the model."""
         return self._order
 
-    def update(self, training_data):
-        """Train on iterable training data."""
+    @property
+    def storage(self):
+        """Return the type of storage used for counts."""
+        return self._storage
+
+    def _context_events(self, data):
+        """Return an iterator over the (context, event) pairs in data."""
         if self._order == 1:
             # In the unigram case, the context is always None
-            train_iter = product((None,), training_data)
+            return product((None,), data)
         else:
             # Skip the first n-1 events
-            events = islice(training_data, self._order - 1, None)
+            events = islice(data, self._order - 1, None)
             # Each iterable in context represents the trailing
             # history. For example, the first context starts from
             # index zero of the data, the second starts from index 1,
             # etc. Note that the number of things in contexts is
             # O(self._order), so making it a list instead of a generator
             # is not a problem.
-            contexts = [islice(training_data, offset, None)
+            contexts = [islice(data, offset, None)
                         for offset in range(self._order - 1)]
             # Pair each event with each trailing context, thus for an
             # event with index i ((..., i-2, i-1), i).
-            train_iter = izip(izip(*contexts), events)
-        # Update on the data
-        for context, event in train_iter:
-            self._cfd[context].inc(event)
+            return izip(izip(*contexts), events)
+
+    def update(self, training_data):
+        """Train on iterable training data."""
+        self._tables.clear()
+        self._cfd.inc_all(self._context_events(training_data))
+
+    def update_parallel(self, training_data, processes=None,
+                        shard_size=DEFAULT_SHARD_SIZE):
+        """Train on sequence training data using multiple processes.
+
+        The data is split into shards of shard_size events that are
+        counted in separate processes and then merged. The result is
+        identical to calling update on the same data. If processes is
+        None, one process is used per CPU.
+        """
+        shards = shard_tokens(training_data, self._order, shard_size)
+        self._update_shards([(self._order, self._storage, shard, None)
+                             for shard in shards], processes)
+
+    def update_files(self, paths, processes=None, reader=read_tokens):
+        """Train on each of a sequence of files using multiple processes.
+
+        Each file is read by calling reader on its path, which must
+        return a sequence of tokens, and is counted in a separate
+        process. The result is identical to calling update on each
+        file's tokens in turn. The reader must be a module-level
+        function so that it can be sent to worker processes.
+        """
+        self._update_shards([(self._order, self._storage, path, reader)
+                             for path in paths], processes)
+
+    def _update_shards(self, jobs, processes):
+        """Count each shard and merge the results into the model."""
+        self._tables.clear()
+        if processes == 1:
+            pool = None
+            partials = imap(_count_shard, jobs)
+        else:
+            pool = Pool(processes)
+            partials = pool.imap_unordered(_count_shard, jobs)
+        try:
+            for partial in partials:
+                self._cfd.merge(partial)
+        finally:
+            if pool:
+                pool.close()
+                pool.join()
+
+    def freeze(self):
+        """Prevent further training so that probabilities can be cached.
+
+        With dict storage, each context caches its probabilities for
+        each smoothing method on first use. Any later attempt to
+        change the counts raises ValueError.
+        """
+        self._cfd.freeze()
+
+    @property
+    def frozen(self):
+        """Return whether the model is frozen."""
+        return self._cfd.frozen
+
+    def merge(self, other):
+        """Add the counts of another model of the same order to this one."""
+        if other.order != self._order:
+            raise ValueError("Cannot merge models of order {} and {}".format(
+                self._order, other.order))
+        self._tables.clear()
+        self._cfd.merge(other._cfd)  # pylint: disable=W0212
+
+    def __iadd__(self, other):
+        self.merge(other)
+        return self
+
+    def save(self, path):
+        """Save a binary snapshot of the model's counts to a file.
+
+        Snapshots use the same layout for all storage types, and the
+        items counted must be strings.
+        """
+        self._compact_counts().save(path)
+
+    @classmethod
+    def load(cls, path, storage=Storage.DICT, mmap=False):
+        """Return a model loaded from a snapshot using the given storage.
+
+        The model can be updated and saved again. If mmap is True, the
+        snapshot is memory-mapped instead of read, which requires
+        compact storage. The model then answers queries directly from
+        the file and shares its memory with other processes that map
+        it, but it cannot be updated.
+        """
+        if mmap and storage != Storage.COMPACT:
+            raise ValueError("Memory-mapping requires compact storage")
+        counts = CompactConditionalFreqDist.load(path, mmap)
+        model = cls(counts.order, storage=storage)
+        if storage == Storage.COMPACT:
+            model._cfd = counts  # pylint: disable=W0212
+        else:
+            model._cfd.merge(counts)  # pylint: disable=W0212
+        return model
+
+    @classmethod
+    def from_arpa(cls, path):
+        """Return a model with the probabilities in an ARPA file.
+
+        The model has no counts, so it should be queried using
+        Smoothing.ARPA. Training it does not change the probabilities
+        read from the file.
+        """
+        table = backoff.read_arpa(path)
+        model = cls(table.order, storage=Storage.COMPACT)
+        model._arpa_table = table  # pylint: disable=W0212
+        return model
+
+    def _compact_counts(self):
+        """Return the counts as a CompactConditionalFreqDist."""
+        if self._storage == Storage.COMPACT:
+            return self._cfd
+        else:
+            return CompactConditionalFreqDist.from_cfd(self._cfd, self._order)
+
+    def backoff_table(self, smoothing):
+        """Return the BackoffTable for a backoff smoothing method.
+
+        The table is computed on first use and cached until the
+        model's counts change. For Smoothing.ARPA, the table read by
+        from_arpa is returned.
+        """
+        if smoothing == Smoothing.ARPA:
+            if self._arpa_table is None:
+                raise ValueError("The model was not read from an ARPA file")
+            return self._arpa_table
+        try:
+            return self._tables[smoothing]
+        except KeyError:
+            if smoothing not in _BACKOFF_TABLES:
+                raise ValueError("Not a backoff smoothing: {}".format(smoothing))
+            table = _BACKOFF_TABLES[smoothing](*self._compact_counts().ngram_arrays())
+            self._tables[smoothing] = table
+            return table
 
     def prob(self, event, context, smoothing=Smoothing.NONE):
-        """Return the probability for an event in the provided context"""
+        """Return the probability for an event in the provided context
+
+        Unless a backoff smoothing method is used, NoSuchContextException
+        is raised for unseen contexts.
+        """
         # Sanitize context since it may accidentally be a list
         if context is not None:
             context = tuple(context)
 
-        # Explicitly test for presence of the context, as it will be
-        # automatically created if we try to get it.
-        if context not in self._cfd:
+        if is_backoff(smoothing):
+            return self.backoff_table(smoothing).prob(event, context)
+
+        # Use get to test for presence of the context, as it will be
+        # automatically created if we try to index it.
+        estimator = self._cfd.get(context)
+        if estimator is None:
             # Unknown contexts are not smoothed. It's pretty hard to
             # figure out how you would smooth them anyway; that's what
             # backoff is for. It's up to the caller to decide what to
             # do in this scenario.
             raise NoSuchContextException
 
-        estimator = self._cfd[context]
-
         if smoothing:
-            if smoothing == Smoothing.LAPLACE:
-                add = 1
-            elif smoothing == Smoothing.ELE:
-                add = 0.5
-            else:
-                raise ValueError("Uknown smoothing: {}".format(smoothing))
-            count = estimator.count(event)
-            total_count = estimator.total_count
-            event_count = estimator.total_outcomes
-            return (count + add) / (total_count + (event_count * add))
+            return estimator.smoothed_freq(event, _smoothing_add(smoothing))
         else:
             return estimator.freq(event)
 
+    def _aligned(self, events, contexts):
+        """Return aligned lists of events and contexts for batch scoring."""
+        if contexts is None:
+            pairs = list(self._context_events(events))
+            contexts = [context for context, _ in pairs]
+            events = [event for _, event in pairs]
+        else:
+            # Sanitize contexts since they may accidentally be lists
+            contexts = [tuple(context) if context is not None else None
+                        for context in contexts]
+            if len(contexts) != len(events):
+                raise ValueError("Events and contexts are not the same length")
+        return events, contexts
+
+    def prob_many(self, events, contexts=None, smoothing=Smoothing.NONE):
+        """Return an array of probabilities for aligned events and contexts.
+
+        If contexts is None, events is treated as a token stream and
+        each token is scored in the context of the tokens preceding it,
+        starting with the token at index order - 1. Smoothing is the
+        same as in prob, and unless a backoff smoothing method is used,
+        NoSuchContextException is raised if any context is unobserved.
+        """
+        events, contexts = self._aligned(events, contexts)
+        if is_backoff(smoothing):
+            return 10 ** self.backoff_table(smoothing).logprob_many(events, contexts)
+
+        counts, totals, outcomes = (np.asarray(values) for values in
+                                    self._cfd.counts_many(contexts, events))
+        if not outcomes.all():
+            raise NoSuchContextException
+
+        if smoothing:
+            add = _smoothing_add(smoothing)
+            return (counts + add) / (totals + outcomes * add).astype(np.float64)
+        else:
+            return counts / totals.astype(np.float64)
+
+    def logprob_many(self, events, contexts=None, smoothing=Smoothing.NONE, base=2):
+        """Return an array of log probabilities for aligned events and contexts.
+
+        Arguments are as in prob_many. Zero probabilities have a log
+        probability of -inf.
+        """
+        if is_backoff(smoothing):
+            events, contexts = self._aligned(events, contexts)
+            logprobs = self.backoff_table(smoothing).logprob_many(events, contexts)
+            return logprobs * (np.log(10) / np.log(base))
+
+        probs = self.prob_many(events, contexts, smoothing)
+        with np.errstate(divide='ignore'):
+            return np.log(probs) / np.log(base)
+
     def count(self, event, context):
         """Return the count for an event in the provided context."""
         # Sanitize context since it may accidentally be a list
@@ -136,9 +440,50 @@ class NgramModel(object):
 
         return estimator.total_count
 
+    def _ngram_dists(self, sort):
+        """Return an iterator over (event, context, distribution) for each N-gram."""
+        items = self._cfd.itersorted() if sort else self._cfd.iteritems()
+        for context, dist in items:
+            for event in (sorted(dist) if sort else dist):
+                yield event, context, dist
+
+    def iter_ngrams(self, sort=True):
+        """Return an iterator over all N-grams observed by the model.
+
+        Each N-gram is an (event, context, prob) triple. If sort is
+        True, N-grams are ordered by context and then by event;
+        otherwise they are in the order they are stored. Only the
+        contexts are held in memory, so this can be used for models
+        that have too many N-grams to fit in a list.
+        """
+        return ((event, context, dist.freq(event))
+                for event, context, dist in self._ngram_dists(sort))
+
     def allngrams(self):
         """Return all N-grams observed by the model and their probabilities."""
-        ngram_probs = ((event, context, self.prob(event, context))
-                       for context, dist in self._cfd.items()
-                       for event in dist)
-        return sorted(ngram_probs, key=itemgetter(1))
+        return list(self.iter_ngrams())
+
+    def write_ngrams(self, path, sort=True):
+        """Write all N-grams, their counts, and probabilities to a CSV file.
+
+        Each row contains the items of the N-gram, its count, and its
+        probability. N-grams are ordered as in iter_ngrams and are
+        written as they are generated.
+        """
+        with open(path, 'wb') as out_file:
+            writer = csv.writer(out_file)
+            writer.writerow(["word{}".format(idx + 1) for idx in range(self._order)] +
+                            ["count", "prob"])
+            for event, context, dist in self._ngram_dists(sort):
+                items = [_encode(item) for item in (context or ())]
+                items.append(_encode(event))
+                items.extend((dist.count(event), dist.freq(event)))
+                writer.writerow(items)
+
+    def write_arpa(self, path, smoothing=Smoothing.KATZ, sort=True):
+        """Write the model in ARPA format using a backoff smoothing method.
+
+        If sort is True, the N-grams of each order are sorted by their
+        items; otherwise they are in the order they are stored.
+        """
+        self.backoff_table(smoothing).write_arpa(path, sort)
@@ -19,6 +19,9 @@ Probability utility methods
 
 import math
 from collections import defaultdict, Counter
+from itertools import izip
+
+import numpy as np
 
 PROB_TOLERANCE = 0.000001
 
@@ -74,6 +77,74 @@ def surprisal(event_prob, context_prob, base=2):
         return -(math.log(event_prob, base) - math.log(context_prob, base))
 
 
+def ragged_sums(values, offsets):
+    """Return the sum of each segment of a flat array.
+
+    Segment i is values[offsets[i]:offsets[i + 1]], so offsets has one
+    more element than the number of segments and ends with the length
+    of values. Empty segments sum to zero.
+
+    >>> ragged_sums(np.array([1, 2, 3, 4]), np.array([0, 1, 1, 4])).tolist()
+    [1, 0, 9]
+
+    """
+    values = np.asarray(values)
+    offsets = np.asarray(offsets)
+    nonempty = offsets[1:] > offsets[:-1]
+    sums = np.zeros(len(offsets) - 1, dtype=values.dtype)
+    if nonempty.any():
+        sums[nonempty] = np.add.reduceat(values, offsets[:-1][nonempty])
+    return sums
+
+
+def entropy_many(counts, offsets, base=2):
+    """Return the entropy of each count vector in a ragged batch.
+
+    Vector i is counts[offsets[i]:offsets[i + 1]] and is normalized
+    before its entropy is computed, so the result for each vector
+    matches entropy(normalize_counts(vector)).
+
+    >>> entropy_many([1, 1, 3, 1, 1, 1], [0, 2, 3, 6], 2).tolist()
+    [1.0, 0.0, 1.584962500721156]
+    >>> entropy_many([1, 0], [0, 1, 2])
+    Traceback (most recent call last):
+    ValueError: Sum of counts is not positive
+
+    """
+    counts = np.asarray(counts, dtype=np.float64)
+    offsets = np.asarray(offsets)
+    lengths = np.diff(offsets)
+    totals = ragged_sums(counts, offsets)
+    if not (totals > 0).all():
+        raise ValueError("Sum of counts is not positive")
+    probs = counts / np.repeat(totals, lengths)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        plogp = np.where(probs > 0, probs * np.log(probs), 0.0)
+    # Subtract from zero to avoid returning -0.0
+    return 0.0 - ragged_sums(plogp, offsets) / math.log(base)
+
+
+def surprisal_many(event_probs, context_probs, base=2):
+    """Return the surprisal of each event given its conditioning context.
+
+    This is an array version of surprisal, and event and context
+    counts may be given instead of probabilities.
+
+    >>> surprisal_many([.5, .25, 1], [.5, .5, 4]).tolist()
+    [0.0, 1.0, 2.0]
+    >>> surprisal_many([.75], [.5])
+    Traceback (most recent call last):
+    ValueError: Improper conditional probability (event_prob > context_prob)
+
+    """
+    event_probs = np.asarray(event_probs, dtype=np.float64)
+    context_probs = np.asarray(context_probs, dtype=np.float64)
+    if (event_probs > context_probs).any():
+        raise ValueError("Improper conditional probability (event_prob > context_prob)")
+    log_base = math.log(base)
+    return np.log(context_probs) / log_base - np.log(event_probs) / log_base
+
+
 def normalize_counts(counts):
     """Convert a sequence of counts to probabilities.
 
@@ -87,6 +158,11 @@ def normalize_counts(counts):
     return [count / float(total) for count in counts]
 
 
+def _log2(prob):
+    """Return the base 2 log of a probability, or -inf if it is zero."""
+    return math.log(prob, 2) if prob > 0 else float('-inf')
+
+
 class FreqDist(object):
 
     """A frequency distribution.
@@ -117,24 +193,95 @@ class FreqDist(object):
     10
     >>> f.total_outcomes
     2
+    >>> f.smoothed_freq('c', 1)
+    0.08333333333333333
+    >>> f.freeze()
+    >>> round(f.logfreq('b'), 4)
+    -0.3219
+    >>> f.inc('a')
+    Traceback (most recent call last):
+    ValueError: Cannot change a frozen distribution
 
     """
 
     def __init__(self):
         self._counts = Counter()
         self._total = 0
+        # Probability tables for each amount of smoothing, only
+        # created once the distribution is frozen
+        self._tables = None
         super(FreqDist, self).__init__()
 
     def inc(self, item, amount=1):
         """Increment the count of an item by the given amount."""
+        if self._tables is not None:
+            raise ValueError("Cannot change a frozen distribution")
         self._total += amount
         self._counts[item] += amount
 
-    def freq(self, item):
-        """Return the probability of an item."""
+    def freeze(self):
+        """Prevent further changes so that probabilities can be cached.
+
+        The probabilities of every item for an amount of additive
+        smoothing are computed the first time they are needed, so
+        later queries take a single lookup.
+        """
+        if self._tables is None:
+            self._tables = {}
+
+    @property
+    def frozen(self):
+        """Return whether the distribution is frozen."""
+        return self._tables is not None
+
+    def _table(self, add):
+        """Return cached probabilities and log probabilities for add smoothing.
+
+        A tuple of a dictionary of probabilities, a dictionary of log
+        probabilities, and the probability and log probability of
+        unseen items is returned.
+        """
+        try:
+            return self._tables[add]
+        except KeyError:
+            denominator = self._denominator(add)
+            probs = dict((item, (count + add) / denominator)
+                         for item, count in self._counts.iteritems())
+            logprobs = dict((item, _log2(prob)) for item, prob in probs.iteritems())
+            unseen = add / denominator
+            table = (probs, logprobs, unseen, _log2(unseen))
+            self._tables[add] = table
+            return table
+
+    def _denominator(self, add):
+        """Return the denominator of probabilities with add smoothing."""
         if self._total <= 0:
             raise ValueError("No events counted yet")
-        return self._counts[item] / float(self._total)
+        return float(self._total + len(self._counts) * add)
+
+    def freq(self, item):
+        """Return the probability of an item."""
+        return self.smoothed_freq(item)
+
+    def smoothed_freq(self, item, add=0):
+        """Return the probability of an item after adding add to each count.
+
+        Only the observed outcomes are counted as possible outcomes.
+        """
+        if self._tables is not None:
+            probs, _, unseen, _ = self._table(add)
+            return probs.get(item, unseen)
+        return (self._counts[item] + add) / self._denominator(add)
+
+    def logfreq(self, item, add=0):
+        """Return the base 2 log probability of an item, as in smoothed_freq.
+
+        Items with a probability of zero have a log probability of -inf.
+        """
+        if self._tables is not None:
+            _, logprobs, _, unseen = self._table(add)
+            return logprobs.get(item, unseen)
+        return _log2(self.smoothed_freq(item, add))
 
     def count(self, item):
         """Return the count of an item."""
@@ -157,6 +304,18 @@ class FreqDist(object):
     def __contains__(self, item):
         return self._counts.__contains__(item)
 
+    def __iter__(self):
+        return iter(self._counts)
+
+    def merge(self, other):
+        """Add the counts of another frequency distribution to this one."""
+        for item in other:
+            self.inc(item, other.count(item))
+
+    def __iadd__(self, other):
+        self.merge(other)
+        return self
+
 
 class ConditionalFreqDist(defaultdict):
 
@@ -164,6 +323,79 @@ class ConditionalFreqDist(defaultdict):
 
     def __init__(self):
         super(ConditionalFreqDist, self).__init__(FreqDist)
+        self._frozen = False
+
+    def __reduce__(self):
+        # defaultdict pickles its factory as a constructor argument,
+        # which this class does not take.
+        return (ConditionalFreqDist, (), self.__dict__, None, self.iteritems())
+
+    def __missing__(self, key):
+        # Frozen distributions act like ordinary dictionaries
+        if self._frozen:
+            raise KeyError(key)
+        return super(ConditionalFreqDist, self).__missing__(key)
+
+    def freeze(self):
+        """Freeze every distribution and prevent conditions from being added."""
+        for dist in self.itervalues():
+            dist.freeze()
+        self._frozen = True
+
+    @property
+    def frozen(self):
+        """Return whether the distribution is frozen."""
+        return self._frozen
+
+    def _check_frozen(self):
+        """Raise ValueError if the distribution is frozen."""
+        if self._frozen:
+            raise ValueError("Cannot change a frozen distribution")
+
+    def inc_all(self, pairs, amount=1):
+        """Increment the count of each (condition, outcome) pair."""
+        self._check_frozen()
+        for condition, outcome in pairs:
+            self[condition].inc(outcome, amount)
+
+    def merge(self, other):
+        """Add the counts of another conditional frequency distribution."""
+        self._check_frozen()
+        for condition, dist in other.iteritems():
+            self[condition].merge(dist)
+
+    def __iadd__(self, other):
+        self.merge(other)
+        return self
+
+    def itersorted(self):
+        """Return an iterator over (condition, distribution) pairs sorted by condition."""
+        for condition in sorted(self.iterkeys()):
+            yield condition, self[condition]
+
+    def counts_many(self, conditions, outcomes):
+        """Return counts for aligned sequences of conditions and outcomes.
+
+        Three lists are returned: the count of each outcome in its
+        condition, the total count of the condition, and the number
+        of outcomes of the condition. Unobserved conditions have a
+        total and number of outcomes of zero.
+        """
+        counts = []
+        totals = []
+        n_outcomes = []
+        get = self.get
+        for condition, outcome in izip(conditions, outcomes):
+            dist = get(condition)
+            if dist is None:
+                counts.append(0)
+                totals.append(0)
+                n_outcomes.append(0)
+            else:
+                counts.append(dist.count(outcome))
+                totals.append(dist.total_count)
+                n_outcomes.append(dist.total_outcomes)
+        return counts, totals, n_outcomes
 
 
 if __name__ == "__main__":
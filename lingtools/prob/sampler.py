@@ -0,0 +1,119 @@
+"""
+Weighted random sampling of items.
+
+"""
+
+# Copyright 2014 Constantine Lignos
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+
+
+class AliasSampler(object):
+
+    """Sample items in proportion to their weights using the alias method.
+
+    Setup takes time linear in the number of items, after which each
+    draw takes constant time: a uniformly chosen slot either returns
+    its own item or the item it is aliased to (Walker's method, as
+    constructed by Vose). Draws are made using a NumPy RandomState,
+    which can be seeded for reproducibility.
+
+    >>> sampler = AliasSampler(['a', 'b', 'c'], [0, 1, 3], seed=0)
+    >>> draws = sampler.sample(10000)
+    >>> 'a' in draws, abs((draws == 'c').mean() - 0.75) < 0.02
+    (False, True)
+    >>> AliasSampler.from_counts({'x': 2}).draw()
+    'x'
+
+    """
+
+    def __init__(self, items, weights, seed=None):
+        weights = np.asarray(weights, dtype=np.float64)
+        if len(weights) != len(items):
+            raise ValueError("Items and weights are not the same length")
+        if not len(weights) or (weights < 0).any() or not weights.sum() > 0:
+            raise ValueError("Weights must be non-negative with a positive sum")
+        self._items = np.empty(len(items), dtype=object)
+        self._items[:] = items
+        self._random = np.random.RandomState(seed)
+        self._probs, self._aliases = self._build(weights)
+
+    @staticmethod
+    def _build(weights):
+        """Return the probability of keeping each slot and its alias."""
+        n_items = len(weights)
+        scaled = weights * (n_items / weights.sum())
+        probs = np.ones(n_items)
+        aliases = np.arange(n_items)
+        small = np.flatnonzero(scaled < 1.0).tolist()
+        large = np.flatnonzero(scaled >= 1.0).tolist()
+        scaled = scaled.tolist()
+        while small and large:
+            less = small.pop()
+            more = large.pop()
+            probs[less] = scaled[less]
+            aliases[less] = more
+            # Give the rest of the small slot to the large item
+            scaled[more] -= 1.0 - scaled[less]
+            if scaled[more] < 1.0:
+                small.append(more)
+            else:
+                large.append(more)
+        # Anything left is full up to rounding error
+        return probs, aliases
+
+    @classmethod
+    def from_counts(cls, counts, seed=None):
+        """Return a sampler for a dictionary of items to counts or weights."""
+        # Sort so that seeded draws do not depend on dictionary order
+        items = sorted(counts)
+        return cls(items, [counts[item] for item in items], seed)
+
+    @classmethod
+    def from_freqdist(cls, dist, seed=None):
+        """Return a sampler for the outcomes of a FreqDist."""
+        items = sorted(dist.outcomes())
+        return cls(items, [dist.count(item) for item in items], seed)
+
+    def seed(self, seed):
+        """Reseed the random number generator."""
+        self._random.seed(seed)
+
+    def sample_indices(self, size):
+        """Return an array of the indices of size sampled items."""
+        slots = self._random.randint(0, len(self._probs), size)
+        keep = self._random.random_sample(size) < self._probs[slots]
+        return np.where(keep, slots, self._aliases[slots])
+
+    def sample(self, size):
+        """Return an array of size sampled items."""
+        return self._items[self.sample_indices(size)]
+
+    def draw(self):
+        """Return a single sampled item."""
+        return self._items[self.sample_indices(1)[0]]
+
+    @property
+    def items(self):
+        """Return the array of items, in the order of their indices."""
+        return self._items
+
+    def __len__(self):
+        return len(self._items)
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
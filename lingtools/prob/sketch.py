@@ -0,0 +1,261 @@
+"""
+Approximate frequency distributions in fixed memory.
+
+CountMinFreqDist estimates the count of any item using a Count-Min
+sketch, and SpaceSavingFreqDist tracks the most frequent items using
+the Space-Saving algorithm. Both have the counting interface of
+FreqDist, but their memory use depends only on the error bounds
+requested, not on the number of distinct items counted, so they can
+be used on unbounded streams.
+
+"""
+
+# Copyright 2014 Constantine Lignos
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import heapq
+import math
+from operator import itemgetter
+
+import numpy as np
+
+# Default error bounds, as a fraction of the total count
+DEFAULT_EPSILON = 0.0001
+# Default probability that an estimate exceeds the error bound
+DEFAULT_DELTA = 0.01
+# Default seed for hash functions; sketches must share a seed to merge
+DEFAULT_SEED = 0
+
+
+class CountMinFreqDist(object):
+
+    """An approximate frequency distribution using a Count-Min sketch.
+
+    Counts are never underestimated. With probability 1 - delta, the
+    count of an item is overestimated by at most epsilon times the
+    total count. The sketch has ceil(log(1 / delta)) rows of at least
+    e / epsilon counters, rounded up to a power of two. Conservative
+    update is used, so each increment only raises the counters that
+    are below the new estimate, which reduces overestimation.
+
+    Items are hashed using hash, so they must hash identically in
+    every process that fills a sketch that will be merged.
+
+    >>> f = CountMinFreqDist(epsilon=0.01, delta=0.01)
+    >>> f.inc('a', 2)
+    >>> f.inc('b', 8)
+    >>> f.count('a'), f.count('b'), f.total_count
+    (2, 8, 10)
+    >>> f.freq('b')
+    0.8
+    >>> f.width, f.depth
+    (512, 5)
+
+    """
+
+    def __init__(self, epsilon=DEFAULT_EPSILON, delta=DEFAULT_DELTA, seed=DEFAULT_SEED):
+        if not 0 < epsilon < 1 or not 0 < delta < 1:
+            raise ValueError("epsilon and delta must be between 0 and 1")
+        self._epsilon = epsilon
+        self._delta = delta
+        self._seed = seed
+        self._bits = max(int(math.ceil(math.log(math.e / epsilon, 2))), 1)
+        depth = int(math.ceil(math.log(1 / delta)))
+        # Multiply-add-shift hashing; multipliers must be odd
+        rng = np.random.RandomState(seed)
+        self._multipliers = rng.randint(0, 1 << 62, depth).astype(np.uint64) * 2 + 1
+        self._offsets = rng.randint(0, 1 << 62, depth).astype(np.uint64)
+        self._shift = np.uint64(64 - self._bits)
+        self._rows = np.arange(depth)
+        self._table = np.zeros((depth, 1 << self._bits), dtype=np.int64)
+        self._total = 0
+
+    @property
+    def width(self):
+        """Return the number of counters in each row of the sketch."""
+        return self._table.shape[1]
+
+    @property
+    def depth(self):
+        """Return the number of rows in the sketch."""
+        return self._table.shape[0]
+
+    @property
+    def error_bound(self):
+        """Return the most a count is overestimated by with probability 1 - delta."""
+        return self._epsilon * self._total
+
+    def _columns(self, item):
+        """Return the counter in each row that an item hashes to."""
+        key = np.uint64(hash(item) & 0xFFFFFFFFFFFFFFFF)
+        with np.errstate(over='ignore'):
+            return (self._multipliers * key + self._offsets) >> self._shift
+
+    def inc(self, item, amount=1):
+        """Increment the count of an item by the given amount."""
+        if amount < 0:
+            raise ValueError("Counts cannot be decreased")
+        columns = self._columns(item)
+        counters = self._table[self._rows, columns]
+        self._table[self._rows, columns] = np.maximum(counters, counters.min() + amount)
+        self._total += amount
+
+    def count(self, item):
+        """Return the estimated count of an item."""
+        return int(self._table[self._rows, self._columns(item)].min())
+
+    def freq(self, item):
+        """Return the estimated probability of an item."""
+        if self._total <= 0:
+            raise ValueError("No events counted yet")
+        return self.count(item) / float(self._total)
+
+    @property
+    def total_count(self):
+        """Return the total number of events observed."""
+        return self._total
+
+    def __contains__(self, item):
+        return self.count(item) > 0
+
+    def merge(self, other):
+        """Add the counts of another sketch with the same parameters.
+
+        The result is no more accurate than if all counts had been
+        added to one sketch without conservative update.
+        """
+        if (self._table.shape != other._table.shape or  # pylint: disable=W0212
+                self._seed != other._seed):  # pylint: disable=W0212
+            raise ValueError("Cannot merge sketches with different parameters")
+        self._table += other._table  # pylint: disable=W0212
+        self._total += other._total  # pylint: disable=W0212
+
+    def __iadd__(self, other):
+        self.merge(other)
+        return self
+
+
+class SpaceSavingFreqDist(object):
+
+    """An approximate frequency distribution of the most frequent items.
+
+    At most capacity items are tracked. When a new item arrives and
+    every slot is taken, the item with the lowest count is replaced
+    and the new item inherits its count, which is recorded as its
+    error. Every item whose true count exceeds total_count / capacity
+    is tracked, and tracked counts are overestimated by at most
+    total_count / capacity. By default, the capacity is set from the
+    error bound epsilon, as a fraction of the total count.
+
+    >>> f = SpaceSavingFreqDist(capacity=2)
+    >>> for item in 'aababcaa':
+    ...     f.inc(item)
+    >>> f.top(2)
+    [('a', 5), ('c', 3)]
+    >>> f.count('c'), f.error('c'), f.count('b')
+    (3, 2, 0)
+    >>> f.total_count, f.total_outcomes
+    (8, 2)
+
+    """
+
+    def __init__(self, epsilon=DEFAULT_EPSILON, capacity=None):
+        if capacity is None:
+            if not 0 < epsilon < 1:
+                raise ValueError("epsilon must be between 0 and 1")
+            capacity = int(math.ceil(1 / epsilon))
+        if capacity < 1:
+            raise ValueError("Capacity must be positive")
+        self._capacity = capacity
+        self._counts = {}
+        self._errors = {}
+        # A min-heap of (count, item), which may hold outdated counts
+        self._heap = []
+        self._total = 0
+
+    @property
+    def capacity(self):
+        """Return the maximum number of items tracked."""
+        return self._capacity
+
+    def inc(self, item, amount=1):
+        """Increment the count of an item by the given amount."""
+        if amount < 0:
+            raise ValueError("Counts cannot be decreased")
+        self._total += amount
+        counts = self._counts
+        if item in counts:
+            counts[item] += amount
+        elif len(counts) < self._capacity:
+            counts[item] = amount
+            self._errors[item] = 0
+        else:
+            # Replace the item with the lowest count
+            heap = self._heap
+            while heap[0][0] != counts.get(heap[0][1]):
+                heapq.heappop(heap)
+            lowest, evicted = heapq.heappop(heap)
+            del counts[evicted]
+            del self._errors[evicted]
+            counts[item] = lowest + amount
+            self._errors[item] = lowest
+        heapq.heappush(self._heap, (counts[item], item))
+        if len(self._heap) > 4 * self._capacity:
+            # Discard outdated entries
+            self._heap = [(count, key) for key, count in counts.iteritems()]
+            heapq.heapify(self._heap)
+
+    def count(self, item):
+        """Return the estimated count of an item, or zero if it is not tracked."""
+        return self._counts.get(item, 0)
+
+    def error(self, item):
+        """Return the most the count of a tracked item may be overestimated by."""
+        return self._errors.get(item, 0)
+
+    def freq(self, item):
+        """Return the estimated probability of an item."""
+        if self._total <= 0:
+            raise ValueError("No events counted yet")
+        return self.count(item) / float(self._total)
+
+    def top(self, n=None):
+        """Return a list of the n most frequent (item, count) pairs, highest first."""
+        ranked = sorted(self._counts.iteritems(), key=itemgetter(1), reverse=True)
+        return ranked[:n] if n is not None else ranked
+
+    @property
+    def total_count(self):
+        """Return the total number of events observed."""
+        return self._total
+
+    @property
+    def total_outcomes(self):
+        """Return the number of items tracked."""
+        return len(self._counts)
+
+    def outcomes(self):
+        """Return the items tracked."""
+        return self._counts.keys()
+
+    def __contains__(self, item):
+        return item in self._counts
+
+    def __iter__(self):
+        return iter(self._counts)
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
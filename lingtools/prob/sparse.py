@@ -0,0 +1,295 @@
+"""
+Conditional frequency distributions stored as sparse matrices.
+
+Conditions and outcomes are interned to integer ids, which index the
+rows and columns of a compressed sparse row (CSR) matrix of counts.
+This allows whole distributions to be built from arrays and
+normalized with a single vectorized operation.
+
+"""
+
+# Copyright 2014 Constantine Lignos
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from array import array
+from itertools import imap
+
+import numpy as np
+from scipy import sparse
+
+from lingtools.prob import compact
+from lingtools.prob.compact import CompactFreqDist, bisect_left_many
+from lingtools.util.symbols import SymbolTable
+
+
+def _intern_all(symbols, items):
+    """Return an array of the ids of items, interning them as needed."""
+    return np.fromiter(imap(symbols.intern, items), dtype=np.int32)
+
+
+class SparseConditionalFreqDist(object):
+
+    """A conditional frequency distribution backed by a CSR matrix.
+
+    Counts added with inc and inc_all are buffered and merged into the
+    matrix when it is next needed. Unobserved conditions are never
+    created by lookups, and the distribution of a condition is a
+    read-only view of its row.
+
+    >>> cfd = SparseConditionalFreqDist.from_arrays(['a', 'a', 'b'], ['b', 'c', 'c'], [2, 1, 3])
+    >>> cfd.inc('a', 'b')
+    >>> cfd['a'].count('b'), cfd['a'].total_count, 'z' in cfd
+    (3, 4, False)
+    >>> cfd.matrix.toarray().tolist()
+    [[3, 1], [0, 3]]
+    >>> cfd.totals.tolist()
+    [4, 3]
+    >>> cfd.conditional_probs().toarray().tolist()
+    [[0.75, 0.25], [0.0, 1.0]]
+
+    """
+
+    def __init__(self):
+        self._conditions = SymbolTable()
+        self._outcomes = SymbolTable()
+        self._read_only = False
+        self._rows = array('i')
+        self._cols = array('i')
+        self._amounts = array('l')
+        self._set_matrix(sparse.csr_matrix((0, 0), dtype=np.int64))
+
+    @classmethod
+    def from_arrays(cls, conditions, outcomes, counts):
+        """Return a distribution built from aligned sequences of counts."""
+        result = cls()
+        rows = _intern_all(result._conditions, conditions)  # pylint: disable=W0212
+        cols = _intern_all(result._outcomes, outcomes)  # pylint: disable=W0212
+        result._add_arrays(rows, cols, np.asarray(counts, dtype=np.int64))  # pylint: disable=W0212
+        return result
+
+    @property
+    def condition_symbols(self):
+        """Return the SymbolTable of conditions, which index rows."""
+        return self._conditions
+
+    @property
+    def outcome_symbols(self):
+        """Return the SymbolTable of outcomes, which index columns."""
+        return self._outcomes
+
+    @property
+    def matrix(self):
+        """Return the CSR matrix of counts."""
+        self._compact()
+        return self._matrix
+
+    @property
+    def totals(self):
+        """Return an array of the total count of each condition."""
+        self._compact()
+        return self._totals
+
+    def conditional_probs(self):
+        """Return a CSR matrix of the probability of each outcome in each condition."""
+        self._compact()
+        totals = self._totals.astype(np.float64)
+        scale = np.divide(1.0, totals, out=np.zeros_like(totals), where=totals > 0)
+        return sparse.diags(scale).dot(self._matrix).tocsr()
+
+    def _set_matrix(self, matrix):
+        """Replace the counts with a CSR matrix."""
+        matrix.sum_duplicates()
+        matrix.sort_indices()
+        self._matrix = matrix
+        self._totals = np.asarray(matrix.sum(axis=1), dtype=np.int64).ravel()
+
+    def _add_arrays(self, rows, cols, counts):
+        """Add counts for aligned arrays of row and column ids."""
+        shape = (len(self._conditions), len(self._outcomes))
+        old = self._matrix.tocoo()
+        self._set_matrix(sparse.coo_matrix(
+            (np.concatenate([old.data, counts]),
+             (np.concatenate([old.row, rows]), np.concatenate([old.col, cols]))),
+            shape=shape).tocsr())
+
+    def _compact(self):
+        """Merge any buffered counts into the matrix."""
+        if not self._amounts:
+            return
+        rows = np.frombuffer(self._rows, dtype=np.intc).astype(np.int32)
+        cols = np.frombuffer(self._cols, dtype=np.intc).astype(np.int32)
+        counts = np.frombuffer(self._amounts, dtype=np.int_).astype(np.int64)
+        self._rows = array('i')
+        self._cols = array('i')
+        self._amounts = array('l')
+        self._add_arrays(rows, cols, counts)
+
+    def _check_writable(self):
+        """Raise ValueError if the counts are read-only."""
+        if self._read_only:
+            raise ValueError("Cannot change read-only counts")
+
+    def freeze(self):
+        """Merge any buffered counts and prevent further changes."""
+        self._compact()
+        self._read_only = True
+
+    @property
+    def frozen(self):
+        """Return whether the counts are read-only."""
+        return self._read_only
+
+    def inc(self, condition, outcome, amount=1):
+        """Increment the count of an outcome in a condition."""
+        self.inc_all(((condition, outcome),), amount)
+
+    def inc_all(self, pairs, amount=1):
+        """Increment the count of each (condition, outcome) pair."""
+        self._check_writable()
+        intern_condition = self._conditions.intern
+        intern_outcome = self._outcomes.intern
+        rows = self._rows
+        cols = self._cols
+        amounts = self._amounts
+        limit = max(compact.MIN_BUFFER_SIZE, self._matrix.nnz)
+        for condition, outcome in pairs:
+            rows.append(intern_condition(condition))
+            cols.append(intern_outcome(outcome))
+            amounts.append(amount)
+            if len(amounts) >= limit:
+                self._compact()
+                rows = self._rows
+                cols = self._cols
+                amounts = self._amounts
+                limit = max(compact.MIN_BUFFER_SIZE, self._matrix.nnz)
+
+    def merge(self, other):
+        """Add the counts of another conditional frequency distribution."""
+        self._check_writable()
+        if isinstance(other, SparseConditionalFreqDist):
+            # Translate the other ids into ours and add all at once
+            matrix = other.matrix.tocoo()
+            row_map = _intern_all(self._conditions, other.condition_symbols)
+            col_map = _intern_all(self._outcomes, other.outcome_symbols)
+            self._compact()
+            self._add_arrays(row_map[matrix.row], col_map[matrix.col], matrix.data)
+            return
+
+        for condition, dist in other.iteritems():
+            for outcome in dist:
+                self.inc(condition, outcome, dist.count(outcome))
+
+    def __iadd__(self, other):
+        self.merge(other)
+        return self
+
+    def _dist(self, row):
+        """Return a view of the row of a condition."""
+        lo = int(self._matrix.indptr[row])
+        hi = int(self._matrix.indptr[row + 1])
+        return CompactFreqDist(self._outcomes, self._matrix.indices[lo:hi],
+                               self._matrix.data[lo:hi], int(self._totals[row]))
+
+    def _find_condition(self, condition):
+        """Return the row of a condition, or -1 if it is unobserved."""
+        self._compact()
+        try:
+            row = self._conditions.get(condition, -1)
+        except TypeError:
+            # Unhashable conditions cannot have been observed
+            return -1
+        if row < 0 or not self._totals[row]:
+            return -1
+        return row
+
+    def counts_many(self, conditions, outcomes):
+        """Return counts for aligned sequences of conditions and outcomes.
+
+        Three arrays are returned: the count of each outcome in its
+        condition, the total count of the condition, and the number
+        of outcomes of the condition. Unobserved conditions have a
+        total and number of outcomes of zero.
+        """
+        self._compact()
+        rows = np.array([self._find_condition(condition) for condition in conditions],
+                        dtype=np.int64)
+        get = self._outcomes.get
+        cols = np.array([get(outcome, -1) for outcome in outcomes], dtype=np.int64)
+        found = rows >= 0
+        safe = np.where(found, rows, 0)
+        indptr = self._matrix.indptr
+        lo = np.where(found, indptr[safe], 0)
+        hi = np.where(found, indptr[safe + 1], 0)
+        indices = self._matrix.indices
+        pos = bisect_left_many(indices, lo, hi, cols)
+        hit = pos < hi
+        hit[hit] = indices[pos[hit]] == cols[hit]
+        counts = np.where(hit, self._matrix.data[np.where(hit, pos, 0)], 0)
+        totals = np.where(found, self._totals[safe], 0)
+        return counts, totals, hi - lo
+
+    def __contains__(self, condition):
+        return self._find_condition(condition) >= 0
+
+    def __getitem__(self, condition):
+        row = self._find_condition(condition)
+        if row < 0:
+            raise KeyError(condition)
+        return self._dist(row)
+
+    def get(self, condition, default=None):
+        """Return the distribution for a condition, or default if unobserved."""
+        row = self._find_condition(condition)
+        return self._dist(row) if row >= 0 else default
+
+    def __len__(self):
+        self._compact()
+        return int(np.count_nonzero(self._totals))
+
+    def _observed_rows(self):
+        """Return the rows of all observed conditions."""
+        self._compact()
+        return np.flatnonzero(self._totals).tolist()
+
+    def iterkeys(self):
+        """Return an iterator over the conditions."""
+        symbol = self._conditions.symbol
+        return (symbol(row) for row in self._observed_rows())
+
+    def keys(self):
+        """Return a list of the conditions."""
+        return list(self.iterkeys())
+
+    def __iter__(self):
+        return self.iterkeys()
+
+    def iteritems(self):
+        """Return an iterator over (condition, distribution) pairs."""
+        symbol = self._conditions.symbol
+        return ((symbol(row), self._dist(row)) for row in self._observed_rows())
+
+    def items(self):
+        """Return a list of (condition, distribution) pairs."""
+        return list(self.iteritems())
+
+    def itersorted(self):
+        """Return an iterator over (condition, distribution) pairs sorted by condition."""
+        symbol = self._conditions.symbol
+        rows = sorted(self._observed_rows(), key=symbol)
+        return ((symbol(row), self._dist(row)) for row in rows)
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
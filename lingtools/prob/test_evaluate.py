@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+"""
+Test the evaluate module.
+"""
+
+# Copyright 2014 Constantine Lignos
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from lingtools.prob.evaluate import evaluate, evaluate_files, surprisals
+from lingtools.prob.ngram import NgramModel, Smoothing, Storage
+from lingtools.prob.test_ngram import TEST_TOKENS
+
+
+class TestEvaluate(unittest.TestCase):
+    """Test evaluating models on token streams."""
+
+    def setUp(self):  # pylint: disable=C0103
+        self.half = len(TEST_TOKENS) // 2
+        self.train = TEST_TOKENS[:self.half]
+        self.test = TEST_TOKENS[self.half:]
+
+    def test_surprisals(self):
+        """Chunked surprisals match scoring the whole stream at once."""
+        for order in (1, 2, 3):
+            model = NgramModel(order, self.train, Storage.COMPACT)
+            expected = -model.logprob_many(self.test, smoothing=Smoothing.KATZ)
+            for chunk_size in (1, 7, 1000):
+                actual = np.concatenate(list(surprisals(model, iter(self.test),
+                                                        Smoothing.KATZ, chunk_size)))
+                self.assertEqual(actual.tolist(), expected.tolist())
+
+    def test_totals(self):
+        """Cross-entropy and perplexity exclude OOVs."""
+        model = NgramModel(2, self.train)
+        result = evaluate(model, self.test, Smoothing.KNESER_NEY, 10)
+        expected = -model.logprob_many(self.test, smoothing=Smoothing.KNESER_NEY)
+        oov = np.isinf(expected)
+        self.assertEqual(result.tokens, len(self.test) - 1)
+        self.assertEqual(result.oovs, np.count_nonzero(oov))
+        self.assertAlmostEqual(result.cross_entropy, expected[~oov].mean())
+        self.assertAlmostEqual(result.perplexity, 2 ** expected[~oov].mean())
+        self.assertTrue(result.tokens_per_second > 0)
+
+    def test_no_tokens(self):
+        """Cross-entropy is undefined when nothing is scored."""
+        result = evaluate(NgramModel(2, self.train), [])
+        self.assertEqual(result.tokens, 0)
+        self.assertRaises(ValueError, lambda: result.cross_entropy)
+
+
+class TestEvaluateFiles(unittest.TestCase):
+    """Test evaluating models on files."""
+
+    def setUp(self):  # pylint: disable=C0103
+        self.tempdir = tempfile.mkdtemp()
+        self.tokens = [TEST_TOKENS[start:start + 40] for start in range(0, len(TEST_TOKENS), 40)]
+        self.paths = []
+        for idx, tokens in enumerate(self.tokens):
+            path = os.path.join(self.tempdir, "{}.txt".format(idx))
+            with open(path, 'w') as token_file:
+                token_file.write(" ".join(tokens))
+            self.paths.append(path)
+
+    def tearDown(self):  # pylint: disable=C0103
+        shutil.rmtree(self.tempdir)
+
+    def test_files(self):
+        """Evaluating files matches evaluating each file as a stream."""
+        model = NgramModel(3, TEST_TOKENS)
+        expected = evaluate(model, self.tokens[0], Smoothing.KATZ)
+        for tokens in self.tokens[1:]:
+            expected.merge(evaluate(model, tokens, Smoothing.KATZ))
+        for processes in (1, 2):
+            result = evaluate_files(model, self.paths, Smoothing.KATZ, processes)
+            self.assertEqual(result.tokens, expected.tokens)
+            self.assertEqual(result.oovs, expected.oovs)
+            self.assertAlmostEqual(result.surprisal, expected.surprisal)
+
+
+if __name__ == '__main__':
+    unittest.main()
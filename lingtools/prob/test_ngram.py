@@ -17,12 +17,22 @@ Test the ngram module.
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import csv
+import itertools
+import os
+import pickle
+import shutil
+import tempfile
 import unittest
 from collections import Counter
+from multiprocessing import Pool
 
+import numpy as np
 from nltk import FreqDist, ConditionalFreqDist
 
-from lingtools.prob.ngram import NgramModel, NoSuchContextException
+from lingtools.prob import compact
+from lingtools.prob.ngram import (NgramModel, NoSuchContextException, Smoothing,
+                                  Storage)
 
 
 TEST_PASSAGE = \
@@ -48,6 +58,8 @@ both younger than Swift. Neither was as gray. Neither looked quite as
 tired."""
 TEST_TOKENS = [token.lower() for token in
                TEST_PASSAGE.replace("\n", " ").translate(None, '",.').split(" ")]
+# All storage types, which should behave identically
+STORAGES = (Storage.DICT, Storage.COMPACT, Storage.SPARSE)
 
 
 class TestBasic(unittest.TestCase):
@@ -133,5 +145,415 @@ class TestNgram(unittest.TestCase):
     # TODO: Add tests for higher-order models
 
 
+def assert_same_model(testcase, model, other):
+    """Assert that two models give identical results."""
+    contexts = set(context for _, context, _ in model.allngrams())
+    contexts.add(("UNSEEN",) * (model.order - 1) if model.order > 1 else None)
+    for context in contexts:
+        testcase.assertEqual(other.context_count(context),
+                             model.context_count(context))
+        for word in set(TEST_TOKENS) | set(["UNSEEN"]):
+            testcase.assertEqual(other.count(word, context),
+                                 model.count(word, context))
+    testcase.assertEqual(sorted(other.allngrams()), sorted(model.allngrams()))
+
+
+class TestCompact(unittest.TestCase):
+    """Test that compact storage matches dictionary storage."""
+
+    def test_orders(self):
+        """Compact models match dictionary models for several orders."""
+        for order in (1, 2, 3):
+            model = NgramModel(order, TEST_TOKENS)
+            compact_model = NgramModel(order, TEST_TOKENS, Storage.COMPACT)
+            assert_same_model(self, model, compact_model)
+
+    def test_incremental(self):
+        """Repeated updates and buffer flushes are merged correctly."""
+        min_buffer = compact.MIN_BUFFER_SIZE
+        compact.MIN_BUFFER_SIZE = 7
+        try:
+            model = NgramModel(2, storage=Storage.COMPACT)
+            half = len(TEST_TOKENS) // 2
+            model.update(TEST_TOKENS[:half])
+            model.update(TEST_TOKENS[half:])
+        finally:
+            compact.MIN_BUFFER_SIZE = min_buffer
+        reference = NgramModel(2)
+        reference.update(TEST_TOKENS[:half])
+        reference.update(TEST_TOKENS[half:])
+        assert_same_model(self, reference, model)
+
+    def test_unseen_context(self):
+        """An unseen context raises an exception."""
+        model = NgramModel(2, TEST_TOKENS, Storage.COMPACT)
+        with self.assertRaises(NoSuchContextException):
+            model.prob("said", ("UNSEEN",))
+
+
+class TestBackoff(unittest.TestCase):
+    """Test backoff and interpolated smoothing."""
+
+    smoothings = (Smoothing.KATZ, Smoothing.KNESER_NEY, Smoothing.INTERPOLATION)
+
+    def test_distributions(self):
+        """Smoothed distributions sum to one in seen and unseen contexts."""
+        vocab = set(TEST_TOKENS)
+        for storage in STORAGES:
+            for order in (1, 2, 3):
+                model = NgramModel(order, TEST_TOKENS, storage)
+                contexts = [tuple(TEST_TOKENS[:order - 1]),
+                            tuple(TEST_TOKENS[10:10 + order - 1]),
+                            ("UNSEEN",) * (order - 1)]
+                for smoothing in self.smoothings:
+                    for context in contexts:
+                        context = context if order > 1 else None
+                        total = sum(model.prob(word, context, smoothing) for word in vocab)
+                        self.assertAlmostEqual(total, 1.0)
+                        self.assertEqual(model.prob("UNSEEN", context, smoothing), 0.0)
+
+    def test_saturated_distributions(self):
+        """Distributions sum to one in contexts that have seen every event."""
+        tokens = ['c', 'd', 'c', 'a', 'd', 'd', 'a', 'a', 'a', 'a', 'c', 'c', 'd']
+        vocab = set(tokens)
+        for storage in STORAGES:
+            for order in (2, 3):
+                model = NgramModel(order, tokens, storage)
+                for context in itertools.product(vocab, repeat=order - 1):
+                    for smoothing in self.smoothings:
+                        total = sum(model.prob(word, context, smoothing) for word in vocab)
+                        self.assertAlmostEqual(total, 1.0)
+
+    def test_prob_many(self):
+        """Batch probabilities match prob."""
+        model = NgramModel(3, TEST_TOKENS)
+        contexts = [tuple(TEST_TOKENS[idx:idx + 2]) for idx in range(50)]
+        contexts.extend([("UNSEEN", "the"), ("the", "UNSEEN")])
+        events = [TEST_TOKENS[(idx * 7) % len(TEST_TOKENS)] for idx in range(len(contexts))]
+        for smoothing in self.smoothings:
+            probs = model.prob_many(events, contexts, smoothing)
+            for prob, event, context in zip(probs, events, contexts):
+                self.assertAlmostEqual(prob, model.prob(event, context, smoothing))
+
+    def test_seen_counts(self):
+        """Seen n-grams keep most of their relative frequency."""
+        model = NgramModel(2, TEST_TOKENS)
+        for smoothing in self.smoothings:
+            self.assertTrue(0.25 < model.prob("the", ("of",), smoothing) <=
+                            model.prob("the", ("of",)))
+
+    def test_invalidation(self):
+        """Cached tables are updated when the counts change."""
+        model = NgramModel(2, TEST_TOKENS[:20])
+        before = model.prob("said", ("he",), Smoothing.KNESER_NEY)
+        model.update(TEST_TOKENS)
+        self.assertNotEqual(model.prob("said", ("he",), Smoothing.KNESER_NEY), before)
+
+
+class TestFreeze(unittest.TestCase):
+    """Test frozen models."""
+
+    def test_probs(self):
+        """A frozen model gives the same probabilities."""
+        for storage in STORAGES:
+            model = NgramModel(2, TEST_TOKENS, storage)
+            frozen = NgramModel(2, TEST_TOKENS, storage)
+            frozen.freeze()
+            self.assertTrue(frozen.frozen)
+            self.assertFalse(model.frozen)
+            for smoothing in (Smoothing.NONE, Smoothing.LAPLACE, Smoothing.ELE):
+                for context, event in model._context_events(TEST_TOKENS):  # pylint: disable=W0212
+                    for item in (event, "UNSEEN"):
+                        self.assertAlmostEqual(frozen.prob(item, context, smoothing),
+                                               model.prob(item, context, smoothing))
+            self.assertRaises(NoSuchContextException, frozen.prob, "the", ("UNSEEN",))
+            self.assertEqual(frozen.count("the", ("UNSEEN",)), 0)
+
+    def test_changes(self):
+        """A frozen model cannot be trained."""
+        for storage in STORAGES:
+            model = NgramModel(2, TEST_TOKENS, storage)
+            model.freeze()
+            self.assertRaises(ValueError, model.update, TEST_TOKENS)
+            self.assertRaises(ValueError, model.merge, NgramModel(2, TEST_TOKENS))
+            self.assertEqual(model.count("long", ("a",)), 1)
+
+    def test_pickle(self):
+        """A frozen distribution stays frozen when pickled."""
+        model = NgramModel(2, TEST_TOKENS)
+        model.freeze()
+        copy = pickle.loads(pickle.dumps(model, pickle.HIGHEST_PROTOCOL))
+        self.assertTrue(copy.frozen)
+        self.assertEqual(copy.prob("long", ("a",)), model.prob("long", ("a",)))
+        self.assertRaises(ValueError, copy.update, TEST_TOKENS)
+
+
+class TestParallel(unittest.TestCase):
+    """Test sharded training and merging."""
+
+    def test_update_parallel(self):
+        """Sharded training is identical to serial training."""
+        for storage in STORAGES:
+            for order in (1, 2, 3):
+                model = NgramModel(order, storage=storage)
+                model.update_parallel(TEST_TOKENS, processes=2, shard_size=17)
+                assert_same_model(self, NgramModel(order, TEST_TOKENS), model)
+
+    def test_update_files(self):
+        """Training on files is identical to updating on each file."""
+        tempdir = tempfile.mkdtemp()
+        try:
+            paths = []
+            reference = NgramModel(2)
+            for idx in range(3):
+                tokens = TEST_TOKENS[idx * 50:(idx + 1) * 50]
+                reference.update(tokens)
+                path = os.path.join(tempdir, "{}.txt".format(idx))
+                with open(path, 'w') as token_file:
+                    token_file.write(" ".join(tokens))
+                paths.append(path)
+            for storage in STORAGES:
+                model = NgramModel(2, storage=storage)
+                model.update_files(paths, processes=2)
+                assert_same_model(self, reference, model)
+        finally:
+            shutil.rmtree(tempdir)
+
+    def test_merge(self):
+        """Merging models of either storage sums their counts."""
+        half = len(TEST_TOKENS) // 2
+        for storage in STORAGES:
+            for other_storage in STORAGES:
+                model = NgramModel(2, TEST_TOKENS[:half], storage)
+                model.merge(NgramModel(2, TEST_TOKENS[half - 1:], other_storage))
+                assert_same_model(self, NgramModel(2, TEST_TOKENS), model)
+
+
+class TestSnapshot(unittest.TestCase):
+    """Test saving and loading snapshots."""
+
+    def setUp(self):  # pylint: disable=C0103
+        self.tempdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tempdir, "model.ngram")
+
+    def tearDown(self):  # pylint: disable=C0103
+        shutil.rmtree(self.tempdir)
+
+    def test_round_trip(self):
+        """A loaded model matches the saved one for all storages."""
+        for order in (1, 2, 3):
+            for storage in STORAGES:
+                model = NgramModel(order, TEST_TOKENS, storage)
+                model.save(self.path)
+                for load_storage in STORAGES:
+                    loaded = NgramModel.load(self.path, load_storage)
+                    self.assertEqual(loaded.storage, load_storage)
+                    assert_same_model(self, model, loaded)
+
+    def test_unicode(self):
+        """Unicode items survive a round trip."""
+        tokens = [token.decode('ascii') for token in TEST_TOKENS] + [u'caf\xe9']
+        NgramModel(2, tokens).save(self.path)
+        loaded = NgramModel.load(self.path)
+        self.assertEqual(loaded.count(u'caf\xe9', (u'tired',)), 1)
+
+    def test_empty(self):
+        """An empty model can be saved and loaded."""
+        NgramModel(2).save(self.path)
+        self.assertEqual(NgramModel.load(self.path, Storage.COMPACT).allngrams(), [])
+
+    def test_incremental(self):
+        """Adding new data to a loaded model matches training from scratch."""
+        half = len(TEST_TOKENS) // 2
+        for storage in STORAGES:
+            NgramModel(2, TEST_TOKENS[:half], storage).save(self.path)
+            model = NgramModel.load(self.path, storage)
+            model += NgramModel(2, TEST_TOKENS[half - 1:])
+            model.save(self.path)
+            assert_same_model(self, NgramModel(2, TEST_TOKENS),
+                              NgramModel.load(self.path))
+
+    def test_mmap(self):
+        """A memory-mapped model matches the saved one."""
+        tokens = [token.decode('ascii') for token in TEST_TOKENS] + [u'caf\xe9']
+        for order in (1, 2, 3):
+            for data in (TEST_TOKENS, tokens):
+                model = NgramModel(order, data, Storage.COMPACT)
+                model.save(self.path)
+                mapped = NgramModel.load(self.path, Storage.COMPACT, mmap=True)
+                assert_same_model(self, model, mapped)
+                for smoothing in (Smoothing.KATZ, Smoothing.KNESER_NEY):
+                    self.assertEqual(mapped.prob_many(data[order - 1:], None, smoothing).tolist(),
+                                     model.prob_many(data[order - 1:], None, smoothing).tolist())
+
+    def test_mmap_read_only(self):
+        """A memory-mapped model cannot be updated."""
+        NgramModel(2, TEST_TOKENS).save(self.path)
+        self.assertRaises(ValueError, NgramModel.load, self.path, Storage.DICT, True)
+        mapped = NgramModel.load(self.path, Storage.COMPACT, mmap=True)
+        self.assertRaises(ValueError, mapped.update, TEST_TOKENS)
+        self.assertRaises(ValueError, mapped.merge, NgramModel(2, TEST_TOKENS))
+        # It can still be loaded normally and changed
+        model = NgramModel.load(self.path, Storage.COMPACT)
+        model.update(TEST_TOKENS)
+        self.assertEqual(model.count('long', ('a',)), 2 * mapped.count('long', ('a',)))
+
+    def test_mmap_processes(self):
+        """Worker processes can share a memory-mapped model."""
+        model = NgramModel(2, TEST_TOKENS, Storage.COMPACT)
+        model.save(self.path)
+        pool = Pool(2)
+        try:
+            results = pool.map(_mapped_probs, [self.path] * 4)
+        finally:
+            pool.close()
+            pool.join()
+        expected = model.prob_many(TEST_TOKENS).tolist()
+        for result in results:
+            self.assertEqual(result, expected)
+
+
+def _mapped_probs(path):
+    """Return the probabilities of the test tokens from a memory-mapped model."""
+    model = NgramModel.load(path, Storage.COMPACT, mmap=True)
+    return model.prob_many(TEST_TOKENS).tolist()
+
+
+class TestExport(unittest.TestCase):
+    """Test streaming and writing N-grams."""
+
+    def setUp(self):  # pylint: disable=C0103
+        self.tempdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tempdir, "model.out")
+
+    def tearDown(self):  # pylint: disable=C0103
+        shutil.rmtree(self.tempdir)
+
+    def test_iter_ngrams(self):
+        """N-grams are streamed sorted by context and event in every storage."""
+        for order in (1, 2, 3):
+            expected = None
+            for storage in STORAGES:
+                model = NgramModel(order, TEST_TOKENS, storage)
+                ngrams = list(model.iter_ngrams())
+                self.assertEqual(ngrams, sorted(ngrams, key=lambda ngram: (ngram[1], ngram[0])))
+                self.assertEqual(sorted(model.iter_ngrams(sort=False)), sorted(ngrams))
+                self.assertEqual(model.allngrams(), ngrams)
+                if expected is None:
+                    expected = ngrams
+                self.assertEqual(ngrams, expected)
+
+    def test_write_ngrams(self):
+        """N-grams written to CSV match the model."""
+        model = NgramModel(2, TEST_TOKENS, Storage.COMPACT)
+        model.write_ngrams(self.path)
+        with open(self.path, 'rb') as csv_file:
+            rows = list(csv.reader(csv_file))
+        self.assertEqual(rows[0], ["word1", "word2", "count", "prob"])
+        self.assertEqual(len(rows) - 1, len(model.allngrams()))
+        for word1, word2, count, prob in rows[1:]:
+            self.assertEqual(int(count), model.count(word2, (word1,)))
+            self.assertAlmostEqual(float(prob), model.prob(word2, (word1,)))
+
+    def test_write_arpa(self):
+        """N-grams written in ARPA format match the backoff table."""
+        model = NgramModel(3, TEST_TOKENS)
+        model.write_arpa(self.path, Smoothing.KNESER_NEY)
+        table = model.backoff_table(Smoothing.KNESER_NEY)
+        with open(self.path, 'rb') as arpa_file:
+            lines = arpa_file.read().splitlines()
+        self.assertEqual(lines[0], "\\data\\")
+        self.assertEqual(lines[-1], "\\end\\")
+        for level in range(3):
+            self.assertEqual(lines[level + 1],
+                             "ngram {}={}".format(level + 1, len(table.trie.ids[level])))
+        start = lines.index("\\3-grams:")
+        for line in lines[start + 1:-2]:
+            logprob, ngram = line.split("\t")
+            words = ngram.split(" ")
+            self.assertAlmostEqual(float(logprob), table.logprob(words[-1], words[:-1]), 5)
+
+    def test_read_arpa(self):
+        """An ARPA file read back gives the same probabilities."""
+        for order in (1, 2, 3):
+            model = NgramModel(order, TEST_TOKENS)
+            model.write_arpa(self.path, Smoothing.KATZ)
+            imported = NgramModel.from_arpa(self.path)
+            self.assertEqual(imported.order, order)
+            tokens = TEST_TOKENS + ["UNSEEN"]
+            expected = model.logprob_many(tokens, smoothing=Smoothing.KATZ)
+            actual = imported.logprob_many(tokens, smoothing=Smoothing.ARPA)
+            self.assertTrue(np.allclose(actual, expected, rtol=1e-6))
+            event, context = TEST_TOKENS[order - 1], TEST_TOKENS[:order - 1]
+            self.assertAlmostEqual(imported.prob(event, context, Smoothing.ARPA),
+                                   model.prob(event, context, Smoothing.KATZ), 6)
+            # Writing the imported model reproduces the file
+            other_path = self.path + ".copy"
+            imported.write_arpa(other_path, Smoothing.ARPA)
+            with open(self.path, 'rb') as arpa_file, open(other_path, 'rb') as other_file:
+                self.assertEqual(other_file.read(), arpa_file.read())
+
+    def test_read_arpa_unsorted(self):
+        """N-grams not in id order keep their own probabilities, including zeros."""
+        with open(self.path, 'wb') as arpa_file:
+            arpa_file.write("\\data\\\nngram 1=3\nngram 2=2\n\n"
+                            "\\1-grams:\n-0.5\ta\t-0.1\n-0.5\tb\t-0.1\n-0.5\tc\n\n"
+                            "\\2-grams:\n-99\tb c\n-0.3\ta c\n\n\\end\\\n")
+        imported = NgramModel.from_arpa(self.path)
+        self.assertAlmostEqual(imported.prob("c", ["a"], Smoothing.ARPA), 10 ** -0.3)
+        self.assertEqual(imported.prob("c", ["b"], Smoothing.ARPA), 0.0)
+
+    def test_read_arpa_errors(self):
+        """Malformed ARPA files raise ValueError."""
+        bad_files = [
+            "no header\n",
+            "\\data\\\nngram 1=2\n\n\\1-grams:\n-1.0\ta\n\n\\end\\\n",
+            "\\data\\\nngram 1=1\nngram 2=1\n\n\\1-grams:\n-1.0\ta\n"
+            "\n\\2-grams:\n-1.0\tb a\n\n\\end\\\n",
+            "\\data\\\nngram 1=1\n\n\\1-grams:\n-1.0\ta\n",
+        ]
+        for contents in bad_files:
+            with open(self.path, 'wb') as arpa_file:
+                arpa_file.write(contents)
+            self.assertRaises(ValueError, NgramModel.from_arpa, self.path)
+        self.assertRaises(ValueError, NgramModel(2, TEST_TOKENS).backoff_table, Smoothing.ARPA)
+
+
+class TestBatch(unittest.TestCase):
+    """Test batch scoring."""
+
+    def test_prob_many(self):
+        """Batch probabilities match prob for each storage and smoothing."""
+        for storage in STORAGES:
+            for order in (1, 2, 3):
+                model = NgramModel(order, TEST_TOKENS, storage)
+                pairs = list(model._context_events(TEST_TOKENS))  # pylint: disable=W0212
+                contexts = [context for context, _ in pairs]
+                events = [event for _, event in pairs]
+                # Score some unseen events as well
+                events[::7] = ["UNSEEN"] * len(events[::7])
+                for smoothing in (Smoothing.NONE, Smoothing.LAPLACE, Smoothing.ELE):
+                    probs = model.prob_many(events, contexts, smoothing)
+                    self.assertEqual(probs.tolist(),
+                                     [model.prob(event, context, smoothing)
+                                      for event, context in zip(events, contexts)])
+
+    def test_token_stream(self):
+        """A token stream is scored in the preceding contexts."""
+        model = NgramModel(3, TEST_TOKENS, Storage.COMPACT)
+        probs = model.prob_many(TEST_TOKENS)
+        self.assertEqual(len(probs), len(TEST_TOKENS) - 2)
+        self.assertEqual(probs[0], model.prob(TEST_TOKENS[2], TEST_TOKENS[:2]))
+        logprobs = model.logprob_many(TEST_TOKENS, base=2)
+        self.assertAlmostEqual(2 ** logprobs[-1], probs[-1])
+
+    def test_unseen_context(self):
+        """An unseen context raises an exception."""
+        for storage in STORAGES:
+            model = NgramModel(2, TEST_TOKENS, storage)
+            with self.assertRaises(NoSuchContextException):
+                model.prob_many(["the", "said"], [("the",), ("UNSEEN",)])
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+"""
+Test the probability module.
+"""
+
+# Copyright 2014 Constantine Lignos
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+import numpy as np
+
+from lingtools.prob.probability import (entropy, entropy_many, normalize_counts,
+                                        ragged_sums, surprisal, surprisal_many)
+
+
+def _ragged(vectors):
+    """Return the flat counts and offsets of a list of count vectors."""
+    offsets = np.cumsum([0] + [len(vector) for vector in vectors])
+    return [count for vector in vectors for count in vector], offsets
+
+
+class TestRagged(unittest.TestCase):
+    """Test the ragged batch kernels."""
+
+    def test_sums(self):
+        """Segments are summed, and empty segments sum to zero."""
+        vectors = [[], [2, 3], [], [], [4], [0, 0, 1], []]
+        counts, offsets = _ragged(vectors)
+        self.assertEqual(ragged_sums(np.array(counts), offsets).tolist(),
+                         [sum(vector) for vector in vectors])
+        self.assertEqual(ragged_sums(np.array([], dtype=int), [0, 0, 0]).tolist(), [0, 0])
+
+    def test_entropy(self):
+        """Entropies match entropy for each vector."""
+        rand = np.random.RandomState(0)
+        vectors = [rand.randint(1, 20, rand.randint(1, 8)).tolist() for _ in range(50)]
+        counts, offsets = _ragged(vectors)
+        for base in (2, 10):
+            for result, vector in zip(entropy_many(counts, offsets, base), vectors):
+                self.assertAlmostEqual(result, entropy(normalize_counts(map(float, vector)),
+                                                       base))
+
+    def test_entropy_zero_counts(self):
+        """Zero counts do not change the entropy of a vector."""
+        counts, offsets = _ragged([[0, 2, 2], [5, 0], [0, 0, 3, 1, 0]])
+        self.assertEqual(entropy_many(counts, offsets).tolist(),
+                         [1.0, 0.0, entropy([.75, .25])])
+
+    def test_entropy_empty(self):
+        """Empty or all-zero vectors have no entropy."""
+        for vectors in ([[1, 1], []], [[0, 0], [1]]):
+            counts, offsets = _ragged(vectors)
+            self.assertRaises(ValueError, entropy_many, counts, offsets)
+
+    def test_surprisal(self):
+        """Surprisals match surprisal for each event."""
+        event_counts = [1, 3, 4, 2, 7]
+        context_counts = [4, 3, 16, 8, 9]
+        for base in (2, 4):
+            for result, event_count, context_count in zip(
+                    surprisal_many(event_counts, context_counts, base), event_counts,
+                    context_counts):
+                self.assertAlmostEqual(result, surprisal(event_count, float(context_count),
+                                                         base))
+        self.assertEqual(surprisal_many([], []).tolist(), [])
+        self.assertRaises(ValueError, surprisal_many, [1, 5], [2, 4])
+
+
+if __name__ == '__main__':
+    unittest.main()
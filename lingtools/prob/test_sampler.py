@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+"""
+Test the sampler module.
+"""
+
+# Copyright 2014 Constantine Lignos
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+import numpy as np
+
+from lingtools.prob.probability import FreqDist
+from lingtools.prob.sampler import AliasSampler
+
+
+class TestAliasSampler(unittest.TestCase):
+    """Test alias sampling."""
+
+    def test_distribution(self):
+        """Items are drawn in proportion to their weights."""
+        weights = np.random.RandomState(0).zipf(2.0, 500).astype(np.float64)
+        sampler = AliasSampler(range(len(weights)), weights, seed=1)
+        n_draws = 200000
+        observed = np.bincount(sampler.sample_indices(n_draws), minlength=len(weights))
+        expected = weights / weights.sum() * n_draws
+        # Each count should be within five standard deviations
+        self.assertTrue((np.abs(observed - expected) <= 5 * np.sqrt(expected) + 1).all())
+
+    def test_seed(self):
+        """Seeded samplers give the same draws."""
+        counts = {'a': 1, 'b': 2, 'c': 3}
+        first = AliasSampler.from_counts(counts, seed=5).sample(100)
+        second = AliasSampler.from_counts(dict(reversed(counts.items())), seed=5).sample(100)
+        self.assertEqual(first.tolist(), second.tolist())
+        sampler = AliasSampler.from_counts(counts, seed=5)
+        sampler.sample(10)
+        sampler.seed(5)
+        self.assertEqual(sampler.sample(100).tolist(), first.tolist())
+
+    def test_freqdist(self):
+        """Samplers can be built from a FreqDist."""
+        dist = FreqDist()
+        dist.inc('a', 3)
+        dist.inc('b', 1)
+        sampler = AliasSampler.from_freqdist(dist, seed=0)
+        draws = sampler.sample(20000)
+        self.assertAlmostEqual((draws == 'a').mean(), 0.75, 1)
+        self.assertEqual(len(sampler), 2)
+
+    def test_errors(self):
+        """Invalid weights raise ValueError."""
+        self.assertRaises(ValueError, AliasSampler, [], [])
+        self.assertRaises(ValueError, AliasSampler, ['a'], [0])
+        self.assertRaises(ValueError, AliasSampler, ['a', 'b'], [1, -1])
+        self.assertRaises(ValueError, AliasSampler, ['a', 'b'], [1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+"""
+Test the sketch module.
+"""
+
+# Copyright 2014 Constantine Lignos
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+from collections import Counter
+
+import numpy as np
+
+from lingtools.prob.sketch import CountMinFreqDist, SpaceSavingFreqDist
+
+
+def _zipf_stream(size, seed=0):
+    """Return a list of Zipf-distributed word tokens."""
+    return ["w{}".format(rank) for rank in np.random.RandomState(seed).zipf(1.5, size)]
+
+
+class TestCountMin(unittest.TestCase):
+    """Test Count-Min sketches."""
+
+    def setUp(self):  # pylint: disable=C0103
+        self.tokens = _zipf_stream(20000)
+        self.counts = Counter(self.tokens)
+
+    def test_bounds(self):
+        """Estimates are never low and rarely exceed the error bound."""
+        sketch = CountMinFreqDist(epsilon=0.001, delta=0.01)
+        for token in self.tokens:
+            sketch.inc(token)
+        self.assertEqual(sketch.total_count, len(self.tokens))
+        over = 0
+        for token, count in self.counts.iteritems():
+            estimate = sketch.count(token)
+            self.assertTrue(estimate >= count)
+            if estimate - count > sketch.error_bound:
+                over += 1
+        self.assertTrue(over <= 0.01 * len(self.counts))
+        self.assertEqual(sketch.count("UNSEEN") <= sketch.error_bound, True)
+
+    def test_merge(self):
+        """Merged sketches bound the combined counts."""
+        half = len(self.tokens) // 2
+        first = CountMinFreqDist(epsilon=0.001)
+        second = CountMinFreqDist(epsilon=0.001)
+        for token in self.tokens[:half]:
+            first.inc(token)
+        for token in self.tokens[half:]:
+            second.inc(token)
+        first += second
+        self.assertEqual(first.total_count, len(self.tokens))
+        for token, count in self.counts.iteritems():
+            self.assertTrue(first.count(token) >= count)
+        self.assertRaises(ValueError, first.merge, CountMinFreqDist(epsilon=0.01))
+        self.assertRaises(ValueError, first.merge, CountMinFreqDist(epsilon=0.001, seed=1))
+
+
+class TestSpaceSaving(unittest.TestCase):
+    """Test Space-Saving heavy hitters."""
+
+    def test_heavy_hitters(self):
+        """Frequent items are tracked with bounded error."""
+        tokens = _zipf_stream(20000)
+        counts = Counter(tokens)
+        top = SpaceSavingFreqDist(epsilon=0.01)
+        for token in tokens:
+            top.inc(token)
+        self.assertEqual(top.capacity, 100)
+        self.assertEqual(top.total_count, len(tokens))
+        bound = len(tokens) / float(top.capacity)
+        for token, count in counts.iteritems():
+            if count > bound:
+                self.assertTrue(token in top)
+            if token in top:
+                self.assertTrue(count <= top.count(token) <= count + top.error(token))
+                self.assertTrue(top.error(token) <= bound)
+        self.assertEqual([token for token, _ in top.top(5)],
+                         [token for token, _ in counts.most_common(5)])
+
+    def test_amounts(self):
+        """Items can be incremented by more than one."""
+        top = SpaceSavingFreqDist(capacity=3)
+        for item, amount in [('a', 5), ('b', 2), ('c', 1), ('d', 4), ('a', 1)]:
+            top.inc(item, amount)
+        self.assertEqual(top.top(), [('a', 6), ('d', 5), ('b', 2)])
+        self.assertEqual(top.error('d'), 1)
+        self.assertAlmostEqual(top.freq('a'), 6 / 13.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
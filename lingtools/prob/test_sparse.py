@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+"""
+Test the sparse module.
+"""
+
+# Copyright 2014 Constantine Lignos
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+import numpy as np
+
+from lingtools.prob.probability import ConditionalFreqDist
+from lingtools.prob.sparse import SparseConditionalFreqDist
+from lingtools.prob.test_ngram import TEST_TOKENS
+
+
+class TestSparse(unittest.TestCase):
+    """Test sparse conditional frequency distributions."""
+
+    def setUp(self):  # pylint: disable=C0103
+        self.pairs = zip(TEST_TOKENS, TEST_TOKENS[1:])
+        self.cfd = ConditionalFreqDist()
+        self.cfd.inc_all(self.pairs)
+
+    def assert_same_counts(self, sparse_cfd):
+        """Assert that a sparse distribution has the counts of self.cfd."""
+        self.assertEqual(sorted(sparse_cfd.keys()), sorted(self.cfd.keys()))
+        for condition, dist in self.cfd.iteritems():
+            sparse_dist = sparse_cfd[condition]
+            self.assertEqual(sparse_dist.total_count, dist.total_count)
+            self.assertEqual(sorted(sparse_dist.outcomes()), sorted(dist.outcomes()))
+            for outcome in dist:
+                self.assertEqual(sparse_dist.count(outcome), dist.count(outcome))
+
+    def test_from_arrays(self):
+        """Bulk construction matches incrementing each pair."""
+        conditions = [condition for condition, _ in self.pairs]
+        outcomes = [outcome for _, outcome in self.pairs]
+        self.assert_same_counts(SparseConditionalFreqDist.from_arrays(
+            conditions, outcomes, np.ones(len(self.pairs), dtype=np.int64)))
+        sparse_cfd = SparseConditionalFreqDist()
+        sparse_cfd.inc_all(self.pairs)
+        self.assert_same_counts(sparse_cfd)
+
+    def test_merge(self):
+        """Merging sparse and other distributions adds their counts."""
+        half = len(self.pairs) // 2
+        first = SparseConditionalFreqDist()
+        first.inc_all(self.pairs[:half])
+        second = SparseConditionalFreqDist()
+        second.inc_all(self.pairs[half:])
+        first += second
+        self.assert_same_counts(first)
+        other = SparseConditionalFreqDist()
+        other.merge(self.cfd)
+        self.assert_same_counts(other)
+
+    def test_unseen(self):
+        """Looking up unseen conditions does not add them."""
+        sparse_cfd = SparseConditionalFreqDist()
+        sparse_cfd.inc_all(self.pairs)
+        self.assertRaises(KeyError, lambda: sparse_cfd["UNSEEN"])
+        self.assertEqual(sparse_cfd.get("UNSEEN"), None)
+        self.assertFalse("UNSEEN" in sparse_cfd)
+        self.assertEqual(len(sparse_cfd), len(self.cfd))
+
+    def test_probs(self):
+        """Conditional probabilities are normalized rows of counts."""
+        sparse_cfd = SparseConditionalFreqDist()
+        sparse_cfd.inc_all(self.pairs)
+        probs = sparse_cfd.conditional_probs()
+        self.assertTrue(np.allclose(np.asarray(probs.sum(axis=1)).ravel(), 1.0))
+        conditions = sparse_cfd.condition_symbols
+        outcomes = sparse_cfd.outcome_symbols
+        for condition, dist in self.cfd.iteritems():
+            self.assertEqual(sparse_cfd.totals[conditions.id(condition)], dist.total_count)
+            for outcome in dist:
+                self.assertAlmostEqual(probs[conditions.id(condition), outcomes.id(outcome)],
+                                       dist.freq(outcome))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+"""
+Interning of symbols to integer ids.
+
+"""
+
+# Copyright 2014 Constantine Lignos
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+class SymbolTable(object):
+
+    """A bidirectional mapping between hashable symbols and integer ids.
+
+    Ids are assigned densely in the order symbols are first interned.
+
+    >>> table = SymbolTable(['a', 'b'])
+    >>> table.intern('c')
+    2
+    >>> table.intern('a')
+    0
+    >>> table.id('b')
+    1
+    >>> table.get('z', -1)
+    -1
+    >>> table.symbol(2)
+    'c'
+    >>> len(table)
+    3
+    >>> 'c' in table
+    True
+    >>> list(table)
+    ['a', 'b', 'c']
+
+    """
+
+    def __init__(self, symbols=()):
+        self._ids = {}
+        self._symbols = []
+        for symbol in symbols:
+            self.intern(symbol)
+
+    def intern(self, symbol):
+        """Return the id for a symbol, assigning a new id if needed."""
+        try:
+            return self._ids[symbol]
+        except KeyError:
+            idx = len(self._symbols)
+            self._ids[symbol] = idx
+            self._symbols.append(symbol)
+            return idx
+
+    def id(self, symbol):
+        """Return the id for a symbol, raising KeyError if it is unknown."""
+        return self._ids[symbol]
+
+    def get(self, symbol, default=None):
+        """Return the id for a symbol or default if it is unknown."""
+        return self._ids.get(symbol, default)
+
+    def symbol(self, idx):
+        """Return the symbol for an id."""
+        return self._symbols[idx]
+
+    @property
+    def symbols(self):
+        """Return the list of symbols in id order."""
+        return self._symbols
+
+    def __len__(self):
+        return len(self._symbols)
+
+    def __contains__(self, symbol):
+        return symbol in self._ids
+
+    def __iter__(self):
+        return iter(self._symbols)
+
+    def __getstate__(self):
+        # The id mapping is redundant, so only the symbols are pickled
+        return self._symbols
+
+    def __setstate__(self, state):
+        self._symbols = state
+        self._ids = dict((symbol, idx) for idx, symbol in enumerate(state))
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -16,7 +16,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from distutils.core import setup
+from setuptools import setup
 
 DESCRIPTION = \
     "LingTools provides tools for working with linguistic data."
@@ -29,6 +29,7 @@ setup(name='lingtools',
       author_email='constantine.lignos@gmail.com',
       url='https://github.com/lingtools/lingtools',
       packages=['lingtools'],
+      install_requires=['numpy', 'scipy'],
       license='Apache',
       platforms='any',
       long_description=DESCRIPTION,